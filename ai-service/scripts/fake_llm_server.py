@@ -0,0 +1,394 @@
+"""
+Fake LLM Server - Deterministic local stand-in for Azure OpenAI
+Serves the chat completions and embeddings routes the AsyncAzureOpenAI client
+calls, with configurable latency, error and 429 rates, so the generation
+stack can be exercised and load-tested without live credentials
+
+Usage:
+    python scripts/fake_llm_server.py --port 8100 --latency-ms 800 --rate-limit-rate 0.02
+
+Then point the AI service at it:
+    AZURE_OPENAI_ENDPOINT=http://localhost:8100 AZURE_OPENAI_API_KEY=fake
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIMENSIONS = 256
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Characters per streamed chunk (roughly one token, as _count_tokens assumes)
+STREAM_CHUNK_CHARS = 4
+
+
+class FakeLLMConfig:
+    """Latency and failure behaviour of the fake server"""
+    
+    def __init__(
+        self,
+        latency_ms: float = 500.0,
+        latency_sigma: float = 0.5,
+        embedding_latency_ms: float = 50.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after_seconds: float = 1.0,
+        near_duplicate_rate: float = 0.0,
+        output_token_ms: float = 0.0,
+        seed: int = 42
+    ):
+        """
+        Args:
+            latency_ms: Median chat completion latency
+            latency_sigma: Log-normal sigma of latencies (0 for fixed latency)
+            embedding_latency_ms: Median embeddings latency
+            error_rate: Fraction of requests answered with a 500
+            rate_limit_rate: Fraction of requests answered with a 429
+            retry_after_seconds: Retry-After sent with 429 responses
+            near_duplicate_rate: Fraction of generated questions copied from
+                a prompt example not already listed under AVOID
+            output_token_ms: Extra chat latency per completion token, so
+                longer completions take longer, as with a real model (with
+                "stream": true the tokens are sent as they are "generated")
+            seed: Seed for latency and failure sampling
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.embedding_latency_ms = embedding_latency_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.near_duplicate_rate = near_duplicate_rate
+        self.output_token_ms = output_token_ms
+        self.random = random.Random(seed)
+
+
+def _sample_latency(config: FakeLLMConfig, median_ms: float) -> float:
+    """Log-normal latency in seconds around the median"""
+    if config.latency_sigma <= 0:
+        return median_ms / 1000.0
+    return (
+        config.random.lognormvariate(math.log(max(median_ms, 1e-3)), config.latency_sigma) / 1000.0
+    )
+
+
+def _fault(config: FakeLLMConfig) -> Any:
+    """Return an error response for this request, or None to answer normally"""
+    roll = config.random.random()
+    
+    if roll < config.rate_limit_rate:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"code": "429", "message": "Rate limit exceeded (fake server)"}},
+            headers={"retry-after": str(config.retry_after_seconds)}
+        )
+    
+    if roll < config.rate_limit_rate + config.error_rate:
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"code": "500", "message": "Internal server error (fake server)"}}
+        )
+    
+    return None
+
+
+def _embed(text: str) -> List[float]:
+    """Deterministic hashed bag-of-words vector, so similar texts score as similar"""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    
+    for word in _WORD_PATTERN.findall(text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS
+        vector[index] += 1.0 if digest[4] % 2 else -1.0
+    
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def _prompt_field(prompt: str, pattern: str, default: str) -> str:
+    match = re.search(pattern, prompt)
+    return match.group(1).strip() if match else default
+
+
+def _canned_question(prompt: str, serial: int) -> Dict[str, Any]:
+    """A well-formed question for the topic and difficulty asked for"""
+    topic = _prompt_field(prompt, r"question on the topic: (.+)", "General")
+    difficulty = _prompt_field(prompt, r"generate a NEW (\w+) difficulty", "MEDIUM")
+    
+    # Vary the wording per serial so generated questions do not collide
+    rng = random.Random(serial)
+    a, b = rng.randint(2, 97), rng.randint(2, 97)
+    subject = rng.choice(
+        ["a particle", "a block", "a circuit", "a solution", "a lens", "a gas sample"]
+    )
+    quantity = rng.choice(["speed", "mass", "current", "concentration", "focal length", "pressure"])
+    
+    return {
+        "question_text": (
+            f"[{serial}] In a {difficulty.lower()} problem on {topic}, {subject} has an initial "
+            f"{quantity} of {a} units which changes by a factor of {b}. "
+            f"What is the final {quantity}?"
+        ),
+        "options": [
+            {"key": "A", "text": str(a * b)},
+            {"key": "B", "text": str(a + b)},
+            {"key": "C", "text": str(abs(a - b))},
+            {"key": "D", "text": str(a * b + 1)},
+        ],
+        "correct_answer": "A",
+        "explanation": f"The {quantity} scales by the given factor: {a} x {b} = {a * b}.",
+        "concepts_tested": [topic],
+        "difficulty": difficulty,
+        "topic": topic,
+    }
+
+
+def _near_duplicate(prompt: str, config: FakeLLMConfig) -> Any:
+    """
+    Copy of a context example's text, imitating a model that regurgitates the
+    examples; examples the prompt's AVOID section already names are skipped
+    """
+    if config.random.random() >= config.near_duplicate_rate:
+        return None
+    
+    prompt, _, avoid = prompt.partition("AVOID")
+    examples = [
+        text for text in re.findall(r"^Question: (.+)$", prompt, re.MULTILINE)
+        if text[:60] not in avoid
+    ]
+    return config.random.choice(examples) if examples else None
+
+
+def _canned_validation() -> Dict[str, Any]:
+    return {
+        "is_valid": True,
+        "factual_accuracy": True,
+        "answer_correctness": True,
+        "clarity_score": 8,
+        "difficulty_match": True,
+        "options_quality": 8,
+        "issues": [],
+        "suggestions": [],
+    }
+
+
+def _count_tokens(text: str) -> int:
+    # Rough chars-per-token ratio, good enough for quota accounting
+    return max(1, len(text) // 4)
+
+
+def create_app(config: FakeLLMConfig) -> FastAPI:
+    """Build the fake OpenAI-compatible app"""
+    app = FastAPI(title="Fake LLM Server")
+    serials = itertools.count(1)
+    stats = {
+        "chat_requests": 0, "embedding_requests": 0, "errors": 0, "rate_limited": 0,
+        "near_duplicates": 0, "streams": 0, "streams_cancelled": 0, "stream_tokens_unsent": 0,
+    }
+    
+    async def _respond_or_fail(median_ms: float) -> Any:
+        await asyncio.sleep(_sample_latency(config, median_ms))
+        fault = _fault(config)
+        if fault is not None:
+            stats["rate_limited" if fault.status_code == 429 else "errors"] += 1
+        return fault
+    
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request, deployment: str = "fake"):
+        body = await request.json()
+        stats["chat_requests"] += 1
+        
+        fault = await _respond_or_fail(config.latency_ms)
+        if fault is not None:
+            return fault
+        
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        is_validation = "is_valid" in prompt
+        batch_size = len(re.findall(r"^QUESTION \d+:", prompt, re.MULTILINE))
+        
+        choices = []
+        for index in range(body.get("n") or 1):
+            if is_validation and batch_size:
+                payload = {
+                    "results": [{"index": i + 1, **_canned_validation()} for i in range(batch_size)]
+                }
+            elif is_validation:
+                payload = _canned_validation()
+            else:
+                group_size = int(_prompt_field(prompt, r"Generate (\d+) DIFFERENT questions", "0"))
+                questions = [
+                    _canned_question(prompt, next(serials)) for _ in range(max(1, group_size))
+                ]
+                for question in questions:
+                    copied = _near_duplicate(prompt, config)
+                    if copied:
+                        question["question_text"] = copied
+                        stats["near_duplicates"] += 1
+                payload = {"questions": questions} if group_size else questions[0]
+            choices.append({
+                "index": index,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps(payload)},
+            })
+        
+        prompt_tokens = _count_tokens(prompt)
+        completion_tokens = sum(_count_tokens(c["message"]["content"]) for c in choices)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(
+                _stream_chunks(body, deployment, choices, usage if include_usage else None),
+                media_type="text/event-stream"
+            )
+        
+        if config.output_token_ms > 0:
+            await asyncio.sleep(completion_tokens * config.output_token_ms / 1000.0)
+        
+        return {
+            "id": f"chatcmpl-fake-{stats['chat_requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", deployment),
+            "choices": choices,
+            "usage": usage,
+        }
+    
+    async def _stream_chunks(
+        body: Dict[str, Any],
+        deployment: str,
+        choices: List[Dict[str, Any]],
+        usage: Any
+    ) -> AsyncIterator[str]:
+        """Server-sent chat.completion.chunk events, one token-sized piece at a time"""
+        stats["streams"] += 1
+        base = {
+            "id": f"chatcmpl-fake-{stats['chat_requests']}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", deployment),
+        }
+        
+        def event(payload: Dict[str, Any]) -> str:
+            return f"data: {json.dumps({**base, **payload})}\n\n"
+        
+        sent = 0
+        total = sum(len(c["message"]["content"]) for c in choices)
+        try:
+            for choice in choices:
+                content = choice["message"]["content"]
+                for start in range(0, len(content), STREAM_CHUNK_CHARS):
+                    if config.output_token_ms > 0:
+                        await asyncio.sleep(config.output_token_ms / 1000.0)
+                    piece = content[start:start + STREAM_CHUNK_CHARS]
+                    delta = {"content": piece}
+                    yield event({"choices": [
+                        {"index": choice["index"], "delta": delta, "finish_reason": None}
+                    ]})
+                    sent += len(piece)
+                yield event({"choices": [
+                    {"index": choice["index"], "delta": {}, "finish_reason": "stop"}
+                ]})
+            
+            if usage is not None:
+                yield event({"choices": [], "usage": usage})
+            yield "data: [DONE]\n\n"
+            sent = total
+        finally:
+            if sent < total:
+                # Client closed the stream early: the rest was never generated
+                stats["streams_cancelled"] += 1
+                stats["stream_tokens_unsent"] += (total - sent) // STREAM_CHUNK_CHARS
+    
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request, deployment: str = "fake"):
+        body = await request.json()
+        stats["embedding_requests"] += 1
+        
+        fault = await _respond_or_fail(config.embedding_latency_ms)
+        if fault is not None:
+            return fault
+        
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        
+        prompt_tokens = sum(_count_tokens(text) for text in inputs)
+        
+        return {
+            "object": "list",
+            "model": body.get("model", deployment),
+            "data": [
+                {"object": "embedding", "index": index, "embedding": _embed(text)}
+                for index, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+    
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+    
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Azure OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="Median chat latency")
+    parser.add_argument(
+        "--latency-sigma", type=float, default=0.5, help="Log-normal sigma (0 = fixed)"
+    )
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500 responses")
+    parser.add_argument(
+        "--rate-limit-rate", type=float, default=0.0, help="Fraction of 429 responses"
+    )
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on 429")
+    parser.add_argument(
+        "--near-duplicate-rate", type=float, default=0.0,
+        help="Fraction of generated questions copied from a prompt example"
+    )
+    parser.add_argument(
+        "--output-token-ms", type=float, default=0.0,
+        help="Extra chat latency per completion token"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    config = FakeLLMConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        embedding_latency_ms=args.embedding_latency_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_seconds=args.retry_after,
+        near_duplicate_rate=args.near_duplicate_rate,
+        output_token_ms=args.output_token_ms,
+        seed=args.seed
+    )
+    
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
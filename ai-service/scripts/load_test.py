@@ -0,0 +1,210 @@
+"""
+Load Test - Drive the generate endpoints at a target request rate
+Sends open-loop traffic (requests start on schedule whether or not earlier
+ones have finished) and reports throughput, latency percentiles and the
+service's /api/generate/stats afterwards
+
+Usage:
+    python scripts/load_test.py --endpoint single --rps 5 --duration 60
+    python scripts/load_test.py --endpoint batch --rps 1 --batch-size 10
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+TOPICS = [
+    "Mechanics - Kinematics",
+    "Thermodynamics",
+    "Organic Chemistry",
+    "Calculus - Integration",
+    "Electrostatics",
+]
+
+DIFFICULTIES = ["EASY", "MEDIUM", "HARD"]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def build_payload(endpoint: str, index: int, exam_type: str, batch_size: int) -> Dict[str, Any]:
+    """Request body for the n-th request, cycling through topics and difficulties"""
+    topic = TOPICS[index % len(TOPICS)]
+    difficulty = DIFFICULTIES[index % len(DIFFICULTIES)]
+    
+    if endpoint == "single":
+        return {
+            "topic": topic,
+            "difficulty": difficulty,
+            "exam_type": exam_type,
+            "use_pattern_analysis": False,
+        }
+    
+    return {
+        "specifications": [
+            {
+                "topic": TOPICS[(index + i) % len(TOPICS)],
+                "difficulty": DIFFICULTIES[i % len(DIFFICULTIES)],
+            }
+            for i in range(batch_size)
+        ],
+        "exam_type": exam_type,
+        "use_pattern_analysis": False,
+    }
+
+
+async def send_request(
+    client: httpx.AsyncClient,
+    url: str,
+    payload: Dict[str, Any],
+    results: List[Dict[str, Any]]
+) -> None:
+    """Send one request and record its outcome"""
+    started = time.perf_counter()
+    
+    try:
+        response = await client.post(url, json=payload)
+        body = response.json() if response.status_code == 200 else {}
+        results.append({
+            "status": response.status_code,
+            "success": bool(body.get("success")),
+            "latency": time.perf_counter() - started,
+        })
+    except Exception as e:
+        results.append({
+            "status": type(e).__name__,
+            "success": False,
+            "latency": time.perf_counter() - started,
+        })
+
+
+async def run_load_test(
+    base_url: str,
+    endpoint: str,
+    rps: float,
+    duration: float,
+    exam_type: str,
+    batch_size: int,
+    timeout: float
+) -> Dict[str, Any]:
+    """
+    Run the load test and summarize it
+    
+    Args:
+        base_url: AI service base URL
+        endpoint: "single" or "batch"
+        rps: Target request rate
+        duration: Seconds to keep sending requests
+        exam_type: Exam type sent with each request
+        batch_size: Specifications per batch request
+        timeout: Per-request timeout in seconds
+        
+    Returns:
+        Summary with throughput, latency percentiles and service stats
+    """
+    url = f"{base_url}/api/generate/{endpoint}"
+    results: List[Dict[str, Any]] = []
+    tasks = []
+    
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        total_requests = int(rps * duration)
+        
+        for index in range(total_requests):
+            # Open loop: schedule by wall clock, not by completions
+            delay = started + index / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            payload = build_payload(endpoint, index, exam_type, batch_size)
+            tasks.append(asyncio.create_task(send_request(client, url, payload, results)))
+        
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        
+        try:
+            service_stats = (await client.get(f"{base_url}/api/generate/stats")).json()
+        except Exception as e:
+            service_stats = {"error": str(e)}
+    
+    generation = service_stats.get("generation") or {}
+    cascade = service_stats.get("cascade") or {}
+    latencies = [r["latency"] for r in results if r["success"]]
+    successes = len(latencies)
+    questions_per_request = batch_size if endpoint == "batch" else 1
+    
+    return {
+        "endpoint": endpoint,
+        "target_rps": rps,
+        "requests": len(results),
+        "successes": successes,
+        "status_counts": dict(Counter(str(r["status"]) for r in results)),
+        "elapsed_seconds": round(elapsed, 2),
+        "achieved_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "success_throughput_rps": round(successes / elapsed, 2) if elapsed else 0.0,
+        "questions_per_second": (
+            round(successes * questions_per_request / elapsed, 2) if elapsed else 0.0
+        ),
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        # LLM calls spent per accepted question (retries after rejections included)
+        "generation": {
+            "attempts": generation.get("attempts"),
+            "accepted": generation.get("accepted"),
+            "attempts_per_accepted": generation.get("attempts_per_accepted"),
+        },
+        # Originality checks the lexical stage settled without an embedding call
+        "cascade": {
+            "checks": cascade.get("checks"),
+            "short_circuited": cascade.get("short_circuited"),
+            "embedding_checks": cascade.get("embedding_checks"),
+            "skipped_unversioned": cascade.get("skipped_unversioned"),
+            "embedding_comparisons_saved_ratio": cascade.get("saved_ratio"),
+        },
+        "service_stats": service_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI service generate endpoints")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--endpoint", choices=["single", "batch"], default="single")
+    parser.add_argument("--rps", type=float, default=2.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send requests for")
+    parser.add_argument("--exam-type", default="JEE")
+    parser.add_argument(
+        "--batch-size", type=int, default=5, help="Specifications per batch request"
+    )
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout")
+    args = parser.parse_args()
+    
+    summary = asyncio.run(run_load_test(
+        base_url=args.base_url,
+        endpoint=args.endpoint,
+        rps=args.rps,
+        duration=args.duration,
+        exam_type=args.exam_type,
+        batch_size=args.batch_size,
+        timeout=args.timeout
+    ))
+    
+    print(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
 """
 Question generation API endpoints
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
+import asyncio
+import json
 import logging
+import time
 
 from src.services.question_generator import QuestionGeneratorService
 from src.services.pattern_analyzer import PatternAnalyzerService
+from src.services.question_pool import QuestionPoolService
+from src.services.admission import INTERACTIVE, request_priority
+from src.services.batch_jobs import BatchJobService
+from src.services.paper_generator import PaperGeneratorService
+from src.services.context_retriever import context_retriever
+from src.services.telemetry import generation_telemetry
+from src.config.settings import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,6 +26,12 @@ router = APIRouter()
 # Initialize services
 generator = QuestionGeneratorService()
 pattern_analyzer = PatternAnalyzerService()
+question_pool = QuestionPoolService(generator)
+batch_jobs = BatchJobService(generator)
+paper_generator = PaperGeneratorService(generator, pattern_analyzer)
+
+# Stop proxies from buffering server-sent events
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
 
 class GenerationRequest(BaseModel):
@@ -24,6 +41,8 @@ class GenerationRequest(BaseModel):
     exam_type: str
     context_question_ids: Optional[List[str]] = None
     use_pattern_analysis: bool = True
+    candidates_per_call: Optional[int] = None
+    deadline_ms: Optional[int] = None
 
 
 class BatchGenerationRequest(BaseModel):
@@ -33,10 +52,36 @@ class BatchGenerationRequest(BaseModel):
     use_pattern_analysis: bool = True
 
 
+class PaperGenerationRequest(BaseModel):
+    """Request model for full paper generation"""
+    exam_type: str
+    blueprint: Optional[dict] = None
+    total_questions: Optional[int] = None
+    years: Optional[List[int]] = None
+    section_topics: Optional[Dict[str, List[str]]] = None
+    max_reused_fraction: float = 0.0
+
+
+class BatchValidationRequest(BaseModel):
+    """Request model for batch validation"""
+    questions: List[dict]
+    exam_type: str = "JEE"
+    questions_per_prompt: Optional[int] = None
+
+
+class BatchJobResponse(BaseModel):
+    """Response model for a submitted batch job"""
+    success: bool
+    job_id: str
+    status: str
+    message: str
+
+
 class GenerationResponse(BaseModel):
     """Response model for generation"""
     success: bool
     question: Optional[dict] = None
+    partial: bool = False
     message: str
 
 
@@ -50,22 +95,87 @@ class BatchGenerationResponse(BaseModel):
     message: str
 
 
+class PaperGenerationResponse(BaseModel):
+    """Response model for full paper generation"""
+    success: bool
+    exam_type: str
+    blueprint: dict
+    total_requested: int
+    total_questions: int
+    reused: int
+    failed: int
+    duplicates_removed: int
+    rounds: int
+    seconds: float
+    sections: List[dict]
+    message: str
+
+
+def _request_deadline(request: GenerationRequest, header_ms: Optional[int]) -> Optional[float]:
+    """
+    time.monotonic() deadline from the X-Request-Deadline-Ms header or the
+    deadline_ms body field (the tighter one wins), else the configured default
+    """
+    budgets = [ms for ms in (header_ms, request.deadline_ms) if ms and ms > 0]
+    if not budgets and settings.GENERATION_DEFAULT_DEADLINE_MS > 0:
+        budgets = [settings.GENERATION_DEFAULT_DEADLINE_MS]
+    if not budgets:
+        return None
+    return time.monotonic() + min(budgets) / 1000.0
+
+
+async def _load_context(request: GenerationRequest) -> Tuple[List[dict], List[dict]]:
+    """Context questions (explicit ids or best indexed matches) and the originality corpus"""
+    if request.context_question_ids:
+        context_questions = context_retriever.get_by_ids(request.context_question_ids)
+    else:
+        context_questions = await context_retriever.retrieve(
+            request.exam_type,
+            request.topic,
+            request.difficulty
+        )
+    
+    existing_questions = context_retriever.get_exam_questions(request.exam_type)
+    return context_questions, existing_questions
+
+
 @router.post("/single", response_model=GenerationResponse)
-async def generate_single_question(request: GenerationRequest):
+async def generate_single_question(
+    request: GenerationRequest,
+    deadline_ms: Optional[int] = Header(None, alias="X-Request-Deadline-Ms")
+):
     """
     Generate a single question using AI
     
     Args:
         request: Generation request
+        deadline_ms: Time budget in milliseconds; when it runs out the best
+            candidate so far is returned with partial=True
         
     Returns:
         Generated question
     """
+    # Student-facing: admitted ahead of batch work (each request has its own context)
+    request_priority.set(INTERACTIVE)
+    deadline = _request_deadline(request, deadline_ms)
+    
     try:
-        # TODO: Fetch context questions and existing questions from database
-        # For now, using placeholder
-        context_questions = []
-        existing_questions = []
+        # Serve from the warm pool when possible (refills happen in the background)
+        if settings.QUESTION_POOL_ENABLED:
+            pooled = await question_pool.get_question(
+                request.exam_type,
+                request.topic,
+                request.difficulty
+            )
+            if pooled:
+                pooled["served_from_pool"] = True
+                return GenerationResponse(
+                    success=True,
+                    question=pooled,
+                    message="Question served from pool"
+                )
+        
+        context_questions, existing_questions = await _load_context(request)
         pattern_analysis = None
         
         # Generate question
@@ -75,9 +185,18 @@ async def generate_single_question(request: GenerationRequest):
             exam_type=request.exam_type,
             context_questions=context_questions,
             existing_questions=existing_questions,
-            pattern_analysis=pattern_analysis
+            pattern_analysis=pattern_analysis,
+            candidates_per_call=request.candidates_per_call,
+            deadline=deadline
         )
         
+        if question and question.get("partial"):
+            return GenerationResponse(
+                success=True,
+                question=question,
+                partial=True,
+                message="Deadline reached; returning the best candidate so far"
+            )
         if question:
             return GenerationResponse(
                 success=True,
@@ -107,17 +226,13 @@ async def generate_batch_questions(request: BatchGenerationRequest):
         Batch generation results
     """
     try:
-        # TODO: Fetch context questions and existing questions from database
-        context_questions = []
-        existing_questions = []
+        # Context is retrieved per spec from the index inside the generator
         pattern_analysis = None
         
         # Generate questions
         results = await generator.generate_batch(
             specifications=request.specifications,
             exam_type=request.exam_type,
-            context_questions=context_questions,
-            existing_questions=existing_questions,
             pattern_analysis=pattern_analysis
         )
         
@@ -135,6 +250,269 @@ async def generate_batch_questions(request: BatchGenerationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/paper", response_model=PaperGenerationResponse)
+async def generate_paper(request: PaperGenerationRequest):
+    """
+    Generate a complete mock paper
+    
+    Without a blueprint, one is derived from the pattern report of the
+    indexed PYQs (total_questions, default PAPER_DEFAULT_QUESTIONS). All
+    sections are generated in parallel, near-duplicates across the paper
+    are replaced, and up to max_reused_fraction of the questions may be
+    taken from the bank.
+    
+    Args:
+        request: Paper generation request
+        
+    Returns:
+        Sections with their questions and timings, and the blueprint used
+    """
+    try:
+        blueprint = request.blueprint or await paper_generator.derive_blueprint(
+            request.exam_type,
+            request.total_questions or settings.PAPER_DEFAULT_QUESTIONS,
+            years=request.years,
+            section_topics=request.section_topics
+        )
+        
+        paper = await paper_generator.generate_paper(
+            exam_type=request.exam_type,
+            blueprint=blueprint,
+            max_reused_fraction=request.max_reused_fraction
+        )
+        
+        return PaperGenerationResponse(
+            success=paper["failed"] == 0,
+            blueprint=blueprint,
+            message=(
+                f"Paper generated: {paper['total_questions']}/{paper['total_requested']} questions "
+                f"in {paper['seconds']:.1f}s"
+            ),
+            **paper
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating paper: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/single/stream")
+async def stream_single_question(
+    request: GenerationRequest,
+    deadline_ms: Optional[int] = Header(None, alias="X-Request-Deadline-Ms")
+):
+    """
+    Generate a single question, streaming progress as server-sent events
+    
+    Emits `attempt` and `originality` events while retrying, then one
+    `result` event (or `error`).
+    
+    Args:
+        request: Generation request
+        deadline_ms: Time budget in milliseconds (see /single)
+        
+    Returns:
+        text/event-stream response
+    """
+    request_priority.set(INTERACTIVE)
+    deadline = _request_deadline(request, deadline_ms)
+    context_questions, existing_questions = await _load_context(request)
+    pattern_analysis = None
+    
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def on_progress(event: dict) -> None:
+        await events.put(event)
+    
+    async def run() -> None:
+        try:
+            question = await generator.generate_question(
+                topic=request.topic,
+                difficulty=request.difficulty,
+                exam_type=request.exam_type,
+                context_questions=context_questions,
+                existing_questions=existing_questions,
+                pattern_analysis=pattern_analysis,
+                candidates_per_call=request.candidates_per_call,
+                progress_callback=on_progress,
+                deadline=deadline
+            )
+            await events.put({
+                "event": "result",
+                "success": question is not None,
+                "question": question,
+                "partial": bool(question and question.get("partial")),
+                "message": (
+                    "Question generated successfully" if question
+                    else "Failed to generate question"
+                )
+            })
+        except Exception as e:
+            logger.error(f"Error generating question: {str(e)}")
+            await events.put({"event": "error", "message": str(e)})
+        finally:
+            await events.put(None)
+    
+    async def stream():
+        task = asyncio.create_task(run())
+        try:
+            while (event := await events.get()) is not None:
+                name = event.pop("event")
+                yield _sse_event(name, event)
+        finally:
+            # Client disconnected before the result: stop generating
+            task.cancel()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/batch/stream")
+async def stream_batch_questions(request: BatchGenerationRequest):
+    """
+    Generate multiple questions, streaming each one as server-sent events
+    the moment it passes the originality check
+    
+    Emits `start`, then `question` / `failed` per specification in completion
+    order (each with its `spec_index`), then `complete` with the totals.
+    
+    Args:
+        request: Batch generation request
+        
+    Returns:
+        text/event-stream response
+    """
+    # Context is retrieved per spec from the index inside the generator
+    pattern_analysis = None
+    
+    async def stream():
+        total = len(request.specifications)
+        successful = 0
+        failed = 0
+        
+        yield _sse_event("start", {"total_requested": total})
+        
+        try:
+            async for index, question in generator.generate_batch_stream(
+                specifications=request.specifications,
+                exam_type=request.exam_type,
+                pattern_analysis=pattern_analysis
+            ):
+                if question:
+                    successful += 1
+                    yield _sse_event("question", {"spec_index": index, "question": question})
+                else:
+                    failed += 1
+                    yield _sse_event("failed", {"spec_index": index})
+        except Exception as e:
+            logger.error(f"Error in batch generation: {str(e)}")
+            yield _sse_event("error", {"message": str(e)})
+        
+        yield _sse_event("complete", {
+            "total_requested": total,
+            "successful": successful,
+            "failed": failed,
+            "message": f"Batch generation complete: {successful} successful"
+        })
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.post("/jobs", response_model=BatchJobResponse)
+async def submit_batch_job(request: BatchGenerationRequest):
+    """
+    Start batch generation as a background job
+    
+    Every finished question is checkpointed, so the job survives client
+    disconnects and resumes after a worker restart.
+    
+    Args:
+        request: Batch generation request
+        
+    Returns:
+        Job id and initial status
+    """
+    try:
+        job_id = await batch_jobs.submit(request.specifications, request.exam_type)
+        
+        return BatchJobResponse(
+            success=True,
+            job_id=job_id,
+            status="queued",
+            message=f"Batch job queued with {len(request.specifications)} questions"
+        )
+        
+    except Exception as e:
+        logger.error(f"Error submitting batch job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/jobs/{job_id}")
+async def get_batch_job(job_id: str):
+    """
+    Progress of a batch job
+    
+    Args:
+        job_id: Job id
+        
+    Returns:
+        Status and completed/successful/failed counts
+    """
+    progress = await batch_jobs.get_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {"success": True, **progress}
+
+
+@router.get("/jobs/{job_id}/results")
+async def get_batch_job_results(job_id: str):
+    """
+    Questions generated so far by a batch job (partial while it runs)
+    
+    Args:
+        job_id: Job id
+        
+    Returns:
+        Checkpointed questions in specification order
+    """
+    questions = await batch_jobs.get_results(job_id)
+    if questions is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    progress = await batch_jobs.get_progress(job_id)
+    
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": progress["status"],
+        "questions": questions
+    }
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_batch_job(job_id: str):
+    """
+    Cancel a batch job, keeping the questions checkpointed so far
+    
+    Args:
+        job_id: Job id
+        
+    Returns:
+        Cancellation result
+    """
+    if not await batch_jobs.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {"success": True, "job_id": job_id, "message": "Job cancelled"}
+
+
 @router.post("/validate")
 async def validate_question(question: dict, exam_type: str = "JEE"):
     """
@@ -147,6 +525,8 @@ async def validate_question(question: dict, exam_type: str = "JEE"):
     Returns:
         Validation result
     """
+    request_priority.set(INTERACTIVE)
+    
     try:
         validation = await generator.validate_generated_question(question, exam_type)
         
@@ -158,3 +538,91 @@ async def validate_question(question: dict, exam_type: str = "JEE"):
     except Exception as e:
         logger.error(f"Error validating question: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/validate/batch")
+async def validate_questions_batch(request: BatchValidationRequest):
+    """
+    Validate several questions, reviewing a few per LLM call
+    
+    Args:
+        request: Questions to validate
+        
+    Returns:
+        Validation results in request order
+    """
+    try:
+        validations = await generator.validate_batch(
+            request.questions,
+            request.exam_type,
+            questions_per_prompt=request.questions_per_prompt
+        )
+        
+        return {
+            "success": True,
+            "total": len(validations),
+            "valid": sum(1 for v in validations if v.get("is_valid")),
+            "validations": validations
+        }
+        
+    except Exception as e:
+        logger.error(f"Error validating questions: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stats")
+async def generation_stats():
+    """
+    Runtime counters for the generation pipeline
+    
+    Returns:
+        LLM attempts vs accepted questions, cascade stats
+        (short-circuited vs embedding checks, embedding
+        comparisons done vs saved), embedding coalescer stats (batches
+        sent, average batch size), per-deployment
+        routing stats (requests, failovers, latency, throttling and 429
+        pauses), LLM call resilience counters
+        (retries, timeouts, circuit state, hedges), queue depth and wait
+        time per LLM priority class, context index size and
+        lookups, token usage, validation cache hits and warm pool stats
+    """
+    return {
+        "success": True,
+        "generation": generation_telemetry.get_stats(),
+        "cascade": generator.similarity_checker.get_cascade_stats(),
+        "embedding_coalescer": generator.similarity_checker.coalescer.get_stats(),
+        "deployments": generator.client.get_deployment_stats(),
+        "resilience": generator.client.get_resilience_stats(),
+        "admission": generator.client.get_admission_stats(),
+        "context_index": context_retriever.get_stats(),
+        "token_usage": generator.get_token_stats(),
+        "validation_cache": {
+            "hits": generator.validation_cache.hits,
+            "misses": generator.validation_cache.misses
+        },
+        "question_pool": await question_pool.get_stats() if settings.QUESTION_POOL_ENABLED else None
+    }
+
+
+@router.get("/telemetry")
+async def generation_telemetry_summary(last_n: int = 100):
+    """
+    Summary of the most recent generations
+    
+    Args:
+        last_n: Number of recent generations to summarize
+        
+    Returns:
+        Outcomes, attempts, tokens, cost, stage latency percentiles and the
+        topic/difficulty keys burning the most attempts and money
+    """
+    return {
+        "success": True,
+        **generation_telemetry.summary(last_n)
+    }
+
+
+@router.get("/telemetry/metrics", response_class=PlainTextResponse)
+async def generation_telemetry_metrics():
+    """Generation counters and histograms in Prometheus text format"""
+    return generation_telemetry.prometheus()
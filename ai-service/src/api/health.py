@@ -5,6 +5,8 @@ from fastapi import APIRouter
 from datetime import datetime
 import logging
 
+from src.services.llm_client import llm_client
+
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
@@ -13,10 +15,14 @@ router = APIRouter()
 async def health_check():
     """
     Health check endpoint
-    Returns service status and timestamp
+    Returns service status, timestamp and LLM circuit breaker states
     """
+    resilience = llm_client.get_resilience_stats()
+    circuits = {name: stats["circuit_state"] for name, stats in resilience.items()}
+    
     return {
-        "status": "ok",
+        "status": "ok" if all(state == "closed" for state in circuits.values()) else "degraded",
         "service": "ai-service",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.utcnow().isoformat(),
+        "llm_circuits": circuits
     }
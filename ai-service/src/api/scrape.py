@@ -8,6 +8,8 @@ import logging
 
 from src.services.scraper import PDFScraperService
 from src.services.parser import QuestionParserService
+from src.services.deduplicator import near_duplicate_detector
+from src.services.context_retriever import context_retriever
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,6 +17,7 @@ router = APIRouter()
 # Initialize services
 scraper = PDFScraperService()
 parser = QuestionParserService()
+deduplicator = near_duplicate_detector
 
 
 class ScrapeRequest(BaseModel):
@@ -30,6 +33,7 @@ class ScrapeResponse(BaseModel):
     success: bool
     total_questions: int
     questions: List[dict]
+    duplicates_found: int = 0
     message: str
 
 
@@ -38,7 +42,8 @@ async def scrape_uploaded_pdf(
     file: UploadFile = File(...),
     exam_type: str = "JEE",
     year: int = 2024,
-    session: Optional[str] = None
+    session: Optional[str] = None,
+    merge_duplicates: bool = False
 ):
     """
     Upload and scrape a PDF file
@@ -48,6 +53,7 @@ async def scrape_uploaded_pdf(
         exam_type: Type of exam
         year: Year of exam
         session: Session name
+        merge_duplicates: Drop near-duplicates instead of flagging them
         
     Returns:
         Scraped questions
@@ -77,11 +83,28 @@ async def scrape_uploaded_pdf(
                 exam_type
             )
             
+            # Flag (or merge) repeats from other sessions and reprints
+            dedup_result = deduplicator.deduplicate(
+                parsed_questions,
+                merge=merge_duplicates
+            )
+            parsed_questions = dedup_result["questions"]
+            
+            # Newly scraped questions become generation context right away
+            context_retriever.add_questions(
+                [q for q in parsed_questions if not q.get("is_duplicate")],
+                exam_type=exam_type
+            )
+            
             return ScrapeResponse(
                 success=True,
                 total_questions=len(parsed_questions),
                 questions=parsed_questions,
-                message=f"Successfully scraped {len(parsed_questions)} questions"
+                duplicates_found=dedup_result["duplicates_found"],
+                message=(
+                    f"Successfully scraped {len(parsed_questions)} questions "
+                    f"({dedup_result['duplicates_found']} near-duplicates)"
+                )
             )
             
         finally:
@@ -1,8 +1,9 @@
 """
 Application settings - environment variables and configuration
 """
+import json
 import os
-from typing import List
+from typing import Any, Dict, List
 from pydantic_settings import BaseSettings
 
 
@@ -39,6 +40,113 @@ class Settings(BaseSettings):
         "text-embedding-ada-002"
     )
     
+    # Several deployments/endpoints to route calls across (JSON list of
+    # {"name", "endpoint", "api_key", "api_version", "chat_deployment",
+    # "embedding_deployment", "weight", "rpm_limit", "tpm_limit"}; missing
+    # fields fall back to the single-deployment settings above)
+    AZURE_OPENAI_DEPLOYMENTS: List[Dict[str, Any]] = json.loads(
+        os.getenv("AZURE_OPENAI_DEPLOYMENTS", "[]")
+    )
+    # Smoothing of the per-deployment latency estimate used for routing
+    LLM_LATENCY_EWMA_ALPHA: float = float(os.getenv("LLM_LATENCY_EWMA_ALPHA", "0.3"))
+    
+    # Shared LLM client (connection pool and concurrency limits)
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+    LLM_REQUEST_TIMEOUT_SECONDS: float = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+    LLM_MAX_CONCURRENT_CHAT: int = int(os.getenv("LLM_MAX_CONCURRENT_CHAT", "16"))
+    LLM_MAX_CONCURRENT_EMBEDDINGS: int = int(os.getenv("LLM_MAX_CONCURRENT_EMBEDDINGS", "32"))
+    
+    # Priority classes for LLM calls: interactive (/single), batch (/batch,
+    # jobs) and background (pool refills). Weights share contended slots;
+    # reserved slots are held back for interactive calls only.
+    LLM_PRIORITY_WEIGHTS: Dict[str, float] = json.loads(os.getenv(
+        "LLM_PRIORITY_WEIGHTS",
+        '{"interactive": 8, "batch": 2, "background": 1}'
+    ))
+    LLM_DEFAULT_PRIORITY: str = os.getenv("LLM_DEFAULT_PRIORITY", "batch")
+    LLM_RESERVED_INTERACTIVE_CHAT: int = int(os.getenv("LLM_RESERVED_INTERACTIVE_CHAT", "4"))
+    LLM_RESERVED_INTERACTIVE_EMBEDDINGS: int = int(
+        os.getenv("LLM_RESERVED_INTERACTIVE_EMBEDDINGS", "8")
+    )
+    
+    # Chat deployment quota (0 disables the limit) and 429 handling
+    AZURE_OPENAI_RPM_LIMIT: int = int(os.getenv("AZURE_OPENAI_RPM_LIMIT", "0"))
+    AZURE_OPENAI_TPM_LIMIT: int = int(os.getenv("AZURE_OPENAI_TPM_LIMIT", "0"))
+    LLM_RATE_LIMIT_RETRIES: int = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+    
+    # LLM call resilience (per-attempt timeouts, backoff, breaker, hedging)
+    LLM_CHAT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_CHAT_TIMEOUT_SECONDS", "30"))
+    LLM_EMBEDDING_TIMEOUT_SECONDS: float = float(os.getenv("LLM_EMBEDDING_TIMEOUT_SECONDS", "10"))
+    LLM_CALL_DEADLINE_SECONDS: float = float(os.getenv("LLM_CALL_DEADLINE_SECONDS", "60"))
+    LLM_MAX_ATTEMPTS: int = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+    LLM_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+    LLM_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+    LLM_BREAKER_RECOVERY_SECONDS: float = float(os.getenv("LLM_BREAKER_RECOVERY_SECONDS", "30"))
+    LLM_HEDGE_DELAY_SECONDS: float = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "0"))  # 0 = off
+    # Ask streamed completions for a final usage chunk (api-version 2024-09-01-preview
+    # or later); otherwise streamed token usage is estimated from the text
+    LLM_STREAM_INCLUDE_USAGE: bool = (
+        os.getenv("LLM_STREAM_INCLUDE_USAGE", "false").lower() == "true"
+    )
+    
+    # Batch generation
+    BATCH_GENERATION_CONCURRENCY: int = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "8"))
+    
+    # Generation telemetry (cost estimate per 1K tokens, USD)
+    TELEMETRY_BUFFER_SIZE: int = int(os.getenv("TELEMETRY_BUFFER_SIZE", "1000"))
+    LLM_PROMPT_COST_PER_1K: float = float(os.getenv("LLM_PROMPT_COST_PER_1K", "0.03"))
+    LLM_COMPLETION_COST_PER_1K: float = float(os.getenv("LLM_COMPLETION_COST_PER_1K", "0.06"))
+    
+    # Full mock papers (/paper): size of a derived blueprint, hard cap, and
+    # how many times slots left by failures or cross-paper duplicates are retried
+    PAPER_DEFAULT_QUESTIONS: int = int(os.getenv("PAPER_DEFAULT_QUESTIONS", "90"))
+    PAPER_MAX_QUESTIONS: int = int(os.getenv("PAPER_MAX_QUESTIONS", "300"))
+    PAPER_REGENERATION_ROUNDS: int = int(os.getenv("PAPER_REGENERATION_ROUNDS", "2"))
+    
+    # Background batch jobs, checkpointed per question
+    BATCH_JOB_BACKEND: str = os.getenv("BATCH_JOB_BACKEND", "sqlite")  # sqlite | redis
+    BATCH_JOB_DB_PATH: str = os.getenv("BATCH_JOB_DB_PATH", "data/batch_jobs.db")
+    BATCH_JOB_RESUME_ON_STARTUP: bool = (
+        os.getenv("BATCH_JOB_RESUME_ON_STARTUP", "true").lower() == "true"
+    )
+    # A worker renews its lease on a running job every third of this; the
+    # job is only picked up elsewhere once the lease expires
+    BATCH_JOB_LEASE_SECONDS: float = float(os.getenv("BATCH_JOB_LEASE_SECONDS", "60"))
+    
+    # PYQ bank used as generation context (JSON/JSONL file or directory)
+    PYQ_BANK_PATH: str = os.getenv("PYQ_BANK_PATH", "")
+    PYQ_BANK_REFRESH_SECONDS: int = int(os.getenv("PYQ_BANK_REFRESH_SECONDS", "0"))  # 0 = off
+    CONTEXT_TOP_K: int = int(os.getenv("CONTEXT_TOP_K", "5"))
+    CONTEXT_EMBEDDING_FALLBACK: bool = (
+        os.getenv("CONTEXT_EMBEDDING_FALLBACK", "true").lower() == "true"
+    )
+    CONTEXT_TOPIC_MIN_SIMILARITY: float = float(os.getenv("CONTEXT_TOPIC_MIN_SIMILARITY", "0.5"))
+    
+    # Warm pool of pre-generated questions
+    QUESTION_POOL_ENABLED: bool = os.getenv("QUESTION_POOL_ENABLED", "false").lower() == "true"
+    QUESTION_POOL_BACKEND: str = os.getenv("QUESTION_POOL_BACKEND", "memory")  # memory | redis
+    # JSON list of {"exam_type", "topic", "difficulty", "target", "low_water", "ttl_seconds"}
+    QUESTION_POOL_KEYS: List[Dict[str, Any]] = json.loads(os.getenv("QUESTION_POOL_KEYS", "[]"))
+    QUESTION_POOL_DEFAULT_TARGET: int = int(os.getenv("QUESTION_POOL_DEFAULT_TARGET", "10"))
+    QUESTION_POOL_DEFAULT_LOW_WATER: int = int(os.getenv("QUESTION_POOL_DEFAULT_LOW_WATER", "3"))
+    QUESTION_POOL_DEFAULT_TTL_SECONDS: int = int(
+        os.getenv("QUESTION_POOL_DEFAULT_TTL_SECONDS", "86400")
+    )
+    QUESTION_POOL_MAX_KEYS: int = int(os.getenv("QUESTION_POOL_MAX_KEYS", "200"))
+    # Unlisted keys become hot after this many requests within the window
+    # (0 = only QUESTION_POOL_KEYS are pooled)
+    QUESTION_POOL_PROMOTE_REQUESTS: int = int(os.getenv("QUESTION_POOL_PROMOTE_REQUESTS", "3"))
+    QUESTION_POOL_PROMOTE_WINDOW_SECONDS: int = int(
+        os.getenv("QUESTION_POOL_PROMOTE_WINDOW_SECONDS", "600")
+    )
+    QUESTION_POOL_VALIDATE: bool = os.getenv("QUESTION_POOL_VALIDATE", "true").lower() == "true"
+    QUESTION_POOL_REFILL_LOCK_SECONDS: int = int(
+        os.getenv("QUESTION_POOL_REFILL_LOCK_SECONDS", "300")
+    )
+    
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     
@@ -53,6 +161,59 @@ class Settings(BaseSettings):
     MAX_SIMILARITY_THRESHOLD: float = 0.9  # Max 90% similarity to existing questions
     MIN_SIMILARITY_THRESHOLD: float = 0.3  # Min 30% similarity for context relevance
     MAX_GENERATION_RETRIES: int = 3
+    VALIDATE_WITH_ORIGINALITY: bool = (
+        os.getenv("VALIDATE_WITH_ORIGINALITY", "false").lower() == "true"
+    )
+    VALIDATION_BATCH_SIZE: int = int(os.getenv("VALIDATION_BATCH_SIZE", "5"))
+    VALIDATION_CONCURRENCY: int = int(os.getenv("VALIDATION_CONCURRENCY", "4"))
+    VALIDATION_CACHE_SIZE: int = int(os.getenv("VALIDATION_CACHE_SIZE", "10000"))
+    PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "2000"))
+    CONTEXT_EXAMPLE_CONDENSED_TOKENS: int = int(os.getenv("CONTEXT_EXAMPLE_CONDENSED_TOKENS", "80"))
+    OUTPUT_MAX_TOKENS_BY_TYPE: Dict[str, int] = json.loads(os.getenv(
+        "OUTPUT_MAX_TOKENS_BY_TYPE",
+        '{"SINGLE_CHOICE": 700, "MULTIPLE_CHOICE": 800, "ASSERTION_REASON": 800, "NUMERICAL": 500}'
+    ))
+    OUTPUT_MAX_TOKENS_DEFAULT: int = int(os.getenv("OUTPUT_MAX_TOKENS_DEFAULT", "1000"))
+    TOKENIZER_ENCODING: str = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+    PROMPT_SECTION_CACHE_SIZE: int = int(os.getenv("PROMPT_SECTION_CACHE_SIZE", "1024"))
+    # Retries see the drafts rejected so far and run progressively hotter
+    ORIGINALITY_FEEDBACK: bool = os.getenv("ORIGINALITY_FEEDBACK", "true").lower() == "true"
+    ORIGINALITY_FEEDBACK_MAX_EXAMPLES: int = int(
+        os.getenv("ORIGINALITY_FEEDBACK_MAX_EXAMPLES", "3")
+    )
+    ORIGINALITY_FEEDBACK_TOKENS_PER_EXAMPLE: int = int(
+        os.getenv("ORIGINALITY_FEEDBACK_TOKENS_PER_EXAMPLE", "120")
+    )
+    GENERATION_TEMPERATURE_SCHEDULE: List[float] = json.loads(
+        os.getenv("GENERATION_TEMPERATURE_SCHEDULE", "[0.8, 0.95, 1.1]")
+    )
+    # Time budget for /single when the caller sends none (0 = unbounded)
+    GENERATION_DEFAULT_DEADLINE_MS: int = int(os.getenv("GENERATION_DEFAULT_DEADLINE_MS", "0"))
+    # Batch specs with the same topic and difficulty share one completion
+    # returning up to this many questions (1 disables grouping)
+    GROUPED_GENERATION_MAX_QUESTIONS: int = int(os.getenv("GROUPED_GENERATION_MAX_QUESTIONS", "5"))
+    GENERATION_CANDIDATES_PER_CALL: int = int(os.getenv("GENERATION_CANDIDATES_PER_CALL", "1"))
+    # Stream single-candidate completions and start the originality check as
+    # soon as question_text is complete, cancelling the stream if it is a copy
+    GENERATION_STREAMING: bool = os.getenv("GENERATION_STREAMING", "false").lower() == "true"
+    ORIGINALITY_EARLY_EXIT: bool = os.getenv("ORIGINALITY_EARLY_EXIT", "false").lower() == "true"
+    ORIGINALITY_BLOCK_SIZE: int = int(os.getenv("ORIGINALITY_BLOCK_SIZE", "64"))
+    
+    # Lexical-then-semantic cascade for originality checks
+    ORIGINALITY_CASCADE: bool = os.getenv("ORIGINALITY_CASCADE", "false").lower() == "true"
+    CASCADE_SHORTLIST_SIZE: int = int(os.getenv("CASCADE_SHORTLIST_SIZE", "100"))
+    CASCADE_MIN_LEXICAL_SCORE: float = float(os.getenv("CASCADE_MIN_LEXICAL_SCORE", "0.05"))
+    
+    # Embeddings
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+    EMBEDDING_COALESCE_WINDOW_MS: float = float(os.getenv("EMBEDDING_COALESCE_WINDOW_MS", "5"))
+    
+    # Near-duplicate detection at ingestion (MinHash/LSH)
+    DEDUP_NUM_PERMUTATIONS: int = int(os.getenv("DEDUP_NUM_PERMUTATIONS", "128"))
+    DEDUP_LSH_BANDS: int = int(os.getenv("DEDUP_LSH_BANDS", "16"))
+    DEDUP_SHINGLE_SIZE: int = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+    DEDUP_JACCARD_THRESHOLD: float = float(os.getenv("DEDUP_JACCARD_THRESHOLD", "0.8"))
     
     # Scraping settings
     TESSERACT_PATH: str = os.getenv("TESSERACT_PATH", "tesseract")
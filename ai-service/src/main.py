@@ -2,6 +2,7 @@
 EduTech AI Service - FastAPI Application
 Handles PDF scraping, question parsing, pattern analysis, and AI question generation
 """
+import asyncio
 import sys
 from pathlib import Path
 
@@ -17,6 +18,9 @@ import logging
 from src.config.settings import settings
 from src.config.logging_config import setup_logging
 from src.api import health, scrape, generate
+from src.services.llm_client import llm_client
+from src.services.context_retriever import context_retriever
+from src.services.token_budgeter import load_encoding
 
 # Setup logging
 setup_logging()
@@ -27,9 +31,26 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     logger.info("Starting EduTech AI Service...")
-    # Startup logic here
+    await asyncio.to_thread(load_encoding)
+    await llm_client.startup()
+    await context_retriever.start()
+    if settings.ORIGINALITY_CASCADE:
+        for exam_type in context_retriever.get_exam_types():
+            await generate.generator.similarity_checker.get_lexical_index(
+                context_retriever.get_exam_questions(exam_type),
+                exam_type,
+                context_retriever.get_version(exam_type)
+            )
+    if settings.QUESTION_POOL_ENABLED:
+        await generate.question_pool.start()
+    if settings.BATCH_JOB_RESUME_ON_STARTUP:
+        await generate.batch_jobs.resume()
     yield
-    # Shutdown logic here
+    await generate.batch_jobs.stop()
+    if settings.QUESTION_POOL_ENABLED:
+        await generate.question_pool.stop()
+    await context_retriever.stop()
+    await llm_client.shutdown()
     logger.info("Shutting down EduTech AI Service...")
 
 
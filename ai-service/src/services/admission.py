@@ -0,0 +1,193 @@
+"""
+Admission Scheduler - Priority classes in front of the shared LLM clients
+Interactive requests, batch runs and background refills share one Azure
+deployment. Calls wait in per-class queues and are admitted by weighted fair
+queuing, with slots reserved for interactive traffic so a large batch cannot
+push student-facing latency up
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from src.config.settings import settings
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+
+# Priority class of the work running in the current task (None: the default)
+request_priority: ContextVar[Optional[str]] = ContextVar("request_priority", default=None)
+
+
+@contextmanager
+def priority_scope(priority: str) -> Iterator[None]:
+    """Run a block (and the tasks it creates) under a priority class"""
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+def current_priority() -> str:
+    """Priority class of the current task"""
+    return request_priority.get() or settings.LLM_DEFAULT_PRIORITY
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class AdmissionScheduler:
+    """
+    Concurrency limit with per-class queues
+    
+    Each admission advances the class's virtual time by 1 / weight and the
+    backlogged class with the lowest virtual time goes next, so under
+    contention classes get slots in proportion to their weights. Reserved
+    slots can only be used by their class: other classes share what is left.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        weights: Dict[str, float],
+        reserved: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            name: Name used in stats
+            capacity: Maximum calls in flight
+            weights: Share of admissions per priority class under contention
+            reserved: Slots per class that other classes may not use
+        """
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.weights = {cls: max(float(weight), 1e-6) for cls, weight in weights.items()}
+        self.reserved = {
+            cls: slots for cls, slots in (reserved or {}).items() if cls in self.weights
+        }
+        # Never reserve the whole capacity away from everyone else
+        self.shared_capacity = max(1, self.capacity - sum(self.reserved.values()))
+        
+        self._queues: Dict[str, Deque[asyncio.Future]] = {cls: deque() for cls in self.weights}
+        self._virtual_time: Dict[str, float] = {cls: 0.0 for cls in self.weights}
+        self._in_flight: Dict[str, int] = {cls: 0 for cls in self.weights}
+        self._waits: Dict[str, Deque[float]] = {cls: deque(maxlen=1000) for cls in self.weights}
+        self.stats: Dict[str, Dict[str, Any]] = {
+            cls: {"admitted": 0, "max_queued": 0, "wait_seconds": 0.0} for cls in self.weights
+        }
+    
+    def _class_of(self, priority: Optional[str]) -> str:
+        """Known priority class for a call (unknown classes get the lowest weight)"""
+        priority = priority or current_priority()
+        if priority in self.weights:
+            return priority
+        return min(self.weights, key=self.weights.get)
+    
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Hold one slot for the duration of the block
+        
+        Args:
+            priority: Priority class (default: the current task's class)
+        """
+        cls = self._class_of(priority)
+        started = time.monotonic()
+        
+        queue = self._queues[cls]
+        if not queue:
+            # A class returning from idle gets no credit for the time it was idle
+            backlogged = [self._virtual_time[c] for c, q in self._queues.items() if q]
+            if backlogged:
+                self._virtual_time[cls] = max(self._virtual_time[cls], min(backlogged))
+        
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self.stats[cls]["max_queued"] = max(self.stats[cls]["max_queued"], len(queue))
+        self._dispatch()
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the waiter was cancelled: give the slot back
+                self._release(cls)
+            elif future in queue:
+                queue.remove(future)
+            raise
+        
+        waited = time.monotonic() - started
+        self._waits[cls].append(waited)
+        self.stats[cls]["wait_seconds"] += waited
+        
+        try:
+            yield
+        finally:
+            self._release(cls)
+    
+    def _can_admit(self, cls: str) -> bool:
+        if sum(self._in_flight.values()) >= self.capacity:
+            return False
+        if self._in_flight[cls] < self.reserved.get(cls, 0):
+            return True
+        
+        shared_in_use = sum(
+            max(0, count - self.reserved.get(c, 0)) for c, count in self._in_flight.items()
+        )
+        return shared_in_use < self.shared_capacity
+    
+    def _dispatch(self) -> None:
+        """Admit queued callers while slots are free, lowest virtual time first"""
+        while True:
+            ready = [cls for cls, queue in self._queues.items() if queue and self._can_admit(cls)]
+            if not ready:
+                return
+            
+            cls = min(ready, key=lambda c: self._virtual_time[c])
+            future = self._queues[cls].popleft()
+            if future.done():
+                # Waiter cancelled before its task got to dequeue it
+                continue
+            
+            self._in_flight[cls] += 1
+            self._virtual_time[cls] += 1.0 / self.weights[cls]
+            self.stats[cls]["admitted"] += 1
+            future.set_result(None)
+    
+    def _release(self, cls: str) -> None:
+        self._in_flight[cls] -= 1
+        self._dispatch()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight calls and wait times per priority class"""
+        classes = {}
+        for cls in self.weights:
+            waits = list(self._waits[cls])
+            admitted = self.stats[cls]["admitted"]
+            classes[cls] = {
+                "weight": self.weights[cls],
+                "reserved": self.reserved.get(cls, 0),
+                "queued": len(self._queues[cls]),
+                "in_flight": self._in_flight[cls],
+                "admitted": admitted,
+                "max_queued": self.stats[cls]["max_queued"],
+                "avg_wait_seconds": self.stats[cls]["wait_seconds"] / admitted if admitted else 0.0,
+                "p50_wait_seconds": _percentile(waits, 50),
+                "p95_wait_seconds": _percentile(waits, 95),
+            }
+        
+        return {
+            "name": self.name,
+            "capacity": self.capacity,
+            "in_flight": sum(self._in_flight.values()),
+            "classes": classes,
+        }
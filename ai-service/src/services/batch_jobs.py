@@ -0,0 +1,550 @@
+"""
+Batch Job Service - Checkpointed background batch generation
+Runs batch generation outside the HTTP request, checkpointing every finished
+question to durable storage so a restarted worker resumes where it stopped
+instead of paying for the same LLM calls again
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional
+import redis.asyncio as aioredis
+
+from src.config.settings import settings
+from src.services.admission import BATCH, priority_scope
+
+logger = logging.getLogger(__name__)
+
+# Jobs in these states are picked up again after a restart
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class BatchJobStore(ABC):
+    """Durable storage for batch jobs and their checkpoints"""
+    
+    @abstractmethod
+    async def create_job(self, job: Dict[str, Any]) -> None:
+        """Persist a new job"""
+    
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Load a job's metadata"""
+    
+    @abstractmethod
+    async def update_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        """Change a job's status"""
+    
+    @abstractmethod
+    async def save_result(
+        self, job_id: str, spec_index: int, question: Optional[Dict[str, Any]]
+    ) -> None:
+        """Checkpoint one finished specification (None when it failed)"""
+    
+    @abstractmethod
+    async def get_results(self, job_id: str) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Checkpointed results by specification index"""
+    
+    @abstractmethod
+    async def list_active_jobs(self) -> List[str]:
+        """Ids of jobs that have not finished"""
+    
+    @abstractmethod
+    async def claim(self, job_id: str, owner: str, ttl: float) -> bool:
+        """
+        Atomically take (or renew) the lease on a job
+        
+        Succeeds when the job is unleased, its lease expired, or owner
+        already holds it; the lease then runs for ttl seconds.
+        """
+    
+    @abstractmethod
+    async def release(self, job_id: str, owner: str) -> None:
+        """Drop the lease if owner holds it"""
+    
+    async def close(self) -> None:
+        """Release backend resources"""
+
+
+class SQLiteJobStore(BatchJobStore):
+    """Local SQLite file (single host)"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database and create the tables on first use"""
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS batch_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    exam_type TEXT NOT NULL,
+                    specifications TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS batch_job_results (
+                    job_id TEXT NOT NULL,
+                    spec_index INTEGER NOT NULL,
+                    question TEXT,
+                    PRIMARY KEY (job_id, spec_index)
+                );
+                CREATE TABLE IF NOT EXISTS batch_job_leases (
+                    job_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def _execute(self, sql: str, params: tuple = (), fetch: bool = False) -> Any:
+        """Run one statement: fetched rows, or the number of rows changed"""
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(sql, params)
+            if fetch:
+                return cursor.fetchall()
+            conn.commit()
+            return cursor.rowcount
+    
+    async def _run(self, sql: str, params: tuple = (), fetch: bool = False) -> Any:
+        # sqlite3 blocks, so keep it off the event loop
+        return await asyncio.to_thread(self._execute, sql, params, fetch)
+    
+    async def create_job(self, job: Dict[str, Any]) -> None:
+        await self._run(
+            "INSERT INTO batch_jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                job["job_id"], job["exam_type"], json.dumps(job["specifications"]),
+                job["status"], None, job["created_at"], job["updated_at"]
+            )
+        )
+    
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run("SELECT * FROM batch_jobs WHERE job_id = ?", (job_id,), fetch=True)
+        if not rows:
+            return None
+        
+        job = dict(rows[0])
+        job["specifications"] = json.loads(job["specifications"])
+        return job
+    
+    async def update_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        await self._run(
+            "UPDATE batch_jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+            (status, error, time.time(), job_id)
+        )
+    
+    async def save_result(
+        self, job_id: str, spec_index: int, question: Optional[Dict[str, Any]]
+    ) -> None:
+        payload = json.dumps(question, default=str) if question is not None else None
+        await self._run(
+            "INSERT OR REPLACE INTO batch_job_results VALUES (?, ?, ?)",
+            (job_id, spec_index, payload)
+        )
+    
+    async def get_results(self, job_id: str) -> Dict[int, Optional[Dict[str, Any]]]:
+        rows = await self._run(
+            "SELECT spec_index, question FROM batch_job_results WHERE job_id = ?",
+            (job_id,),
+            fetch=True
+        )
+        return {
+            row["spec_index"]: json.loads(row["question"]) if row["question"] is not None else None
+            for row in rows
+        }
+    
+    async def list_active_jobs(self) -> List[str]:
+        placeholders = ", ".join("?" for _ in ACTIVE_STATUSES)
+        rows = await self._run(
+            f"SELECT job_id FROM batch_jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+            ACTIVE_STATUSES,
+            fetch=True
+        )
+        return [row["job_id"] for row in rows]
+    
+    async def claim(self, job_id: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        # One statement, so competing processes cannot both win
+        changed = await self._run(
+            """
+            INSERT INTO batch_job_leases VALUES (?, ?, ?)
+            ON CONFLICT (job_id) DO UPDATE
+                SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE batch_job_leases.owner = excluded.owner
+                    OR batch_job_leases.expires_at < ?
+            """,
+            (job_id, owner, now + ttl, now)
+        )
+        return changed > 0
+    
+    async def release(self, job_id: str, owner: str) -> None:
+        await self._run(
+            "DELETE FROM batch_job_leases WHERE job_id = ? AND owner = ?",
+            (job_id, owner)
+        )
+    
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RedisJobStore(BatchJobStore):
+    """Redis-backed job store shared by all workers"""
+    
+    # Take the lease if free or already ours (atomic on the server)
+    _CLAIM_SCRIPT = """
+        local owner = redis.call("GET", KEYS[1])
+        if owner and owner ~= ARGV[1] then
+            return 0
+        end
+        redis.call("SET", KEYS[1], ARGV[1], "PX", ARGV[2])
+        return 1
+    """
+    _RELEASE_SCRIPT = """
+        if redis.call("GET", KEYS[1]) == ARGV[1] then
+            return redis.call("DEL", KEYS[1])
+        end
+        return 0
+    """
+    
+    def __init__(self, redis_url: str, prefix: str = "batch_job"):
+        self.redis = aioredis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+    
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
+    
+    async def create_job(self, job: Dict[str, Any]) -> None:
+        await self.redis.hset(self._key(job["job_id"]), mapping={
+            "job_id": job["job_id"],
+            "exam_type": job["exam_type"],
+            "specifications": json.dumps(job["specifications"]),
+            "status": job["status"],
+            "error": "",
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        })
+        await self.redis.zadd(f"{self.prefix}:active", {job["job_id"]: job["created_at"]})
+    
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = await self.redis.hgetall(self._key(job_id))
+        if not data:
+            return None
+        
+        data["specifications"] = json.loads(data["specifications"])
+        data["error"] = data.get("error") or None
+        data["created_at"] = float(data["created_at"])
+        data["updated_at"] = float(data["updated_at"])
+        return data
+    
+    async def update_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        await self.redis.hset(self._key(job_id), mapping={
+            "status": status,
+            "error": error or "",
+            "updated_at": time.time(),
+        })
+        if status not in ACTIVE_STATUSES:
+            await self.redis.zrem(f"{self.prefix}:active", job_id)
+    
+    async def save_result(
+        self, job_id: str, spec_index: int, question: Optional[Dict[str, Any]]
+    ) -> None:
+        await self.redis.hset(
+            f"{self._key(job_id)}:results",
+            str(spec_index),
+            json.dumps(question, default=str)
+        )
+    
+    async def get_results(self, job_id: str) -> Dict[int, Optional[Dict[str, Any]]]:
+        raw = await self.redis.hgetall(f"{self._key(job_id)}:results")
+        return {int(index): json.loads(value) for index, value in raw.items()}
+    
+    async def list_active_jobs(self) -> List[str]:
+        return list(await self.redis.zrange(f"{self.prefix}:active", 0, -1))
+    
+    async def claim(self, job_id: str, owner: str, ttl: float) -> bool:
+        claimed = await self.redis.eval(
+            self._CLAIM_SCRIPT, 1, f"{self._key(job_id)}:lease", owner, int(ttl * 1000)
+        )
+        return bool(claimed)
+    
+    async def release(self, job_id: str, owner: str) -> None:
+        await self.redis.eval(self._RELEASE_SCRIPT, 1, f"{self._key(job_id)}:lease", owner)
+    
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class BatchJobService:
+    """Service for running batch generation as resumable background jobs"""
+    
+    def __init__(self, generator: Any, store: Optional[BatchJobStore] = None):
+        """
+        Initialize the job runner
+        
+        Args:
+            generator: QuestionGeneratorService used to generate questions
+            store: Job storage backend (default from BATCH_JOB_BACKEND)
+        """
+        self.logger = logger
+        self.generator = generator
+        self.store = store or self._create_store()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+        # Lease owner id: workers sharing the store each run a job at most once
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = settings.BATCH_JOB_LEASE_SECONDS
+    
+    def _create_store(self) -> BatchJobStore:
+        """Pick the storage backend from settings"""
+        if settings.BATCH_JOB_BACKEND == "redis":
+            return RedisJobStore(settings.REDIS_URL)
+        return SQLiteJobStore(settings.BATCH_JOB_DB_PATH)
+    
+    async def submit(self, specifications: List[Dict[str, Any]], exam_type: str) -> str:
+        """
+        Persist a new batch job and start it in the background
+        
+        Args:
+            specifications: List of question specifications
+            exam_type: Type of exam
+            
+        Returns:
+            Job id
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        
+        await self.store.create_job({
+            "job_id": job_id,
+            "exam_type": exam_type,
+            "specifications": specifications,
+            "status": "queued",
+            "created_at": now,
+            "updated_at": now,
+        })
+        
+        self._start(job_id)
+        return job_id
+    
+    def _start(self, job_id: str) -> None:
+        running = self._tasks.get(job_id)
+        if running is not None and not running.done():
+            return
+        
+        with priority_scope(BATCH):
+            task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+    
+    async def _run(self, job_id: str) -> None:
+        """Run a job while holding its lease (skipped if another worker holds it)"""
+        if not await self.store.claim(job_id, self.worker_id, self.lease_seconds):
+            self.logger.debug(f"Batch job {job_id} is leased by another worker")
+            return
+        
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, asyncio.current_task()))
+        try:
+            await self._generate(job_id)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            await self.store.release(job_id, self.worker_id)
+    
+    async def _heartbeat(self, job_id: str, runner: asyncio.Task) -> None:
+        """Renew the lease; stop the runner if another worker took it over"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await self.store.claim(job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                # Transient store error: the lease is still valid, retry next beat
+                self.logger.error(f"Error renewing lease on batch job {job_id}: {str(e)}")
+                continue
+            if not renewed:
+                self.logger.warning(f"Lost the lease on batch job {job_id}, stopping")
+                runner.cancel()
+                return
+    
+    async def _is_cancelled(self, job_id: str) -> bool:
+        """Whether the job was cancelled (possibly by another worker)"""
+        job = await self.store.get_job(job_id)
+        return job is None or job["status"] == "cancelled"
+    
+    async def _generate(self, job_id: str) -> None:
+        """Generate every specification not yet checkpointed"""
+        job = await self.store.get_job(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return
+        
+        specifications = job["specifications"]
+        done = await self.store.get_results(job_id)
+        remaining = [i for i in range(len(specifications)) if i not in done]
+        
+        if done:
+            self.logger.info(
+                f"Resuming batch job {job_id}: "
+                f"{len(done)}/{len(specifications)} already checkpointed"
+            )
+        
+        await self.store.update_status(job_id, "running")
+        
+        try:
+            stream = self.generator.generate_batch_stream(
+                [specifications[i] for i in remaining],
+                job["exam_type"]
+            )
+            # Closing the stream cancels the generations still in flight
+            async with aclosing(stream):
+                async for local_index, question in stream:
+                    if await self._is_cancelled(job_id):
+                        self.logger.info(f"Batch job {job_id} was cancelled, stopping")
+                        return
+                    
+                    spec_index = remaining[local_index]
+                    if question:
+                        question["spec_index"] = spec_index
+                    await self.store.save_result(job_id, spec_index, question)
+            
+            if await self._is_cancelled(job_id):
+                return
+            await self.store.update_status(job_id, "completed")
+            self.logger.info(f"Batch job {job_id} completed")
+        
+        except asyncio.CancelledError:
+            # Shutdown or cancel(): status is left for the caller to decide
+            raise
+        except Exception as e:
+            self.logger.error(f"Batch job {job_id} failed: {str(e)}")
+            await self.store.update_status(job_id, "failed", error=str(e))
+    
+    async def get_progress(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Status and counts for a job
+        
+        Args:
+            job_id: Job id
+            
+        Returns:
+            Progress summary or None if the job does not exist
+        """
+        job = await self.store.get_job(job_id)
+        if job is None:
+            return None
+        
+        results = await self.store.get_results(job_id)
+        successful = sum(1 for q in results.values() if q is not None)
+        
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "exam_type": job["exam_type"],
+            "total_requested": len(job["specifications"]),
+            "completed": len(results),
+            "successful": successful,
+            "failed": len(results) - successful,
+            "error": job.get("error"),
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+    
+    async def get_results(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Questions checkpointed so far, in specification order (None if no such job)"""
+        if await self.store.get_job(job_id) is None:
+            return None
+        
+        results = await self.store.get_results(job_id)
+        return [results[i] for i in sorted(results) if results[i] is not None]
+    
+    async def cancel(self, job_id: str) -> bool:
+        """
+        Stop a job, keeping the questions checkpointed so far
+        
+        Returns:
+            False if the job does not exist
+        """
+        job = await self.store.get_job(job_id)
+        if job is None:
+            return False
+        
+        # Mark it first: a runner on another worker stops at its next checkpoint
+        if job["status"] in ACTIVE_STATUSES:
+            await self.store.update_status(job_id, "cancelled")
+        
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return True
+    
+    async def resume(self) -> int:
+        """
+        Restart jobs interrupted by a shutdown or crash, then keep sweeping
+        
+        Every active job is tried, but only those whose lease is free or
+        expired (the worker running them died) actually run here. Jobs still
+        leased by a dead worker are picked up by a later sweep, once every
+        lease period, after the lease runs out.
+        
+        Returns:
+            Number of active jobs tried
+        """
+        tried = await self._start_active_jobs()
+        if tried:
+            self.logger.info(f"Resumed {tried} batch jobs")
+        
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+        return tried
+    
+    async def _start_active_jobs(self) -> int:
+        """Try every active job not already running here"""
+        job_ids = await self.store.list_active_jobs()
+        for job_id in job_ids:
+            self._start(job_id)
+        return len(job_ids)
+    
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                await self._start_active_jobs()
+            except Exception as e:
+                self.logger.error(f"Error sweeping batch jobs: {str(e)}")
+    
+    async def stop(self) -> None:
+        """Stop running jobs (they stay active and resume on next start) and close the store"""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+            self._sweep_task = None
+        
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.store.close()
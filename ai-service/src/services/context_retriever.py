@@ -0,0 +1,385 @@
+"""
+Context Retriever Service - Indexed PYQ lookup for generation context
+Keeps the question bank in memory, keyed by (exam_type, topic, difficulty),
+so context for a generation request is a dictionary lookup instead of a scan,
+with an embedding-similarity fallback to related topics when a key is thin
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.config.settings import settings
+from src.services.deduplicator import (
+    NearDuplicateDetectorService,
+    get_question_text,
+    near_duplicate_detector,
+)
+from src.services.similarity_checker import SimilarityCheckerService
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def group_by_topic_difficulty(
+    questions: Iterable[Dict[str, Any]]
+) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+    """Group questions by (topic, difficulty) in one pass"""
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for q in questions:
+        groups.setdefault((q.get("topic"), q.get("difficulty")), []).append(q)
+    return groups
+
+
+class ContextRetrieverService:
+    """Service for retrieving previous years questions as generation context"""
+    
+    def __init__(
+        self,
+        similarity_checker: Optional[SimilarityCheckerService] = None,
+        deduplicator: Optional[NearDuplicateDetectorService] = None
+    ):
+        """
+        Initialize the retriever
+        
+        Args:
+            similarity_checker: Embedding source for the related-topic fallback
+            deduplicator: Near-duplicate index kept in step with the bank, so
+                uploads are checked against every indexed PYQ
+        """
+        self.logger = logger
+        self.similarity_checker = similarity_checker or SimilarityCheckerService()
+        self.deduplicator = deduplicator or near_duplicate_detector
+        
+        # exam -> (topic, difficulty) -> questions, most recent year first
+        self._by_key: Dict[str, Dict[Tuple[str, str], List[Dict[str, Any]]]] = {}
+        # exam -> topic -> questions
+        self._by_topic: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        # exam -> every question (the originality corpus)
+        self._by_exam: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        # exam -> bumped whenever its questions change, for downstream indexes
+        self._versions: Dict[str, int] = {}
+        self._seen: Set[str] = set()
+        self._unsorted: Set[Tuple[str, Tuple[str, str]]] = set()
+        
+        # exam -> (topic names, row-normalized topic embedding matrix)
+        self._topic_embeddings: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        
+        self._file_mtimes: Dict[str, float] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {"lookups": 0, "exact_hits": 0, "topic_fallbacks": 0, "embedding_fallbacks": 0}
+    
+    def add_questions(
+        self,
+        questions: List[Dict[str, Any]],
+        exam_type: Optional[str] = None
+    ) -> int:
+        """
+        Index more questions (already indexed ones are skipped)
+        
+        Args:
+            questions: Questions to add
+            exam_type: Exam for questions that do not carry an exam_type
+            
+        Returns:
+            Number of questions added
+        """
+        added = 0
+        
+        for q in questions:
+            exam = q.get("exam_type") or q.get("examType") or exam_type
+            text = get_question_text(q)
+            if not exam or not text:
+                continue
+            
+            fingerprint = hashlib.sha1(f"{exam}|{_normalize(text)}".encode("utf-8")).hexdigest()
+            if fingerprint in self._seen:
+                continue
+            self._seen.add(fingerprint)
+            
+            key = (_normalize(q.get("topic")), _normalize(q.get("difficulty")))
+            self._by_key.setdefault(exam, {}).setdefault(key, []).append(q)
+            self._by_topic.setdefault(exam, {}).setdefault(key[0], []).append(q)
+            self._by_exam.setdefault(exam, []).append(q)
+            self._versions[exam] = self._versions.get(exam, 0) + 1
+            self._unsorted.add((exam, key))
+            
+            if q.get("id"):
+                self._by_id[str(q["id"])] = q
+            # Inserted unless it near-duplicates a question already indexed
+            self.deduplicator.add_question(q)
+            
+            if key[0] not in self._topic_embeddings.get(exam, ([], None))[0]:
+                # New topic: the topic embeddings need rebuilding
+                self._topic_embeddings.pop(exam, None)
+            
+            added += 1
+        
+        if added:
+            self.logger.info(f"Context index: added {added} questions")
+        return added
+    
+    def get_exam_questions(self, exam_type: str) -> List[Dict[str, Any]]:
+        """
+        All indexed questions for an exam (the originality corpus)
+        
+        The list grows in place as the bank is refreshed; get_version tells
+        downstream indexes when to rebuild.
+        """
+        return self._by_exam.get(exam_type, [])
+    
+    def get_version(self, exam_type: str) -> int:
+        """Counter bumped whenever questions are added for an exam"""
+        return self._versions.get(exam_type, 0)
+    
+    def get_exam_types(self) -> List[str]:
+        """Exams with indexed questions"""
+        return list(self._by_exam)
+    
+    def get_by_ids(self, question_ids: List[str]) -> List[Dict[str, Any]]:
+        """Indexed questions with the given ids, in request order"""
+        return [self._by_id[qid] for qid in question_ids if qid in self._by_id]
+    
+    def get_context(
+        self,
+        exam_type: str,
+        topic: str,
+        difficulty: str,
+        k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Index-only lookup: the exact key first, then the same topic at other
+        difficulties
+        
+        Args:
+            exam_type: Type of exam
+            topic: Topic
+            difficulty: Difficulty level
+            k: Number of questions (default CONTEXT_TOP_K)
+            
+        Returns:
+            Up to k context questions, most relevant first
+        """
+        k = k or settings.CONTEXT_TOP_K
+        self.stats["lookups"] += 1
+        
+        key = (_normalize(topic), _normalize(difficulty))
+        context = list(self._sorted(exam_type, key)[:k])
+        
+        if len(context) == k:
+            self.stats["exact_hits"] += 1
+            return context
+        
+        same_topic = [
+            q for q in self._by_topic.get(exam_type, {}).get(key[0], [])
+            if _normalize(q.get("difficulty")) != key[1]
+        ]
+        if same_topic:
+            self.stats["topic_fallbacks"] += 1
+            context.extend(same_topic[:k - len(context)])
+        
+        return context
+    
+    async def retrieve(
+        self,
+        exam_type: str,
+        topic: str,
+        difficulty: str,
+        k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Context for a generation request, falling back to the most similar
+        topics (by embedding) when the index has fewer than k matches
+        
+        Args:
+            exam_type: Type of exam
+            topic: Topic
+            difficulty: Difficulty level
+            k: Number of questions (default CONTEXT_TOP_K)
+            
+        Returns:
+            Up to k context questions, most relevant first
+        """
+        k = k or settings.CONTEXT_TOP_K
+        context = self.get_context(exam_type, topic, difficulty, k)
+        
+        if len(context) >= k or not settings.CONTEXT_EMBEDDING_FALLBACK:
+            return context
+        
+        related_topics = await self._related_topics(exam_type, topic)
+        if not related_topics:
+            return context
+        
+        self.stats["embedding_fallbacks"] += 1
+        difficulty = _normalize(difficulty)
+        
+        for related in related_topics:
+            # Same difficulty first, then the rest of the topic
+            for q in self._sorted(exam_type, (related, difficulty)):
+                context.append(q)
+                if len(context) >= k:
+                    return context
+            for q in self._by_topic[exam_type][related]:
+                if _normalize(q.get("difficulty")) != difficulty:
+                    context.append(q)
+                    if len(context) >= k:
+                        return context
+        
+        return context
+    
+    async def retrieve_for_specs(
+        self,
+        exam_type: str,
+        specifications: List[Dict[str, Any]],
+        k: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Context per specification (identical specs share one lookup)"""
+        unique = {(spec.get("topic"), spec.get("difficulty")) for spec in specifications}
+        
+        results = await asyncio.gather(*(
+            self.retrieve(exam_type, topic, difficulty, k) for topic, difficulty in unique
+        ))
+        by_spec = dict(zip(unique, results))
+        
+        return [by_spec[(spec.get("topic"), spec.get("difficulty"))] for spec in specifications]
+    
+    def _sorted(self, exam_type: str, key: Tuple[str, str]) -> List[Dict[str, Any]]:
+        """Questions for a key, sorted most recent first on first read after a change"""
+        questions = self._by_key.get(exam_type, {}).get(key, [])
+        
+        if (exam_type, key) in self._unsorted:
+            questions.sort(key=lambda q: q.get("year") or 0, reverse=True)
+            self._unsorted.discard((exam_type, key))
+        
+        return questions
+    
+    async def _related_topics(self, exam_type: str, topic: str) -> List[str]:
+        """Indexed topics of the exam ordered by embedding similarity to a topic"""
+        topic_key = _normalize(topic)
+        
+        if exam_type not in self._topic_embeddings:
+            topics = list(self._by_topic.get(exam_type, {}))
+            if not topics:
+                return []
+            
+            try:
+                embeddings = await self.similarity_checker.get_embeddings(topics)
+            except Exception as e:
+                self.logger.error(f"Error embedding topics for {exam_type}: {str(e)}")
+                return []
+            if all(e is None for e in embeddings):
+                return []
+            self._topic_embeddings[exam_type] = (
+                topics,
+                self.similarity_checker._embedding_matrix(embeddings)
+            )
+        
+        topics, matrix = self._topic_embeddings[exam_type]
+        try:
+            query = await self.similarity_checker.get_embedding(topic_key)
+        except Exception as e:
+            self.logger.error(f"Error embedding topic {topic}: {str(e)}")
+            return []
+        if query is None or matrix.size == 0:
+            return []
+        
+        query_vector = np.asarray(query, dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+        similarities = matrix @ query_vector
+        
+        return [
+            topics[i] for i in np.argsort(-similarities)
+            if topics[i] != topic_key
+            and similarities[i] >= settings.CONTEXT_TOPIC_MIN_SIMILARITY
+        ]
+    
+    async def load_bank(self, path: Optional[str] = None) -> int:
+        """
+        Load (or incrementally refresh) the PYQ bank from JSON files
+        
+        Accepts a .json file holding a list of questions (or {"questions":
+        [...]}), a .jsonl file with one question per line, or a directory of
+        such files. Files unchanged since the last load are skipped, and
+        questions already indexed are not added twice.
+        
+        Args:
+            path: File or directory (default PYQ_BANK_PATH)
+            
+        Returns:
+            Number of questions added
+        """
+        path = path or settings.PYQ_BANK_PATH
+        if not path or not os.path.exists(path):
+            return 0
+        
+        root = Path(path)
+        files = sorted(root.glob("**/*.json*")) if root.is_dir() else [root]
+        added = 0
+        
+        for file_path in files:
+            mtime = file_path.stat().st_mtime
+            if self._file_mtimes.get(str(file_path)) == mtime:
+                continue
+            
+            try:
+                questions = await asyncio.to_thread(self._read_bank_file, file_path)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Error loading PYQ bank file {file_path}: {str(e)}")
+                continue
+            
+            self._file_mtimes[str(file_path)] = mtime
+            added += self.add_questions(questions)
+        
+        return added
+    
+    def _read_bank_file(self, file_path: Path) -> List[Dict[str, Any]]:
+        with open(file_path, encoding="utf-8") as f:
+            if file_path.suffix == ".jsonl":
+                return [json.loads(line) for line in f if line.strip()]
+            
+            data = json.load(f)
+            return data.get("questions", []) if isinstance(data, dict) else data
+    
+    async def start(self) -> None:
+        """Load the bank and keep refreshing it in the background"""
+        added = await self.load_bank()
+        self.logger.info(f"PYQ bank loaded: {added} questions")
+        
+        if settings.PYQ_BANK_REFRESH_SECONDS > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+    
+    async def stop(self) -> None:
+        """Stop background refreshes"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+    
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.PYQ_BANK_REFRESH_SECONDS)
+            try:
+                await self.load_bank()
+            except Exception as e:
+                self.logger.error(f"Error refreshing PYQ bank: {str(e)}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Index size per exam plus lookup counters"""
+        return {
+            **self.stats,
+            "questions": {exam: len(qs) for exam, qs in self._by_exam.items()},
+            "keys": sum(len(keys) for keys in self._by_key.values()),
+        }
+
+
+# Process-wide index shared by the generate and scrape routes
+context_retriever = ContextRetrieverService()
@@ -0,0 +1,295 @@
+"""
+Near-Duplicate Detector Service - Flag repeated PYQs at ingestion time
+Uses MinHash signatures over text shingles with an LSH banding index
+"""
+import logging
+import re
+import unicodedata
+import zlib
+from typing import Dict, Any, List, Optional, Union
+import numpy as np
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Universal hashing parameters (same scheme as Broder's MinHash)
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def get_question_text(question: Dict[str, Any]) -> str:
+    """Return the question text regardless of which producer built the dict"""
+    return (
+        question.get("text")
+        or question.get("question_text")
+        or question.get("questionText")
+        or ""
+    )
+
+
+class MinHashLSHIndex:
+    """
+    In-memory MinHash + LSH banding index
+    
+    Signatures live in one contiguous uint32 matrix (num_perm * 4 bytes per
+    question, ~512MB for a million questions at 128 permutations) and each
+    band keeps a dict from band hash to question slot, so an insert or query
+    only touches the buckets its own bands fall into.
+    """
+    
+    def __init__(
+        self,
+        num_perm: int,
+        bands: int,
+        threshold: float,
+        seed: int = 1
+    ):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        
+        # Fixed seed so signatures stay comparable across processes
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._keys: List[str] = []
+        # Singleton buckets store a bare int to keep the per-entry overhead low
+        self._buckets: List[Dict[int, Union[int, List[int]]]] = [{} for _ in range(bands)]
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def signature(self, shingles: List[str]) -> Optional[np.ndarray]:
+        """Compute the MinHash signature of a set of shingles"""
+        if not shingles:
+            return None
+        
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in set(shingles)),
+            dtype=np.uint64
+        )
+        # Overflow wraps in uint64, which is fine for hashing purposes
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        permuted &= _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+    
+    def query(self, signature: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Find the closest indexed entry sharing at least one LSH band
+        
+        Returns:
+            Dict with key and estimated Jaccard similarity, or None if no
+            candidate reaches the threshold
+        """
+        candidates = set()
+        for band, band_hash in enumerate(self._band_hashes(signature)):
+            slot = self._buckets[band].get(band_hash)
+            if slot is None:
+                continue
+            if isinstance(slot, int):
+                candidates.add(slot)
+            else:
+                candidates.update(slot)
+        
+        if not candidates:
+            return None
+        
+        slots = np.fromiter(candidates, dtype=np.int64)
+        estimates = (self._signatures[slots] == signature).mean(axis=1)
+        best = int(np.argmax(estimates))
+        
+        if estimates[best] < self.threshold:
+            return None
+        
+        return {
+            "key": self._keys[slots[best]],
+            "similarity": float(estimates[best])
+        }
+    
+    def insert(self, key: str, signature: np.ndarray) -> None:
+        """Add a signature to the index"""
+        slot = len(self._keys)
+        if slot == self._signatures.shape[0]:
+            grown = np.empty((slot * 2, self.num_perm), dtype=np.uint32)
+            grown[:slot] = self._signatures
+            self._signatures = grown
+        
+        self._signatures[slot] = signature
+        self._keys.append(key)
+        
+        for band, band_hash in enumerate(self._band_hashes(signature)):
+            bucket = self._buckets[band]
+            existing = bucket.get(band_hash)
+            if existing is None:
+                bucket[band_hash] = slot
+            elif isinstance(existing, int):
+                bucket[band_hash] = [existing, slot]
+            else:
+                existing.append(slot)
+    
+    def _band_hashes(self, signature: np.ndarray) -> List[int]:
+        """Hash each band of a signature into a bucket key"""
+        rows = self.rows
+        return [
+            hash(signature[band * rows:(band + 1) * rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+
+class NearDuplicateDetectorService:
+    """Service for detecting near-duplicate questions without embedding calls"""
+    
+    def __init__(self):
+        """Initialize detector with an empty LSH index"""
+        self.logger = logger
+        self.shingle_size = settings.DEDUP_SHINGLE_SIZE
+        self.index = MinHashLSHIndex(
+            num_perm=settings.DEDUP_NUM_PERMUTATIONS,
+            bands=settings.DEDUP_LSH_BANDS,
+            threshold=settings.DEDUP_JACCARD_THRESHOLD
+        )
+    
+    def normalize_text(self, text: str) -> str:
+        """Normalize question text so formatting noise does not affect shingles"""
+        text = unicodedata.normalize("NFKC", text).lower()
+        # Drop leading question numbers like "Q12." or "12)"
+        text = re.sub(r'^\s*(?:q(?:uestion)?\s*)?\d+\s*[\.\):]\s*', '', text)
+        text = re.sub(r'[^\w\s]', ' ', text)
+        return re.sub(r'\s+', ' ', text).strip()
+    
+    def shingle(self, text: str) -> List[str]:
+        """Split normalized text into overlapping character shingles"""
+        normalized = self.normalize_text(text)
+        k = self.shingle_size
+        
+        if len(normalized) <= k:
+            return [normalized] if normalized else []
+        
+        return [normalized[i:i + k] for i in range(len(normalized) - k + 1)]
+    
+    def find_duplicate(self, question: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a question against the index without inserting it
+        
+        Args:
+            question: Question dict with text
+            
+        Returns:
+            Match with key and estimated similarity, or None
+        """
+        signature = self.index.signature(self.shingle(get_question_text(question)))
+        if signature is None:
+            return None
+        return self.index.query(signature)
+    
+    def add_question(
+        self,
+        question: Dict[str, Any],
+        key: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Insert a question unless it near-duplicates one already indexed
+        
+        Args:
+            question: Question dict with text
+            key: Identifier to store (defaults to a key built from metadata)
+            
+        Returns:
+            Match for the existing question if this one is a duplicate, else None
+        """
+        signature = self.index.signature(self.shingle(get_question_text(question)))
+        if signature is None:
+            return None
+        
+        match = self.index.query(signature)
+        if match:
+            return match
+        
+        self.index.insert(key or self._question_key(question), signature)
+        return None
+    
+    def deduplicate(
+        self,
+        questions: List[Dict[str, Any]],
+        merge: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Flag or merge near-duplicates in a batch of parsed questions
+        
+        Questions are checked against everything indexed so far (earlier
+        uploads included) as well as each other.
+        
+        Args:
+            questions: Parsed questions
+            merge: Drop duplicates instead of flagging them; the canonical
+                question in the batch records where its copies came from
+                
+        Returns:
+            Dict with the resulting questions and the number of duplicates found
+        """
+        kept = []
+        kept_by_key = {}
+        duplicates_found = 0
+        
+        for question in questions:
+            key = self._question_key(question)
+            match = self.add_question(question, key)
+            
+            if match is None:
+                question["is_duplicate"] = False
+                kept.append(question)
+                kept_by_key[key] = question
+                continue
+            
+            duplicates_found += 1
+            
+            if merge:
+                canonical = kept_by_key.get(match["key"])
+                if canonical is not None:
+                    canonical.setdefault("duplicate_sources", []).append({
+                        "year": question.get("year"),
+                        "session": question.get("session"),
+                        "question_number": question.get("question_number"),
+                        "similarity": match["similarity"],
+                    })
+                continue
+            
+            question.update({
+                "is_duplicate": True,
+                "duplicate_of": match["key"],
+                "duplicate_similarity": match["similarity"],
+            })
+            kept.append(question)
+        
+        self.logger.info(
+            f"Near-duplicate check: {duplicates_found}/{len(questions)} duplicates "
+            f"(index size: {len(self.index)})"
+        )
+        
+        return {
+            "questions": kept,
+            "duplicates_found": duplicates_found
+        }
+    
+    def _question_key(self, question: Dict[str, Any]) -> str:
+        """Build a stable key for a question from its metadata"""
+        if question.get("id"):
+            return str(question["id"])
+        
+        return (
+            f"{question.get('exam_type') or question.get('examType', 'NA')}-"
+            f"{question.get('year', 'NA')}-{question.get('session') or 'NA'}-"
+            f"Q{question.get('question_number', len(self.index) + 1)}"
+        )
+
+
+# Process-wide index: the PYQ bank (context_retriever) and scrape uploads
+near_duplicate_detector = NearDuplicateDetectorService()
@@ -0,0 +1,177 @@
+"""
+Deployment Router - Spreads LLM calls over several Azure OpenAI deployments
+Each deployment (endpoint + chat/embedding deployment names) keeps its own
+quota, circuit breakers and latency estimate; calls go to the healthy
+deployment with the best weighted latency and fail over to the next one on
+429s and server errors
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from src.config.settings import settings
+from src.services.rate_limiter import LLMRateLimiter
+from src.services.resilience import ResilientCaller
+
+logger = logging.getLogger(__name__)
+
+CALL_KINDS = ("chat", "embeddings")
+
+
+def deployment_configs() -> List[Dict[str, Any]]:
+    """
+    Deployments from AZURE_OPENAI_DEPLOYMENTS, each missing field falling back
+    to the single-deployment AZURE_OPENAI_* settings (which alone describe
+    one deployment when the list is empty)
+    """
+    defaults = {
+        "endpoint": settings.AZURE_OPENAI_ENDPOINT,
+        "api_key": settings.AZURE_OPENAI_API_KEY,
+        "api_version": settings.AZURE_OPENAI_API_VERSION,
+        "chat_deployment": settings.AZURE_OPENAI_DEPLOYMENT,
+        "embedding_deployment": settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        "weight": 1.0,
+        "rpm_limit": settings.AZURE_OPENAI_RPM_LIMIT,
+        "tpm_limit": settings.AZURE_OPENAI_TPM_LIMIT,
+    }
+    
+    configs = []
+    for i, entry in enumerate(settings.AZURE_OPENAI_DEPLOYMENTS or [{}]):
+        config = {**defaults, **{k: v for k, v in entry.items() if v is not None}}
+        config.setdefault("name", entry.get("name") or (f"deployment-{i + 1}" if i else "default"))
+        configs.append(config)
+    return configs
+
+
+class Deployment:
+    """One Azure OpenAI endpoint with its quota, breakers and latency stats"""
+    
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        rate_limiter: LLMRateLimiter,
+        callers: Dict[str, ResilientCaller]
+    ):
+        """
+        Args:
+            config: Entry from deployment_configs()
+            rate_limiter: Chat quota of this deployment
+            callers: Resilience policy per call kind ("chat", "embeddings")
+        """
+        self.name = config["name"]
+        self.endpoint = config["endpoint"]
+        self.api_key = config["api_key"]
+        self.api_version = config["api_version"]
+        self.model = {
+            "chat": config["chat_deployment"],
+            "embeddings": config["embedding_deployment"],
+        }
+        self.weight = max(float(config["weight"]), 1e-6)
+        self.rate_limiter = rate_limiter
+        self.callers = callers
+        self.client: Any = None
+        
+        self.latency: Dict[str, Optional[float]] = {kind: None for kind in CALL_KINDS}
+        self.in_flight = {kind: 0 for kind in CALL_KINDS}
+        self.cooldown_until = {kind: 0.0 for kind in CALL_KINDS}
+        self.stats = {
+            kind: {"requests": 0, "successes": 0, "failures": 0, "rate_limited": 0}
+            for kind in CALL_KINDS
+        }
+    
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.endpoint and self.api_key)
+    
+    def is_available(self, kind: str) -> bool:
+        """Not cooling down after a 429 and its circuit lets calls through"""
+        if time.monotonic() < self.cooldown_until[kind]:
+            return False
+        return self.callers[kind].breaker.is_available()
+    
+    def score(self, kind: str, fallback_latency: float) -> float:
+        """Expected wait for one more call: latency x queue length / weight (lower is better)"""
+        latency = self.latency[kind] if self.latency[kind] is not None else fallback_latency
+        return latency * (self.in_flight[kind] + 1) / self.weight
+    
+    def record_success(self, kind: str, seconds: float) -> None:
+        self.stats[kind]["successes"] += 1
+        previous = self.latency[kind]
+        alpha = settings.LLM_LATENCY_EWMA_ALPHA
+        self.latency[kind] = (
+            seconds if previous is None else alpha * seconds + (1 - alpha) * previous
+        )
+    
+    def record_failure(self, kind: str) -> None:
+        self.stats[kind]["failures"] += 1
+    
+    def record_rate_limited(self, kind: str, retry_after: float) -> None:
+        self.stats[kind]["rate_limited"] += 1
+        self.cooldown_until[kind] = max(self.cooldown_until[kind], time.monotonic() + retry_after)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "endpoint": self.endpoint,
+            "weight": self.weight,
+            "rate_limiter": self.rate_limiter.get_stats(),
+        }
+        for kind in CALL_KINDS:
+            stats[kind] = {
+                **self.stats[kind],
+                "model": self.model[kind],
+                "in_flight": self.in_flight[kind],
+                "latency_ewma_seconds": self.latency[kind],
+                "cooling_down": time.monotonic() < self.cooldown_until[kind],
+                "circuit_state": self.callers[kind].breaker.state,
+            }
+        return stats
+
+
+class DeploymentRouter:
+    """Picks a deployment per call by health, weight and observed latency"""
+    
+    def __init__(self, deployments: List[Deployment]):
+        self.logger = logger
+        self.deployments = [d for d in deployments if d.is_configured] or deployments
+    
+    @property
+    def is_configured(self) -> bool:
+        return any(d.is_configured for d in self.deployments)
+    
+    def pick(self, kind: str, exclude: Optional[Set[str]] = None) -> Deployment:
+        """
+        Deployment for the next call of a kind
+        
+        Available deployments not yet tried for this call are preferred, best
+        score first; a deployment without latency samples is scored with the
+        fastest observed latency so it gets tried. When none is left, the one
+        whose 429 cooldown ends first is used (its rate limiter waits it out).
+        
+        Args:
+            kind: "chat" or "embeddings"
+            exclude: Names of deployments already tried for this call
+            
+        Returns:
+            Deployment to call
+        """
+        exclude = exclude or set()
+        candidates = [
+            d for d in self.deployments
+            if d.name not in exclude and d.is_available(kind)
+        ]
+        
+        if not candidates:
+            untried = [d for d in self.deployments if d.name not in exclude] or self.deployments
+            return min(untried, key=lambda d: d.cooldown_until[kind])
+        
+        observed = [d.latency[kind] for d in self.deployments if d.latency[kind] is not None]
+        fallback_latency = min(observed) if observed else 1.0
+        return min(candidates, key=lambda d: d.score(kind, fallback_latency))
+    
+    def has_untried(self, kind: str, tried: Set[str]) -> bool:
+        """Whether some other available deployment could take the call"""
+        return any(d.name not in tried and d.is_available(kind) for d in self.deployments)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-deployment requests, failures, 429s, latency and breaker state"""
+        return {d.name: d.get_stats() for d in self.deployments}
@@ -0,0 +1,186 @@
+"""
+Embedding Coalescer - Micro-batch embedding requests across concurrent callers
+Texts requested within a short window are sent as one embeddings call and the
+vectors are routed back to whoever asked for them
+"""
+import asyncio
+import contextvars
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from openai import BadRequestError
+
+from src.config.settings import settings
+from src.services.admission import current_priority, priority_scope
+from src.services.llm_client import LLMClient, llm_client
+from src.services.resilience import request_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCoalescer:
+    """
+    Coalesces concurrent embedding requests into batched API calls
+    
+    When no batch is in flight the queue is flushed on the next loop
+    iteration, so a lone request pays no window delay. While a batch is in
+    flight, new texts wait up to the window (or until max_batch_size texts
+    are queued) and go out together.
+    
+    Batches run in a fresh context (not the trace or deadline of whichever
+    caller happened to trigger the flush), under the latest deadline and the
+    most urgent priority among their callers.
+    """
+    
+    def __init__(
+        self,
+        client: LLMClient,
+        window_ms: float,
+        max_batch_size: int
+    ):
+        self.logger = logger
+        self.client = client
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        
+        # (text, future, priority, deadline) per queued text
+        self._pending: List[Tuple[str, asyncio.Future, str, Optional[float]]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self.stats = {"texts": 0, "batches": 0, "failed_batches": 0, "single_retries": 0}
+    
+    async def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Queue texts for embedding and wait for their vectors
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Embedding vectors in input order
+            
+        Raises:
+            The embeddings error if any of the texts could not be embedded
+        """
+        if not texts:
+            return []
+        
+        loop = asyncio.get_running_loop()
+        priority = current_priority()
+        deadline = request_deadline.get()
+        futures = []
+        
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future, priority, deadline))
+            futures.append(future)
+            
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+        
+        if self._pending and self._flush_handle is None:
+            delay = self.window_seconds if self._in_flight else 0
+            self._flush_handle = loop.call_later(delay, self._flush, context=contextvars.Context())
+        
+        # Collect every outcome so no failed future goes unretrieved
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return list(results)
+    
+    def _flush(self) -> None:
+        """Send everything queued so far as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            
+            task = asyncio.create_task(self._send(batch), context=contextvars.Context())
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+    
+    async def _send(self, batch: List[Tuple[str, asyncio.Future, str, Optional[float]]]) -> None:
+        """Embed one batch and resolve its futures"""
+        # The same text may be queued by several callers
+        unique_texts = list(dict.fromkeys(text for text, _, _, _ in batch))
+        results: Dict[str, Any] = {}
+        
+        # A shared batch is admitted at the most urgent priority among its
+        # callers and may run until the last of their deadlines
+        priority = max(
+            (p for _, _, p, _ in batch),
+            key=lambda p: settings.LLM_PRIORITY_WEIGHTS.get(p, 0)
+        )
+        deadlines = [d for _, _, _, d in batch]
+        request_deadline.set(None if None in deadlines else max(deadlines))
+        
+        with priority_scope(priority):
+            try:
+                results.update(await self._embed(unique_texts))
+            except asyncio.CancelledError:
+                for _, future, _, _ in batch:
+                    future.cancel()
+                raise
+            except BadRequestError as e:
+                # One bad input fails the whole request: isolate it
+                self.stats["failed_batches"] += 1
+                self.logger.error(
+                    f"Embeddings batch of {len(unique_texts)} rejected, "
+                    f"retrying one by one: {str(e)}"
+                )
+                if len(unique_texts) == 1:
+                    results[unique_texts[0]] = e
+                else:
+                    self.stats["single_retries"] += len(unique_texts)
+                    singles = await asyncio.gather(
+                        *(self._embed([text]) for text in unique_texts),
+                        return_exceptions=True
+                    )
+                    for text, single in zip(unique_texts, singles):
+                        failed = isinstance(single, BaseException)
+                        results[text] = single if failed else single[text]
+            except Exception as e:
+                self.stats["failed_batches"] += 1
+                self.logger.error(
+                    f"Error getting embeddings for batch of {len(unique_texts)}: {str(e)}"
+                )
+                results = {text: e for text in unique_texts}
+        
+        self.stats["texts"] += len(unique_texts)
+        self.stats["batches"] += 1
+        
+        for text, future, _, _ in batch:
+            if future.done():
+                continue
+            result = results.get(text)
+            if result is None:
+                result = RuntimeError("Embeddings response is missing a vector")
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    async def _embed(self, texts: List[str]) -> Dict[str, List[float]]:
+        """One embeddings call: text -> vector"""
+        response = await self.client.create_embeddings(input=texts)
+        return {texts[item.index]: item.embedding for item in response.data}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters including the average batch size achieved"""
+        stats = dict(self.stats)
+        stats["avg_batch_size"] = (
+            stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        )
+        return stats
+
+
+# Process-wide instance in front of the shared embedding client
+embedding_coalescer = EmbeddingCoalescer(
+    llm_client,
+    window_ms=settings.EMBEDDING_COALESCE_WINDOW_MS,
+    max_batch_size=settings.EMBEDDING_BATCH_SIZE
+)
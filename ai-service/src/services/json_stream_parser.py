@@ -0,0 +1,114 @@
+"""
+JSON Stream Parser - Incremental parsing of a streamed JSON object
+Scans a completion as it streams and reports each top-level field as soon as
+its value is complete, so work on early fields (question_text) can start
+while later ones (options, explanation) are still being generated
+"""
+import json
+from typing import Any, Dict, Optional
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """
+    Top-level fields of a JSON object, parsed as the text grows
+    
+    Only the characters added since the last feed are scanned. Feeding text
+    that does not extend what was seen (a retried stream starting over)
+    restarts the scan.
+    """
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expect_key = True
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None  # Start of the top-level key or value being read
+    
+    def feed(self, text: str) -> Dict[str, Any]:
+        """
+        Parse the accumulated completion text
+        
+        Args:
+            text: Full text received so far
+            
+        Returns:
+            Top-level fields whose values are complete
+        """
+        if not text.startswith(self.text):
+            self.reset()
+        self.text = text
+        
+        for i in range(self._pos, len(text)):
+            self._scan(text, i)
+        self._pos = len(text)
+        
+        return self.fields
+    
+    def _scan(self, text: str, i: int) -> None:
+        char = text[i]
+        
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 1:
+                    self._end_token(i + 1)
+            return
+        
+        if char == '"':
+            self._in_string = True
+            self._start_token(i)
+        elif char in "{[":
+            self._start_token(i)
+            self._depth += 1
+        elif char in "}]":
+            if self._depth == 1:
+                # Number or literal running up to the closing brace
+                self._end_token(i)
+            self._depth -= 1
+            if self._depth == 1:
+                self._end_token(i + 1)
+            elif self._depth == 0:
+                self.complete = True
+        elif self._depth == 1 and char == ":":
+            self._expect_key = False
+        elif self._depth == 1 and char == ",":
+            self._end_token(i)
+            self._expect_key = True
+        elif char not in _WHITESPACE:
+            self._start_token(i)
+    
+    def _start_token(self, i: int) -> None:
+        if self._depth == 1 and self._token_start is None:
+            self._token_start = i
+    
+    def _end_token(self, end: int) -> None:
+        """Finish the top-level key or value starting at _token_start"""
+        if self._token_start is None:
+            return
+        raw = self.text[self._token_start:end]
+        self._token_start = None
+        
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        
+        if self._expect_key:
+            self._key = value if isinstance(value, str) else None
+        elif self._key is not None:
+            self.fields[self._key] = value
+            self._key = None
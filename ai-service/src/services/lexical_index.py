@@ -0,0 +1,124 @@
+"""
+Lexical Index - Sparse TF-IDF search over the PYQ bank
+Cheap first stage for similarity checks, so only a shortlist of candidates
+needs dense embedding comparison
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+from src.services.deduplicator import get_question_text
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = {
+    "the", "of", "is", "a", "an", "and", "to", "in", "on", "for", "with", "by",
+    "at", "as", "be", "are", "which", "that", "this", "its", "it", "from", "or",
+    "if", "then", "what", "following", "will", "has", "have", "find",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [
+        token for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in _STOPWORDS
+    ]
+
+
+class LexicalIndex:
+    """Inverted index scoring documents by TF-IDF cosine similarity"""
+    
+    def __init__(self):
+        self.documents: List[Dict[str, Any]] = []
+        self._postings: Dict[str, List[Tuple[int, float]]] = {}
+        self._norms: List[float] = []
+        self._norms_dirty = False
+    
+    def __len__(self) -> int:
+        return len(self.documents)
+    
+    def add(self, questions: List[Dict[str, Any]]) -> None:
+        """Index more questions (document frequencies update incrementally)"""
+        for question in questions:
+            doc_id = len(self.documents)
+            self.documents.append(question)
+            
+            counts = Counter(tokenize(get_question_text(question)))
+            for term, count in counts.items():
+                # Sublinear tf dampens long, repetitive questions
+                self._postings.setdefault(term, []).append((doc_id, 1.0 + math.log(count)))
+            
+            self._norms.append(0.0)
+        
+        self._norms_dirty = True
+    
+    def search(
+        self,
+        text: str,
+        top_k: int,
+        min_score: float = 0.0
+    ) -> List[Tuple[int, float]]:
+        """
+        Score documents sharing at least one term with the query
+        
+        Args:
+            text: Query text
+            top_k: Maximum number of documents to return
+            min_score: Minimum cosine score to keep
+            
+        Returns:
+            (document index, score) pairs, best first
+        """
+        self.prepare()
+        
+        query_counts = Counter(tokenize(text))
+        scores: Dict[int, float] = {}
+        query_norm = 0.0
+        
+        for term, count in query_counts.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            
+            idf = self._idf(len(postings))
+            query_weight = (1.0 + math.log(count)) * idf
+            query_norm += query_weight ** 2
+            
+            for doc_id, tf in postings:
+                scores[doc_id] = scores.get(doc_id, 0.0) + query_weight * tf * idf
+        
+        if not scores:
+            return []
+        
+        query_norm = math.sqrt(query_norm)
+        ranked = [
+            (doc_id, score / (query_norm * self._norms[doc_id]))
+            for doc_id, score in scores.items()
+            if self._norms[doc_id] > 0
+        ]
+        ranked = [item for item in ranked if item[1] >= min_score]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:top_k]
+    
+    def prepare(self) -> None:
+        """Compute pending document norms now rather than on the next search"""
+        if self._norms_dirty:
+            self._recompute_norms()
+    
+    def _idf(self, document_frequency: int) -> float:
+        """Smoothed inverse document frequency"""
+        return math.log((1 + len(self.documents)) / (1 + document_frequency)) + 1.0
+    
+    def _recompute_norms(self) -> None:
+        """Recompute document vector norms after the idf values changed"""
+        squared = [0.0] * len(self.documents)
+        
+        for postings in self._postings.values():
+            idf = self._idf(len(postings))
+            for doc_id, tf in postings:
+                squared[doc_id] += (tf * idf) ** 2
+        
+        self._norms = [math.sqrt(value) for value in squared]
+        self._norms_dirty = False
@@ -0,0 +1,451 @@
+"""
+LLM Client - Process-wide async Azure OpenAI client
+Shares one keep-alive connection pool between all services, caps
+concurrent chat and embedding calls independently and routes each call to
+one of the configured deployments
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncAzureOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+
+from src.config.settings import settings
+from src.services.admission import INTERACTIVE, AdmissionScheduler
+from src.services.deployment_router import Deployment, DeploymentRouter, deployment_configs
+from src.services.rate_limiter import LLMRateLimiter, retry_after_seconds
+from src.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    ResilientCaller,
+    deadline_budget,
+    request_deadline,
+)
+from src.services.token_budgeter import count_tokens
+
+# Errors that indicate an unhealthy deployment rather than a bad request
+TRANSIENT_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError)
+
+logger = logging.getLogger(__name__)
+
+
+class LLMClient:
+    """Shared async Azure OpenAI client with connection pooling and concurrency limits"""
+    
+    def __init__(self):
+        """Set up concurrency limits; the underlying client is created on startup"""
+        self.logger = logger
+        self._http_client: Optional[httpx.AsyncClient] = None
+        
+        # Separate limits so a burst of embeddings never starves chat calls.
+        # Calls queue per priority class, with slots held back for interactive traffic.
+        self.chat_scheduler = AdmissionScheduler(
+            "chat",
+            capacity=settings.LLM_MAX_CONCURRENT_CHAT,
+            weights=settings.LLM_PRIORITY_WEIGHTS,
+            reserved={INTERACTIVE: settings.LLM_RESERVED_INTERACTIVE_CHAT}
+        )
+        self.embedding_scheduler = AdmissionScheduler(
+            "embeddings",
+            capacity=settings.LLM_MAX_CONCURRENT_EMBEDDINGS,
+            weights=settings.LLM_PRIORITY_WEIGHTS,
+            reserved={INTERACTIVE: settings.LLM_RESERVED_INTERACTIVE_EMBEDDINGS}
+        )
+        
+        configs = deployment_configs()
+        self.router = DeploymentRouter(
+            [self._create_deployment(config, len(configs)) for config in configs]
+        )
+    
+    def _create_deployment(self, config: Dict[str, Any], count: int) -> Deployment:
+        """Quota and resilience policies for one deployment"""
+        name = config["name"]
+        
+        # Chat deployment quota (the embedding deployment has its own). Callers
+        # waiting for quota are served in priority order, one at a time.
+        rate_limiter = LLMRateLimiter(
+            requests_per_minute=config["rpm_limit"],
+            tokens_per_minute=config["tpm_limit"],
+            queue=AdmissionScheduler(
+                f"{name}:chat_quota",
+                capacity=1,
+                weights=settings.LLM_PRIORITY_WEIGHTS
+            )
+        )
+        
+        # Deadlines, backoff, circuit breaking and hedging per call type. With
+        # several deployments a failed call moves on to the next one instead
+        # of retrying in place.
+        max_attempts = settings.LLM_MAX_ATTEMPTS if count == 1 else 1
+        callers = {
+            "chat": self._create_caller(
+                f"{name}:chat",
+                settings.LLM_CHAT_TIMEOUT_SECONDS,
+                max_attempts
+            ),
+            "embeddings": self._create_caller(
+                f"{name}:embeddings",
+                settings.LLM_EMBEDDING_TIMEOUT_SECONDS,
+                max_attempts
+            ),
+        }
+        return Deployment(config, rate_limiter, callers)
+    
+    def _create_caller(
+        self,
+        name: str,
+        attempt_timeout: float,
+        max_attempts: int
+    ) -> ResilientCaller:
+        """Build the resilience policy for one kind of call"""
+        return ResilientCaller(
+            name=name,
+            attempt_timeout=attempt_timeout,
+            deadline=settings.LLM_CALL_DEADLINE_SECONDS,
+            max_attempts=max_attempts,
+            base_delay=settings.LLM_BACKOFF_BASE_SECONDS,
+            max_delay=settings.LLM_BACKOFF_MAX_SECONDS,
+            breaker=CircuitBreaker(
+                name,
+                failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                recovery_timeout=settings.LLM_BREAKER_RECOVERY_SECONDS
+            ),
+            retry_on=TRANSIENT_ERRORS,
+            hedge_delay=settings.LLM_HEDGE_DELAY_SECONDS if name.endswith(":chat") else 0.0
+        )
+    
+    @property
+    def is_configured(self) -> bool:
+        """Whether Azure OpenAI credentials are available for some deployment"""
+        return self.router.is_configured
+    
+    async def startup(self) -> None:
+        """Create the clients and their connection pool (called from the app lifespan)"""
+        if not self.is_configured:
+            self.logger.warning("Azure OpenAI credentials not configured")
+            return
+        
+        for deployment in self.router.deployments:
+            self._get_client(deployment)
+    
+    async def shutdown(self) -> None:
+        """Close pooled connections"""
+        for deployment in self.router.deployments:
+            if deployment.client is not None:
+                await deployment.client.close()
+                deployment.client = None
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    def _get_client(self, deployment: Deployment) -> AsyncAzureOpenAI:
+        """Return a deployment's client, creating it (and the shared pool) on first use"""
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT_SECONDS, connect=5.0),
+            )
+        
+        if deployment.client is None:
+            deployment.client = AsyncAzureOpenAI(
+                api_key=deployment.api_key,
+                api_version=deployment.api_version,
+                azure_endpoint=deployment.endpoint,
+                http_client=self._http_client,
+                # 429s are retried here so the rate limiter sees them
+                max_retries=0,
+            )
+            self.logger.info(
+                f"Azure OpenAI async client initialized for deployment {deployment.name}"
+            )
+        
+        return deployment.client
+    
+    async def chat_completion(self, **kwargs: Any) -> Any:
+        """
+        Create a chat completion
+        
+        Args:
+            **kwargs: Arguments for chat.completions.create (model defaults to
+                the chat deployment of the deployment the call is routed to)
+                
+        Returns:
+            Chat completion response
+        """
+        estimated_tokens = self._estimate_tokens(kwargs)
+        
+        return await self._call_routed(
+            "chat",
+            lambda deployment, call_kwargs: self._create_chat(deployment, call_kwargs),
+            kwargs,
+            estimated_tokens
+        )
+    
+    async def _create_chat(self, deployment: Deployment, kwargs: Dict[str, Any]) -> Any:
+        """Single raw chat request (one attempt or hedge)"""
+        async with self.chat_scheduler.slot():
+            return await self._get_client(deployment).chat.completions.create(**kwargs)
+    
+    async def chat_completion_stream(
+        self,
+        on_text: Callable[[str], None],
+        **kwargs: Any
+    ) -> ChatCompletion:
+        """
+        Create a single-choice chat completion, streaming its content
+        
+        Routed, rate limited and retried like chat_completion, but never
+        hedged: two concurrent streams would interleave their on_text calls.
+        Cancelling the call closes the stream, so the rest of the completion
+        is not generated.
+        
+        Args:
+            on_text: Called with the full content received so far after each
+                chunk (a retried attempt starts again from "")
+            **kwargs: Arguments for chat.completions.create
+            
+        Returns:
+            The assembled completion. Usage is estimated from the text unless
+            the deployment reports it (LLM_STREAM_INCLUDE_USAGE).
+        """
+        estimated_tokens = self._estimate_tokens(kwargs)
+        
+        return await self._call_routed(
+            "chat",
+            lambda deployment, call_kwargs: self._create_chat_stream(
+                deployment, call_kwargs, on_text
+            ),
+            kwargs,
+            estimated_tokens,
+            hedge=False
+        )
+    
+    async def _create_chat_stream(
+        self,
+        deployment: Deployment,
+        kwargs: Dict[str, Any],
+        on_text: Callable[[str], None]
+    ) -> ChatCompletion:
+        """Single raw streamed chat request, assembled into a completion"""
+        if settings.LLM_STREAM_INCLUDE_USAGE:
+            kwargs = {**kwargs, "stream_options": {"include_usage": True}}
+        
+        async with self.chat_scheduler.slot():
+            stream = await self._get_client(deployment).chat.completions.create(
+                stream=True, **kwargs
+            )
+            
+            parts: List[str] = []
+            finish_reason = None
+            usage = None
+            chunk = None
+            async with stream:
+                async for chunk in stream:
+                    usage = chunk.usage or usage
+                    for choice in chunk.choices:
+                        finish_reason = choice.finish_reason or finish_reason
+                        if choice.delta and choice.delta.content:
+                            parts.append(choice.delta.content)
+                            on_text("".join(parts))
+        
+        content = "".join(parts)
+        if usage is None:
+            prompt_tokens = sum(
+                count_tokens(str(m.get("content", ""))) for m in kwargs.get("messages", [])
+            )
+            completion_tokens = count_tokens(content)
+            usage = CompletionUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens
+            )
+        
+        return ChatCompletion.model_construct(
+            id=getattr(chunk, "id", ""),
+            object="chat.completion",
+            created=getattr(chunk, "created", 0),
+            model=kwargs["model"],
+            choices=[
+                Choice.model_construct(
+                    index=0,
+                    finish_reason=finish_reason or "stop",
+                    message=ChatCompletionMessage.model_construct(role="assistant", content=content)
+                )
+            ],
+            usage=usage
+        )
+    
+    async def _call_routed(
+        self,
+        kind: str,
+        create: Callable[[Deployment, Dict[str, Any]], Awaitable[Any]],
+        kwargs: Dict[str, Any],
+        estimated_tokens: int = 0,
+        hedge: bool = True
+    ) -> Any:
+        """
+        Run a call on the best deployment, failing over to the others
+        
+        A 429 cools the deployment down for its Retry-After and the call moves
+        on to another deployment; server errors, timeouts and open circuits
+        do the same. Once every deployment has been tried, 429s keep waiting
+        on the least-cooled-down one up to LLM_RATE_LIMIT_RETRIES times.
+        
+        Args:
+            kind: "chat" or "embeddings"
+            create: Coroutine function (deployment, kwargs) making one raw call
+            kwargs: Call arguments (model defaults to the deployment's)
+            estimated_tokens: Quota to reserve for chat calls
+            hedge: Allow the caller's hedged duplicate request
+            
+        Returns:
+            Response of the first deployment that succeeded
+        """
+        tried = set()
+        max_tries = max(settings.LLM_RATE_LIMIT_RETRIES + 1, len(self.router.deployments))
+        
+        for attempt in range(max_tries):
+            deployment = self.router.pick(kind, exclude=tried)
+            tried.add(deployment.name)
+            call_kwargs = {"model": deployment.model[kind], **kwargs}
+            is_last = attempt == max_tries - 1
+            
+            # Do not queue for quota, or start a call, past the request deadline
+            budget = deadline_budget(settings.LLM_CALL_DEADLINE_SECONDS)
+            cooldown = deployment.cooldown_until[kind] - time.monotonic()
+            if cooldown > 0:
+                # Every deployment is cooling down after a 429: wait for this one
+                await asyncio.sleep(min(cooldown, budget))
+                deadline_budget(settings.LLM_CALL_DEADLINE_SECONDS)
+            if kind == "chat":
+                await deployment.rate_limiter.acquire(
+                    estimated_tokens, deadline=request_deadline.get()
+                )
+            
+            try:
+                budget = deadline_budget(settings.LLM_CALL_DEADLINE_SECONDS)
+            except DeadlineExceeded:
+                # Expired while waiting for quota: hand the tokens back
+                if kind == "chat":
+                    deployment.rate_limiter.reconcile(estimated_tokens, 0)
+                raise
+            
+            deployment.stats[kind]["requests"] += 1
+            deployment.in_flight[kind] += 1
+            started = time.monotonic()
+            try:
+                response = await deployment.callers[kind].call(
+                    lambda: create(deployment, call_kwargs),
+                    deadline=budget,
+                    hedge=hedge
+                )
+            except RateLimitError as e:
+                retry_after = retry_after_seconds(e, default=2.0 ** attempt)
+                deployment.record_rate_limited(kind, retry_after)
+                if kind == "chat":
+                    deployment.rate_limiter.pause(retry_after)
+                    deployment.rate_limiter.reconcile(estimated_tokens, 0)
+                if is_last:
+                    raise
+                self.logger.warning(f"{kind} call rate limited on {deployment.name}, failing over")
+                continue
+            except DeadlineExceeded:
+                raise
+            except (CircuitOpenError, asyncio.TimeoutError, *TRANSIENT_ERRORS):
+                deployment.record_failure(kind)
+                if is_last or not self.router.has_untried(kind, tried):
+                    raise
+                self.logger.warning(f"{kind} call failed on {deployment.name}, failing over")
+                continue
+            finally:
+                deployment.in_flight[kind] -= 1
+            
+            deployment.record_success(kind, time.monotonic() - started)
+            if kind == "chat":
+                usage = getattr(response, "usage", None)
+                deployment.rate_limiter.reconcile(
+                    estimated_tokens, getattr(usage, "total_tokens", None)
+                )
+            return response
+    
+    def _estimate_tokens(self, kwargs: Dict[str, Any]) -> int:
+        """Rough prompt + completion token estimate for quota accounting"""
+        prompt_tokens = sum(
+            count_tokens(str(m.get("content", ""))) for m in kwargs.get("messages", [])
+        )
+        completions = kwargs.get("n", 1)
+        return prompt_tokens + kwargs.get("max_tokens", 1000) * completions
+    
+    async def create_embeddings(
+        self,
+        input: Union[str, List[str]],
+        **kwargs: Any
+    ) -> Any:
+        """
+        Create embeddings for one or more texts
+        
+        Args:
+            input: Text or list of texts to embed
+            **kwargs: Extra arguments for embeddings.create (model defaults to
+                the embedding deployment of the deployment the call is routed to)
+            
+        Returns:
+            Embeddings response
+        """
+        return await self._call_routed(
+            "embeddings",
+            lambda deployment, call_kwargs: self._create_embeddings(deployment, input, call_kwargs),
+            kwargs
+        )
+    
+    async def _create_embeddings(
+        self,
+        deployment: Deployment,
+        input: Union[str, List[str]],
+        kwargs: Dict[str, Any]
+    ) -> Any:
+        """Single raw embeddings request"""
+        async with self.embedding_scheduler.slot():
+            return await self._get_client(deployment).embeddings.create(input=input, **kwargs)
+    
+    def get_admission_stats(self) -> Dict[str, Any]:
+        """Queue depth and wait times per priority class for chat, quota and embeddings"""
+        return {
+            "chat": self.chat_scheduler.get_stats(),
+            "chat_quota": {
+                d.name: d.rate_limiter.queue.get_stats() if d.rate_limiter.queue else None
+                for d in self.router.deployments
+            },
+            "embeddings": self.embedding_scheduler.get_stats(),
+        }
+    
+    def get_resilience_stats(self) -> Dict[str, Any]:
+        """Retry, timeout, breaker and hedging counters per deployment and call kind"""
+        return {
+            caller.name: caller.get_stats()
+            for d in self.router.deployments
+            for caller in d.callers.values()
+        }
+    
+    def get_deployment_stats(self) -> Dict[str, Any]:
+        """Routing counters, latency estimates and quota usage per deployment"""
+        return self.router.get_stats()
+
+
+# Process-wide instance, opened and closed by the FastAPI lifespan
+llm_client = LLMClient()
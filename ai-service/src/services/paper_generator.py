@@ -0,0 +1,343 @@
+"""
+Paper Generator Service - Full mock papers from a blueprint
+Expands a blueprint (sections of topic/difficulty/count specs, given or
+derived from the PYQ pattern report) into question slots, fills some from the
+bank where reuse is allowed, generates the rest in one parallel fan-out across
+sections, then removes near-duplicates across the whole paper and regenerates
+the slots they leave
+"""
+import itertools
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from src.config.settings import settings
+from src.services.context_retriever import context_retriever
+from src.services.deduplicator import get_question_text
+from src.services.pattern_analyzer import PatternAnalyzerService
+
+logger = logging.getLogger(__name__)
+
+
+def _apportion(weights: Dict[str, float], total: int) -> Dict[str, int]:
+    """Split total into integer shares proportional to weights (largest remainder)"""
+    weight_sum = sum(weights.values())
+    if total <= 0 or weight_sum <= 0:
+        return {}
+    
+    quotas = {key: total * weight / weight_sum for key, weight in weights.items()}
+    shares = {key: math.floor(quota) for key, quota in quotas.items()}
+    by_remainder = sorted(quotas, key=lambda key: quotas[key] - shares[key], reverse=True)
+    for key in by_remainder[:total - sum(shares.values())]:
+        shares[key] += 1
+    
+    return {key: share for key, share in shares.items() if share > 0}
+
+
+def _section_of(topic: str, section_topics: Optional[Dict[str, List[str]]]) -> str:
+    """Section for a topic: the mapping if it lists it, else the part before " - " """
+    for section, topics in (section_topics or {}).items():
+        if topic in topics:
+            return section
+    return topic.split(" - ")[0].strip() or topic
+
+
+class PaperGeneratorService:
+    """Service for generating complete, de-duplicated mock papers"""
+    
+    def __init__(self, generator: Any, pattern_analyzer: Optional[PatternAnalyzerService] = None):
+        """
+        Initialize the paper generator
+        
+        Args:
+            generator: QuestionGeneratorService used to generate questions
+            pattern_analyzer: Source of the pattern report for derived blueprints
+        """
+        self.logger = logger
+        self.generator = generator
+        self.pattern_analyzer = pattern_analyzer or PatternAnalyzerService()
+        self.context_retriever = context_retriever
+    
+    async def derive_blueprint(
+        self,
+        exam_type: str,
+        total_questions: int,
+        years: Optional[List[int]] = None,
+        section_topics: Optional[Dict[str, List[str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Blueprint matching the topic and difficulty distribution of the PYQs
+        
+        Questions are apportioned to topics by how often each was asked, and
+        within a topic to difficulties by its own difficulty mix.
+        
+        Args:
+            exam_type: Type of exam
+            total_questions: Questions in the paper
+            years: Years to analyze (default: every year in the bank)
+            section_topics: Section name -> topics (unlisted topics go to the
+                section named by the part of the topic before " - ")
+                
+        Returns:
+            Blueprint with sections of {"topic", "difficulty", "count"} specs
+        """
+        questions = self.context_retriever.get_exam_questions(exam_type)
+        if years:
+            questions = [q for q in questions if q.get("year") in years]
+        else:
+            years = sorted({q["year"] for q in questions if q.get("year")})
+        # A spec needs a topic, so untagged PYQs cannot shape the blueprint
+        questions = [q for q in questions if q.get("topic")]
+        if not questions:
+            raise ValueError(
+                f"No {exam_type} PYQs with a topic from {years or 'any year'} "
+                "to derive a blueprint from"
+            )
+        
+        report = await self.pattern_analyzer.generate_pattern_report(questions, exam_type, years)
+        
+        topic_counts = report["topic_patterns"]["total_counts"]
+        difficulty_by_topic = report["difficulty_patterns"]["by_topic"]
+        
+        sections: Dict[str, List[Dict[str, Any]]] = {}
+        for topic, count in _apportion(topic_counts, total_questions).items():
+            mix = {d: n for d, n in (difficulty_by_topic.get(topic) or {}).items() if d}
+            difficulties = _apportion(mix or {"MEDIUM": 1}, count)
+            for difficulty, share in difficulties.items():
+                sections.setdefault(_section_of(topic, section_topics), []).append(
+                    {"topic": topic, "difficulty": difficulty, "count": share}
+                )
+        
+        return {
+            "exam_type": exam_type,
+            "derived_from": {"years": years, "pyq_count": report["total_questions"]},
+            "sections": [
+                {"name": name, "specifications": specs} for name, specs in sections.items()
+            ],
+        }
+    
+    def _expand(self, blueprint: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """One slot per question: {"section", "spec"} in blueprint order"""
+        slots = []
+        
+        for section_index, section in enumerate(blueprint.get("sections") or []):
+            for spec in section.get("specifications") or []:
+                if not spec.get("topic") or not spec.get("difficulty"):
+                    raise ValueError(
+                        f"Section {section.get('name') or section_index + 1}: "
+                        "every specification needs a topic and a difficulty"
+                    )
+                
+                single = {k: v for k, v in spec.items() if k != "count"}
+                slots.extend(
+                    {"section": section_index, "spec": single}
+                    for _ in range(int(spec.get("count", 1)))
+                )
+        
+        if not slots:
+            raise ValueError("Blueprint has no questions")
+        if len(slots) > settings.PAPER_MAX_QUESTIONS:
+            raise ValueError(
+                f"Blueprint has {len(slots)} questions (limit {settings.PAPER_MAX_QUESTIONS})"
+            )
+        return slots
+    
+    async def generate_paper(
+        self,
+        exam_type: str,
+        blueprint: Dict[str, Any],
+        max_reused_fraction: float = 0.0,
+        pattern_analysis: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Fill every slot of a blueprint with a distinct question
+        
+        Args:
+            exam_type: Type of exam
+            blueprint: {"sections": [{"name", "specifications": [{"topic",
+                "difficulty", "count", "question_type"}]}]}
+            max_reused_fraction: Share of the paper that may be PYQs taken
+                from the bank instead of generated (0 = generate everything)
+            pattern_analysis: Pattern analysis data for the prompts
+            
+        Returns:
+            Sections with their questions in blueprint order, plus per-section
+            timings and counts of reused, generated, failed and de-duplicated
+            questions
+        """
+        started = time.monotonic()
+        slots = self._expand(blueprint)
+        sections = blueprint["sections"]
+        paper: List[Optional[Dict[str, Any]]] = [None] * len(slots)
+        resolved_at = [0.0] * len(slots)
+        duplicates = [0] * len(sections)
+        
+        # Bank questions first, so generated ones are de-duplicated against them
+        reused = self._reuse_bank_questions(exam_type, slots, paper, max_reused_fraction)
+        
+        pending = [i for i, question in enumerate(paper) if question is None]
+        rounds = 0
+        while pending and rounds <= settings.PAPER_REGENERATION_ROUNDS:
+            rounds += 1
+            self.logger.info(f"Paper round {rounds}: generating {len(pending)} questions")
+            
+            # One fan-out across all sections, sharing the batch concurrency limit
+            async for j, question in self.generator.generate_batch_stream(
+                [slots[i]["spec"] for i in pending],
+                exam_type,
+                pattern_analysis=pattern_analysis
+            ):
+                i = pending[j]
+                if question is not None:
+                    question.pop("spec_index", None)
+                    question["source"] = "generated"
+                paper[i] = question
+                resolved_at[i] = time.monotonic() - started
+            
+            for i in await self._remove_duplicates(paper, reused):
+                duplicates[slots[i]["section"]] += 1
+            pending = [i for i, question in enumerate(paper) if question is None]
+        
+        result_sections = []
+        for section_index, section in enumerate(sections):
+            indices = [i for i, slot in enumerate(slots) if slot["section"] == section_index]
+            questions = [paper[i] for i in indices if paper[i] is not None]
+            for position, question in enumerate(questions, start=1):
+                question["section"] = section.get("name")
+                question["position"] = position
+            
+            result_sections.append({
+                "name": section.get("name"),
+                "requested": len(indices),
+                "questions": questions,
+                "generated": sum(1 for i in indices if paper[i] is not None and i not in reused),
+                "reused": sum(1 for i in indices if i in reused),
+                "failed": sum(1 for i in indices if paper[i] is None),
+                "duplicates_removed": duplicates[section_index],
+                "seconds": round(max((resolved_at[i] for i in indices), default=0.0), 3),
+            })
+        
+        filled = sum(1 for question in paper if question is not None)
+        self.logger.info(
+            f"Paper generation complete: {filled}/{len(slots)} questions "
+            f"({len(reused)} reused, {sum(duplicates)} duplicates replaced, {rounds} rounds)"
+        )
+        
+        return {
+            "exam_type": exam_type,
+            "total_requested": len(slots),
+            "total_questions": filled,
+            "reused": len(reused),
+            "failed": len(slots) - filled,
+            "duplicates_removed": sum(duplicates),
+            "rounds": rounds,
+            "seconds": round(time.monotonic() - started, 3),
+            "sections": result_sections,
+        }
+    
+    def _reuse_bank_questions(
+        self,
+        exam_type: str,
+        slots: List[Dict[str, Any]],
+        paper: List[Optional[Dict[str, Any]]],
+        max_reused_fraction: float
+    ) -> Set[int]:
+        """
+        Fill up to max_reused_fraction of the slots with matching PYQs
+        
+        Slots are visited round-robin across sections so reuse is spread over
+        the paper; each PYQ is used at most once.
+        
+        Returns:
+            Indices of the slots filled from the bank
+        """
+        budget = math.floor(max(0.0, min(1.0, max_reused_fraction)) * len(slots))
+        if budget == 0:
+            return set()
+        
+        by_section: Dict[int, List[int]] = {}
+        for i, slot in enumerate(slots):
+            by_section.setdefault(slot["section"], []).append(i)
+        order = [
+            i for group in itertools.zip_longest(*by_section.values())
+            for i in group if i is not None
+        ]
+        
+        used: Set[str] = set()
+        reused: Set[int] = set()
+        for i in order:
+            if len(reused) == budget:
+                break
+            spec = slots[i]["spec"]
+            matches = self.context_retriever.get_context(
+                exam_type, spec["topic"], spec["difficulty"], k=len(slots)
+            )
+            for pyq in matches:
+                key = str(pyq.get("id") or get_question_text(pyq))
+                if (
+                    key in used
+                    or (pyq.get("difficulty") or "").upper() != spec["difficulty"].upper()
+                ):
+                    continue
+                used.add(key)
+                paper[i] = {**pyq, "source": "bank", "reused_from_bank": True}
+                reused.add(i)
+                break
+        
+        return reused
+    
+    async def _remove_duplicates(
+        self,
+        paper: List[Optional[Dict[str, Any]]],
+        reused: Set[int]
+    ) -> List[int]:
+        """
+        Clear slots whose question repeats an earlier one anywhere in the paper
+        
+        Questions are compared by normalized text and by embedding similarity
+        (MAX_SIMILARITY_THRESHOLD), one matrix multiply for the whole paper.
+        Bank questions are kept over generated ones, then blueprint order.
+        
+        Returns:
+            Indices of the cleared slots
+        """
+        filled = sorted(
+            (i for i, question in enumerate(paper) if question is not None),
+            key=lambda i: (i not in reused, i)
+        )
+        if len(filled) < 2:
+            return []
+        
+        texts = [" ".join(get_question_text(paper[i]).lower().split()) for i in filled]
+        try:
+            embeddings = await self.generator.similarity_checker.get_embeddings(
+                [get_question_text(paper[i]) for i in filled]
+            )
+        except Exception as e:
+            # Every question already passed its originality check: fall back
+            # to exact-text matching rather than lose the generated paper
+            self.logger.error(f"Error embedding paper questions, matching text only: {str(e)}")
+            embeddings = []
+        matrix = self.generator.similarity_checker._embedding_matrix(embeddings)
+        similarities = matrix @ matrix.T if matrix.size else np.zeros((len(filled), len(filled)))
+        
+        kept: List[int] = []
+        seen_texts: Set[str] = set()
+        removed = []
+        for position, i in enumerate(filled):
+            duplicate = texts[position] in seen_texts or any(
+                similarities[position, k] >= settings.MAX_SIMILARITY_THRESHOLD for k in kept
+            )
+            if duplicate:
+                paper[i] = None
+                removed.append(i)
+                continue
+            kept.append(position)
+            seen_texts.add(texts[position])
+        
+        if removed:
+            self.logger.info(f"Removed {len(removed)} duplicate questions across the paper")
+        return removed
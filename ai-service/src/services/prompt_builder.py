@@ -2,12 +2,96 @@
 AI Prompt Builder Service - Build prompts for question generation
 Uses PYQ context to generate realistic questions
 """
+import hashlib
 import logging
+from string import Template
 from typing import Dict, Any, List, Optional
 import json
 
+from src.config.settings import settings
+from src.services.cache import LRUCache
+from src.services.context_retriever import group_by_topic_difficulty
+from src.services.deduplicator import get_question_text
+from src.services.token_budgeter import TokenBudgeter, count_tokens, truncate_to_tokens
+
 logger = logging.getLogger(__name__)
 
+# Static part of the generation prompt. It only depends on the exam type, so
+# it is rendered once per exam and always sent first, keeping the prompt
+# prefix identical across requests for provider-side prefix caching.
+GENERATION_PREFIX_TEMPLATE = Template(
+    """You are an expert question paper setter for $exam_type exams in India.
+
+IMPORTANT GUIDELINES:
+1. The question MUST be realistic and match the style of actual $exam_type papers
+2. Use the context from previous years questions to understand:
+   - Question phrasing style
+   - Difficulty level expectations
+   - Common patterns and formats
+3. The question should be ORIGINAL - do not copy from the examples
+4. Include 4 options (A, B, C, D) with only ONE correct answer
+5. Provide a brief explanation for the correct answer
+6. Include the concepts being tested
+
+Return your response in this exact JSON format:
+{
+  "question_text": "Your question here...",
+  "options": [
+    {"key": "A", "text": "Option A text"},
+    {"key": "B", "text": "Option B text"},
+    {"key": "C", "text": "Option C text"},
+    {"key": "D", "text": "Option D text"}
+  ],
+  "correct_answer": "A",
+  "explanation": "Brief explanation of why this is correct...",
+  "concepts_tested": ["Concept1", "Concept2"],
+  "difficulty": "<requested difficulty>",
+  "topic": "<requested topic>"
+}
+"""
+)
+
+# Variable part of the generation prompt, appended after the static prefix
+GENERATION_TASK_TEMPLATE = Template("""
+Your task is to generate a NEW $difficulty difficulty question on the topic: $topic
+
+$pattern_insights
+
+CONTEXT - Previous Years Questions on $topic:
+$context_examples
+
+Now generate a NEW question following the same style and difficulty level.
+Set "difficulty" to "$difficulty" and "topic" to "$topic" in the JSON.
+""")
+
+# Appended to a generation prompt to ask for several questions in one
+# completion; the guidelines and context are then paid for once per group
+GROUP_GENERATION_TEMPLATE = Template("""
+Generate $count DIFFERENT questions instead of one. Each must test a different
+concept or scenario; none may repeat another's setup, numbers or phrasing.
+Return a JSON object {"questions": [...]} holding exactly $count questions,
+each in the JSON format above.
+""")
+
+VALIDATION_CRITERIA = """Evaluate the question on these criteria:
+1. Factual Accuracy: Is the question scientifically/mathematically correct?
+2. Answer Correctness: Is the marked answer actually correct?
+3. Clarity: Is the question clearly worded?
+4. Difficulty Match: Does the difficulty match the level?
+5. Options Quality: Are all options plausible?
+"""
+
+VALIDATION_RESULT_FORMAT = """{
+  "is_valid": true/false,
+  "factual_accuracy": true/false,
+  "answer_correctness": true/false,
+  "clarity_score": 1-10,
+  "difficulty_match": true/false,
+  "options_quality": 1-10,
+  "issues": ["list of any issues found"],
+  "suggestions": ["list of improvement suggestions"]
+}"""
+
 
 class PromptBuilderService:
     """Service for building AI prompts using PYQ context"""
@@ -15,6 +99,17 @@ class PromptBuilderService:
     def __init__(self):
         """Initialize prompt builder"""
         self.logger = logger
+        
+        # Per-exam static prefixes (and their token counts), compiled on first use
+        self._prefixes: Dict[str, str] = {}
+        self._prefix_tokens: Dict[str, int] = {}
+        
+        # Keeps prompts within PROMPT_TOKEN_BUDGET
+        self.budgeter = TokenBudgeter()
+        
+        # Formatted sections keyed by a hash of their inputs, so retries and
+        # batch specs sharing context do not re-format it
+        self._section_cache = LRUCache(max_size=settings.PROMPT_SECTION_CACHE_SIZE)
     
     async def build_question_generation_prompt(
         self,
@@ -37,80 +132,191 @@ class PromptBuilderService:
         Returns:
             Formatted prompt for AI model
         """
-        # Build context from previous years questions
-        context_examples = self._format_context_questions(context_questions[:5])
-        
         # Build pattern insights
         pattern_insights = ""
         if pattern_analysis:
-            pattern_insights = self._format_pattern_insights(pattern_analysis)
+            pattern_insights = self._memoized(
+                "patterns",
+                pattern_analysis,
+                self._format_pattern_insights
+            )
         
-        # Build the prompt
-        prompt = f"""You are an expert question paper setter for {exam_type} exams in India.
-
-Your task is to generate a NEW {target_difficulty} difficulty question on the topic: {target_topic}
-
-IMPORTANT GUIDELINES:
-1. The question MUST be realistic and match the style of actual {exam_type} papers
-2. Use the context from previous years questions below to understand:
-   - Question phrasing style
-   - Difficulty level expectations
-   - Common patterns and formats
-3. The question should be ORIGINAL - do not copy from the examples
-4. Include 4 options (A, B, C, D) with only ONE correct answer
-5. Provide a brief explanation for the correct answer
-6. Include the concepts being tested
-
-{pattern_insights}
-
-CONTEXT - Previous Years Questions on {target_topic}:
-{context_examples}
-
-Now generate a NEW question following the same style and difficulty level.
-
-Return your response in this exact JSON format:
-{{
-  "question_text": "Your question here...",
-  "options": [
-    {{"key": "A", "text": "Option A text"}},
-    {{"key": "B", "text": "Option B text"}},
-    {{"key": "C", "text": "Option C text"}},
-    {{"key": "D", "text": "Option D text"}}
-  ],
-  "correct_answer": "A",
-  "explanation": "Brief explanation of why this is correct...",
-  "concepts_tested": ["Concept1", "Concept2"],
-  "difficulty": "{target_difficulty}",
-  "topic": "{target_topic}"
-}}
-"""
+        task_values = {
+            "difficulty": target_difficulty,
+            "topic": target_topic,
+            "pattern_insights": pattern_insights,
+        }
+        
+        # Context examples get whatever the budget leaves after the fixed parts
+        fixed_tokens = self.get_static_prefix_tokens(exam_type) + count_tokens(
+            GENERATION_TASK_TEMPLATE.substitute(context_examples="", **task_values)
+        )
+        available_tokens = max(0, self.budgeter.prompt_budget - fixed_tokens)
+        
+        # Build context from previous years questions
+        context_examples = self._memoized(
+            "context",
+            {"questions": context_questions[:5], "available_tokens": available_tokens},
+            lambda data: self._format_context_questions(data["questions"], data["available_tokens"])
+        )
+        
+        # Static prefix first, request-specific content after it
+        prompt = self.get_static_prefix(exam_type) + GENERATION_TASK_TEMPLATE.substitute(
+            context_examples=context_examples,
+            **task_values
+        )
         
         return prompt
     
-    def _format_context_questions(
+    async def build_grouped_generation_prompt(
         self,
-        questions: List[Dict[str, Any]]
+        target_topic: str,
+        target_difficulty: str,
+        exam_type: str,
+        context_questions: List[Dict[str, Any]],
+        count: int,
+        pattern_analysis: Optional[Dict[str, Any]] = None
     ) -> str:
-        """Format context questions for the prompt"""
-        formatted = []
-        
-        for i, q in enumerate(questions, 1):
-            options_text = ""
-            if q.get("options"):
-                options_text = "\n".join([
-                    f"  {opt['key']}. {opt['text']}"
-                    for opt in q["options"]
-                ])
+        """
+        Build a prompt for generating several questions on one topic and
+        difficulty in a single completion
+        
+        Args:
+            target_topic: Topic for the new questions
+            target_difficulty: Difficulty level
+            exam_type: Type of exam (JEE, NEET)
+            context_questions: Similar PYQs for context
+            count: Number of questions to generate
+            pattern_analysis: Pattern analysis data
+            
+        Returns:
+            Formatted prompt for AI model
+        """
+        prompt = await self.build_question_generation_prompt(
+            target_topic,
+            target_difficulty,
+            exam_type,
+            context_questions,
+            pattern_analysis
+        )
+        return prompt + GROUP_GENERATION_TEMPLATE.substitute(count=count)
+    
+    def build_originality_feedback(self, rejected: List[Dict[str, Any]]) -> str:
+        """
+        Prompt section listing drafts rejected as too similar, so the next
+        attempt steers away from them instead of repeating them
+        
+        Args:
+            rejected: Rejected drafts, each {"draft", "nearest", "similarity"}
             
-            formatted.append(f"""
+        Returns:
+            Section to append to the generation prompt ("" when nothing was rejected)
+        """
+        if not rejected:
+            return ""
+        
+        lines = [
+            "",
+            "AVOID - these earlier drafts were REJECTED as too similar to existing questions.",
+            "Do NOT reuse their scenario, numbers, structure or phrasing:",
+        ]
+        
+        limit = settings.ORIGINALITY_FEEDBACK_TOKENS_PER_EXAMPLE
+        for i, item in enumerate(rejected[-settings.ORIGINALITY_FEEDBACK_MAX_EXAMPLES:], 1):
+            draft = truncate_to_tokens(item["draft"], limit)
+            lines.append(f"Rejected draft {i} (similarity {item['similarity']:.2f}): {draft}")
+            if item.get("nearest"):
+                nearest = truncate_to_tokens(item["nearest"], limit)
+                lines.append(f"  Too close to existing question: {nearest}")
+        
+        lines.append("Write a question that tests the topic from a clearly different angle.")
+        return "\n".join(lines) + "\n"
+    
+    def get_static_prefix(self, exam_type: str) -> str:
+        """Return the compiled static prompt prefix for an exam type"""
+        prefix = self._prefixes.get(exam_type)
+        if prefix is None:
+            prefix = GENERATION_PREFIX_TEMPLATE.substitute(exam_type=exam_type)
+            self._prefixes[exam_type] = prefix
+        return prefix
+    
+    def get_static_prefix_tokens(self, exam_type: str) -> int:
+        """Token count of the static prefix for an exam type"""
+        tokens = self._prefix_tokens.get(exam_type)
+        if tokens is None:
+            tokens = count_tokens(self.get_static_prefix(exam_type))
+            self._prefix_tokens[exam_type] = tokens
+        return tokens
+    
+    def _memoized(self, section: str, data: Any, formatter: Any) -> str:
+        """Format a prompt section, reusing the result for identical input"""
+        digest = hashlib.sha1(
+            json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+        key = (section, digest)
+        
+        formatted = self._section_cache.get(key)
+        if formatted is None:
+            formatted = formatter(data)
+            self._section_cache.set(key, formatted)
+        return formatted
+    
+    def _format_context_questions(
+        self,
+        questions: List[Dict[str, Any]],
+        available_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Format context questions for the prompt
+        
+        With available_tokens set, examples that do not fit are condensed
+        (question text only, truncated) and the rest are dropped.
+        """
+        if available_tokens is None:
+            formatted = [self._format_context_example(i, q) for i, q in enumerate(questions, 1)]
+        else:
+            formatted = self.budgeter.fit_examples(
+                questions,
+                available_tokens,
+                self._format_context_example,
+                self._format_condensed_context_example
+            )
+            if len(formatted) < len(questions):
+                self.logger.debug(
+                    f"Prompt budget fits {len(formatted)}/{len(questions)} context examples"
+                )
+        
+        return "\n".join(formatted)
+    
+    def _format_context_example(self, i: int, q: Dict[str, Any]) -> str:
+        """One context question with its options, answer and concepts"""
+        options_text = ""
+        if q.get("options"):
+            options_text = "\n".join([
+                f"  {opt['key']}. {opt['text']}"
+                for opt in q["options"]
+            ])
+        
+        return f"""
 Example {i} (Year: {q.get('year', 'N/A')}, Difficulty: {q.get('difficulty', 'N/A')}):
-Question: {q.get('text', 'N/A')}
+Question: {get_question_text(q) or 'N/A'}
 {options_text}
 Correct Answer: {q.get('correct_answer', 'N/A')}
 Concepts: {', '.join(q.get('concepts_tested', []))}
-""")
+"""
+    
+    def _format_condensed_context_example(self, i: int, q: Dict[str, Any]) -> str:
+        """Shortened context question: truncated text and concepts only"""
+        text = truncate_to_tokens(
+            get_question_text(q) or "N/A",
+            settings.CONTEXT_EXAMPLE_CONDENSED_TOKENS
+        )
         
-        return "\n".join(formatted)
+        return f"""
+Example {i} (Year: {q.get('year', 'N/A')}, Difficulty: {q.get('difficulty', 'N/A')}):
+Question: {text}
+Concepts: {', '.join(q.get('concepts_tested', []))}
+"""
     
     def _format_pattern_insights(
         self,
@@ -154,14 +360,11 @@ Concepts: {', '.join(q.get('concepts_tested', []))}
             List of prompts
         """
         prompts = []
+        context_by_key = group_by_topic_difficulty(context_questions)
         
         for spec in target_specs:
-            # Filter relevant context questions
-            relevant_context = [
-                q for q in context_questions
-                if q.get("topic") == spec.get("topic")
-                and q.get("difficulty") == spec.get("difficulty")
-            ]
+            # Relevant context questions for this spec
+            relevant_context = context_by_key.get((spec.get("topic"), spec.get("difficulty")), [])
             
             prompt = await self.build_question_generation_prompt(
                 target_topic=spec["topic"],
@@ -193,36 +396,65 @@ Concepts: {', '.join(q.get('concepts_tested', []))}
 
 Review the following generated question for quality and accuracy:
 
-Question: {generated_question.get('text', 'N/A')}
-Options:
+{self._format_question_for_review(generated_question)}
+{VALIDATION_CRITERIA}
+Return your response in JSON format:
+{VALIDATION_RESULT_FORMAT}
 """
         
-        for opt in generated_question.get("options", []):
-            prompt += f"  {opt['key']}. {opt['text']}\n"
+        return prompt
+    
+    async def build_batch_validation_prompt(
+        self,
+        generated_questions: List[Dict[str, Any]],
+        exam_type: str
+    ) -> str:
+        """
+        Build one prompt reviewing several generated questions
+        
+        Args:
+            generated_questions: The generated questions to validate
+            exam_type: Type of exam
+            
+        Returns:
+            Validation prompt asking for one result per question
+        """
+        reviews = "\n".join(
+            f"QUESTION {i}:\n{self._format_question_for_review(q)}"
+            for i, q in enumerate(generated_questions, 1)
+        )
+        
+        result_format = VALIDATION_RESULT_FORMAT.replace("{\n", '{\n  "index": 1,\n', 1)
+        count = len(generated_questions)
         
-        prompt += f"""
-Correct Answer: {generated_question.get('correct_answer', 'N/A')}
-Difficulty: {generated_question.get('difficulty', 'N/A')}
-Topic: {generated_question.get('topic', 'N/A')}
+        prompt = f"""You are an expert reviewer for {exam_type} exam questions.
 
-Evaluate the question on these criteria:
-1. Factual Accuracy: Is the question scientifically/mathematically correct?
-2. Answer Correctness: Is the marked answer actually correct?
-3. Clarity: Is the question clearly worded?
-4. Difficulty Match: Does the difficulty match the level?
-5. Options Quality: Are all options plausible?
+Review each of the following {count} generated questions independently for quality and accuracy:
 
-Return your response in JSON format:
+{reviews}
+{VALIDATION_CRITERIA}
+Return your response in JSON format, with one entry per question in the same order:
 {{
-  "is_valid": true/false,
-  "factual_accuracy": true/false,
-  "answer_correctness": true/false,
-  "clarity_score": 1-10,
-  "difficulty_match": true/false,
-  "options_quality": 1-10,
-  "issues": ["list of any issues found"],
-  "suggestions": ["list of improvement suggestions"]
+  "results": [
+{result_format}
+  ]
 }}
 """
         
         return prompt
+    
+    def _format_question_for_review(self, question: Dict[str, Any]) -> str:
+        """Question, options, answer, explanation and labels as shown to the reviewer"""
+        lines = [f"Question: {get_question_text(question) or 'N/A'}", "Options:"]
+        
+        for opt in question.get("options", []):
+            lines.append(f"  {opt['key']}. {opt['text']}")
+        
+        lines.append("")
+        lines.append(f"Correct Answer: {question.get('correct_answer', 'N/A')}")
+        if question.get("explanation"):
+            lines.append(f"Explanation: {question['explanation']}")
+        lines.append(f"Difficulty: {question.get('difficulty', 'N/A')}")
+        lines.append(f"Topic: {question.get('topic', 'N/A')}")
+        
+        return "\n".join(lines) + "\n"
@@ -2,17 +2,32 @@
 Question Generator Service - Orchestrates AI question generation
 Combines prompt building, AI generation, similarity checking, and validation
 """
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+import math
+import time
+from types import SimpleNamespace
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
 import json
-from openai import AzureOpenAI
 
 from src.config.settings import settings
+from src.services.cache import LRUCache
+from src.services.context_retriever import context_retriever, group_by_topic_difficulty
+from src.services.deduplicator import get_question_text
+from src.services.json_stream_parser import IncrementalJSONParser
+from src.services.llm_client import llm_client
 from src.services.prompt_builder import PromptBuilderService
+from src.services.resilience import CircuitOpenError, DeadlineExceeded, request_deadline
 from src.services.similarity_checker import SimilarityCheckerService
+from src.services.telemetry import GenerationTrace, current_trace, generation_telemetry, trace_stage
+from src.services.token_budgeter import count_tokens
 
 logger = logging.getLogger(__name__)
 
+# Receives progress events (attempt started, originality verdict) during generation
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
 
 class QuestionGeneratorService:
     """Service for AI-powered question generation"""
@@ -20,25 +35,19 @@ class QuestionGeneratorService:
     def __init__(self):
         """Initialize question generator"""
         self.logger = logger
-        self.client = None
+        self.client = llm_client
         
         # Initialize services
         self.prompt_builder = PromptBuilderService()
         self.similarity_checker = SimilarityCheckerService()
+        self.context_retriever = context_retriever
         
-        # Initialize Azure OpenAI client
-        if settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT:
-            try:
-                self.client = AzureOpenAI(
-                    api_key=settings.AZURE_OPENAI_API_KEY,
-                    api_version=settings.AZURE_OPENAI_API_VERSION,
-                    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
-                )
-                self.logger.info("Azure OpenAI client initialized successfully")
-            except Exception as e:
-                self.logger.error(f"Failed to initialize Azure OpenAI client: {str(e)}")
-        else:
-            self.logger.warning("Azure OpenAI credentials not configured")
+        # Validation results keyed by question content, so unchanged
+        # questions are never re-validated
+        self.validation_cache = LRUCache(max_size=settings.VALIDATION_CACHE_SIZE)
+        
+        # Running token totals for generation calls
+        self.token_stats = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
     
     async def generate_question(
         self,
@@ -48,11 +57,23 @@ class QuestionGeneratorService:
         context_questions: List[Dict[str, Any]],
         existing_questions: List[Dict[str, Any]],
         pattern_analysis: Optional[Dict[str, Any]] = None,
-        max_retries: int = None
+        max_retries: int = None,
+        candidates_per_call: int = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        validate: Optional[bool] = None,
+        question_type: Optional[str] = None,
+        deadline: Optional[float] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Generate a single question using AI
         
+        With candidates_per_call > 1 each completion returns several
+        candidates (the `n` parameter), all checked in one batched embedding
+        pass, so the retry budget is spent in parallel instead of in sequence.
+        With one candidate per call the completion is streamed (when
+        GENERATION_STREAMING is on) and checked for originality as soon as
+        its question_text is complete.
+        
         Args:
             topic: Topic for the question
             difficulty: Difficulty level
@@ -60,85 +81,737 @@ class QuestionGeneratorService:
             context_questions: Similar PYQs for context
             existing_questions: All existing questions for similarity check
             pattern_analysis: Pattern analysis data
-            max_retries: Maximum generation retries
+            max_retries: Maximum number of candidates to try
+            candidates_per_call: Candidates requested per completion
+            progress_callback: Awaited with a progress event per attempt and
+                per originality verdict
+            validate: Validate candidates alongside the originality check and
+                only accept valid ones (default from VALIDATE_WITH_ORIGINALITY)
+            question_type: Question type, used to size the completion budget
+            deadline: time.monotonic() by which to answer. When it passes the
+                remaining LLM, embedding and validation work is cancelled and
+                the best candidate so far is returned with "partial": True
             
         Returns:
             Generated question or None if failed
         """
-        if not self.client:
+        trace = GenerationTrace(exam_type, topic, difficulty)
+        token = current_trace.set(trace)
+        
+        # An enclosing request's deadline applies too
+        outer_deadline = request_deadline.get()
+        if outer_deadline is not None:
+            deadline = outer_deadline if deadline is None else min(deadline, outer_deadline)
+        deadline_token = request_deadline.set(deadline)
+        best_so_far: Dict[str, Any] = {}
+        
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            async with asyncio.timeout(timeout) as scope:
+                question = await self._generate_question(
+                    trace,
+                    topic,
+                    difficulty,
+                    exam_type,
+                    context_questions,
+                    existing_questions,
+                    pattern_analysis,
+                    max_retries,
+                    candidates_per_call,
+                    progress_callback,
+                    validate,
+                    question_type,
+                    best_so_far
+                )
+        except TimeoutError as e:
+            if not (scope.expired() or isinstance(e, DeadlineExceeded)):
+                raise
+            question = self._partial_result(trace, best_so_far)
+        finally:
+            request_deadline.reset(deadline_token)
+            current_trace.reset(token)
+            generation_telemetry.record(trace)
+        
+        return question
+    
+    async def _generate_question(
+        self,
+        trace: GenerationTrace,
+        topic: str,
+        difficulty: str,
+        exam_type: str,
+        context_questions: List[Dict[str, Any]],
+        existing_questions: List[Dict[str, Any]],
+        pattern_analysis: Optional[Dict[str, Any]],
+        max_retries: Optional[int],
+        candidates_per_call: Optional[int],
+        progress_callback: Optional[ProgressCallback],
+        validate: Optional[bool],
+        question_type: Optional[str],
+        best_so_far: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        generate_question body, recording attempts, tokens and outcome on the
+        trace and keeping the most original candidate seen in best_so_far
+        """
+        if not self.client.is_configured:
             self.logger.error("Azure OpenAI client not initialized")
+            trace.outcome = "not_configured"
             return None
         
         if max_retries is None:
             max_retries = settings.MAX_GENERATION_RETRIES
+        if candidates_per_call is None:
+            candidates_per_call = settings.GENERATION_CANDIDATES_PER_CALL
+        if validate is None:
+            validate = settings.VALIDATE_WITH_ORIGINALITY
         
-        for attempt in range(max_retries):
-            self.logger.info(f"Generation attempt {attempt + 1}/{max_retries}")
+        candidates_per_call = max(1, min(candidates_per_call, max_retries))
+        attempts = math.ceil(max_retries / candidates_per_call)
+        stream = settings.GENERATION_STREAMING and candidates_per_call == 1
+        
+        # The prompt does not change between attempts, so build it once
+        with trace.stage("prompt_build"):
+            prompt = await self.prompt_builder.build_question_generation_prompt(
+                target_topic=topic,
+                target_difficulty=difficulty,
+                exam_type=exam_type,
+                context_questions=context_questions,
+                pattern_analysis=pattern_analysis
+            )
+        max_tokens = self.prompt_builder.budgeter.max_output_tokens(question_type)
+        
+        token_usage = {
+            "prompt_tokens_estimated": count_tokens(prompt),
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "max_tokens": max_tokens,
+        }
+        best_so_far["token_usage"] = token_usage
+        
+        # Drafts rejected as too similar, fed back into later attempts
+        rejected: List[Dict[str, Any]] = []
+        
+        for attempt in range(attempts):
+            self.logger.info(f"Generation attempt {attempt + 1}/{attempts}")
+            trace.attempts = attempt + 1
+            
+            attempt_prompt = prompt
+            if settings.ORIGINALITY_FEEDBACK and rejected:
+                attempt_prompt = prompt + self.prompt_builder.build_originality_feedback(rejected)
+            
+            if progress_callback:
+                await progress_callback({
+                    "event": "attempt",
+                    "attempt": attempt + 1,
+                    "max_attempts": attempts
+                })
             
             try:
-                # Build prompt
-                prompt = await self.prompt_builder.build_question_generation_prompt(
-                    target_topic=topic,
-                    target_difficulty=difficulty,
-                    exam_type=exam_type,
-                    context_questions=context_questions,
-                    pattern_analysis=pattern_analysis
-                )
-                
-                # Generate using Azure OpenAI
-                response = self.client.chat.completions.create(
-                    model=settings.AZURE_OPENAI_DEPLOYMENT,
-                    messages=[
+                request = {
+                    "messages": [
                         {"role": "system", "content": "You are an expert question paper setter."},
-                        {"role": "user", "content": prompt}
+                        {"role": "user", "content": attempt_prompt}
                     ],
-                    temperature=0.8,  # Higher temperature for creativity
-                    max_tokens=1000,
-                    response_format={"type": "json_object"}
-                )
+                    "temperature": self._temperature(attempt),
+                    "max_tokens": max_tokens,
+                    "n": candidates_per_call,
+                    "response_format": {"type": "json_object"},
+                }
+                early_check = None
                 
-                # Parse response
-                generated_text = response.choices[0].message.content
-                generated_question = json.loads(generated_text)
+                # Generate using Azure OpenAI
+                with trace.stage("llm"):
+                    if stream:
+                        response, early_check = await self._stream_completion(
+                            request,
+                            topic,
+                            difficulty,
+                            existing_questions,
+                            exam_type
+                        )
+                    else:
+                        response = await self.client.chat_completion(**request)
                 
-                # Check originality
-                originality_check = await self.similarity_checker.check_originality(
-                    generated_question,
-                    existing_questions
-                )
+                validations = None
+                if response is None:
+                    # Stream cancelled: the question text alone was too similar
+                    self._record_usage(early_check["partial_response"], token_usage, trace)
+                    trace.candidates += 1
+                    trace.early_rejections += 1
+                    candidates = [early_check["candidate"]]
+                    originality_checks = early_check["task"].result()
+                else:
+                    self._record_usage(response, token_usage, trace)
+                    
+                    candidates = self._parse_candidates(response, topic, difficulty)
+                    trace.candidates += len(candidates)
+                    if not candidates:
+                        if early_check:
+                            early_check["task"].cancel()
+                        continue
+                    if "question" not in best_so_far:
+                        best_so_far.update(question=candidates[0], attempt=attempt + 1)
+                    
+                    # Check originality, validating in parallel when requested. A
+                    # streamed candidate's check is already running.
+                    if early_check and self._is_same_candidate(
+                        early_check["candidate"], candidates[0]
+                    ):
+                        originality_task = early_check["task"]
+                    else:
+                        if early_check:
+                            early_check["task"].cancel()
+                        originality_task = asyncio.ensure_future(
+                            self._check_candidates_originality(
+                                candidates, existing_questions, exam_type
+                            )
+                        )
+                    if validate:
+                        try:
+                            originality_checks, validations = await asyncio.gather(
+                                originality_task,
+                                self.validate_batch(candidates, exam_type)
+                            )
+                        finally:
+                            originality_task.cancel()
+                    else:
+                        originality_checks = await originality_task
+                    
+                    # Most original candidate so far, returned if the deadline hits
+                    for generated_question, originality_check in zip(
+                        candidates, originality_checks
+                    ):
+                        best_check = best_so_far.get("originality_check")
+                        if (
+                            best_check is None
+                            or originality_check["max_similarity"] < best_check["max_similarity"]
+                        ):
+                            best_so_far.update(
+                                question=generated_question,
+                                originality_check=originality_check,
+                                attempt=attempt + 1
+                            )
                 
-                if originality_check["is_original"]:
+                if progress_callback:
+                    for originality_check in originality_checks:
+                        await progress_callback({
+                            "event": "originality",
+                            "attempt": attempt + 1,
+                            "max_similarity": originality_check["max_similarity"],
+                            "is_original": originality_check["is_original"],
+                            "stream_cancelled": response is None
+                        })
+                
+                for index, (generated_question, originality_check) in enumerate(
+                    zip(candidates, originality_checks)
+                ):
+                    if not originality_check["is_original"]:
+                        continue
+                    if validations is not None and not validations[index].get("is_valid"):
+                        continue
+                    
                     self.logger.info(f"Generated original question (similarity: {originality_check['max_similarity']:.2f})")
                     
                     # Add metadata
                     generated_question["originality_check"] = originality_check
                     generated_question["generation_attempt"] = attempt + 1
+                    generated_question["candidates_generated"] = len(candidates)
+                    generated_question["token_usage"] = token_usage
+                    if validations is not None:
+                        generated_question["validation"] = validations[index]
                     
+                    trace.outcome = "success"
+                    trace.questions = 1
+                    trace.max_similarity = originality_check["max_similarity"]
                     return generated_question
-                else:
-                    self.logger.warning(
-                        f"Generated question too similar to existing "
-                        f"(similarity: {originality_check['max_similarity']:.2f})"
+                
+                self.logger.warning(
+                    f"No acceptable candidate among {len(candidates)} generated "
+                    f"(best similarity: {min(c['max_similarity'] for c in originality_checks):.2f})"
+                )
+                
+                # Retry hotter, with the rejected drafts as negative examples
+                for generated_question, originality_check in zip(candidates, originality_checks):
+                    if not originality_check["is_original"]:
+                        nearest = originality_check.get("most_similar_question")
+                        rejected.append({
+                            "draft": get_question_text(generated_question),
+                            "nearest": get_question_text(nearest) if nearest else None,
+                            "similarity": originality_check["max_similarity"],
+                        })
+                continue
+                    
+            except CircuitOpenError as e:
+                # Deployment is unhealthy: fail fast instead of burning retries
+                self.logger.error(f"Aborting generation: {str(e)}")
+                trace.outcome = "circuit_open"
+                return None
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error generating question: {str(e)}")
+                trace.errors += 1
+                continue
+        
+        self.logger.error(f"Failed to generate original question after {attempts} attempts")
+        return None
+    
+    async def _stream_completion(
+        self,
+        request: Dict[str, Any],
+        topic: str,
+        difficulty: str,
+        existing_questions: List[Dict[str, Any]],
+        exam_type: str
+    ) -> Tuple[Optional[Any], Optional[Dict[str, Any]]]:
+        """
+        Stream one completion, checking originality as soon as question_text
+        is complete (while the options and explanation are still streaming)
+        and cancelling the stream if the text is already too similar
+        
+        Returns:
+            (completion, early check). The early check holds the streamed
+            candidate and its originality task; when the stream was cancelled
+            the completion is None and the check also holds the estimated
+            usage of what was streamed ("partial_response").
+        """
+        parser = IncrementalJSONParser()
+        early: Dict[str, Any] = {}
+        
+        async def check(candidate: Dict[str, Any], prefix: str) -> List[Dict[str, Any]]:
+            checks = await self._check_candidates_originality(
+                [candidate], existing_questions, exam_type
+            )
+            # Only stop the stream this text came from (not a retry that restarted it)
+            if (
+                not checks[0]["is_original"]
+                and parser.text.startswith(prefix)
+                and not stream_task.done()
+            ):
+                early["rejected"] = True
+                stream_task.cancel()
+            return checks
+        
+        def on_text(text: str) -> None:
+            if "task" in early and not text.startswith(early["prefix"]):
+                # The attempt was retried: check the new text instead
+                early.pop("task").cancel()
+            
+            question_text = parser.feed(text).get("question_text")
+            if "task" not in early and isinstance(question_text, str) and question_text:
+                early["candidate"] = {
+                    "question_text": question_text,
+                    "topic": topic,
+                    "difficulty": difficulty,
+                }
+                early["prefix"] = text
+                early["task"] = asyncio.ensure_future(check(early["candidate"], text))
+        
+        stream_task = asyncio.ensure_future(self.client.chat_completion_stream(on_text, **request))
+        try:
+            response = await stream_task
+        except asyncio.CancelledError:
+            if not early.get("rejected") or asyncio.current_task().cancelling():
+                if "task" in early:
+                    early["task"].cancel()
+                raise
+            
+            prompt_tokens = sum(count_tokens(m["content"]) for m in request["messages"])
+            early["partial_response"] = SimpleNamespace(usage=SimpleNamespace(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=count_tokens(parser.text)
+            ))
+            self.logger.info("Stream cancelled: question text too similar to an existing question")
+            return None, early
+        except Exception:
+            if "task" in early:
+                early["task"].cancel()
+            raise
+        
+        return response, early if "task" in early else None
+    
+    def _is_same_candidate(self, streamed: Dict[str, Any], candidate: Dict[str, Any]) -> bool:
+        """Whether an originality check of the streamed fields applies to the parsed candidate"""
+        return (
+            get_question_text(candidate) == streamed["question_text"]
+            and candidate.get("topic") == streamed["topic"]
+        )
+    
+    def _partial_result(
+        self,
+        trace: GenerationTrace,
+        best_so_far: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """The best candidate seen before the deadline, flagged as partial"""
+        trace.outcome = "deadline"
+        question = best_so_far.get("question")
+        
+        if question is None:
+            self.logger.warning("Deadline reached before any candidate was generated")
+            return None
+        
+        originality_check = best_so_far.get("originality_check")
+        question["originality_check"] = originality_check
+        question["generation_attempt"] = best_so_far.get("attempt")
+        question["token_usage"] = best_so_far.get("token_usage")
+        question["partial"] = True
+        question["partial_reason"] = "deadline"
+        if originality_check is not None:
+            trace.max_similarity = originality_check["max_similarity"]
+        
+        self.logger.warning(
+            "Deadline reached, returning best candidate so far "
+            f"({'unchecked' if originality_check is None else originality_check['verdict']})"
+        )
+        return question
+    
+    async def generate_question_group(
+        self,
+        topic: str,
+        difficulty: str,
+        exam_type: str,
+        count: int,
+        context_questions: List[Dict[str, Any]],
+        existing_questions: List[Dict[str, Any]],
+        pattern_analysis: Optional[Dict[str, Any]] = None,
+        max_retries: int = None,
+        validate: Optional[bool] = None,
+        question_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate several questions on one topic and difficulty, asking for
+        all of them in a single completion
+        
+        The guidelines and context are sent once for the whole group. The
+        returned questions are originality-checked together (so they cannot
+        duplicate each other either), and any shortfall is requested again,
+        with the rejected drafts as negative examples.
+        
+        Args:
+            topic: Topic for the questions
+            difficulty: Difficulty level
+            exam_type: Type of exam
+            count: Number of questions wanted
+            context_questions: Similar PYQs for context
+            existing_questions: All existing questions for similarity check
+            pattern_analysis: Pattern analysis data
+            max_retries: Maximum number of completions
+            validate: Only accept questions that also pass validation
+                (default from VALIDATE_WITH_ORIGINALITY)
+            question_type: Question type, used to size the completion budget
+            
+        Returns:
+            Up to count generated questions
+        """
+        trace = GenerationTrace(exam_type, topic, difficulty)
+        token = current_trace.set(trace)
+        
+        try:
+            questions = await self._generate_question_group(
+                trace,
+                topic,
+                difficulty,
+                exam_type,
+                count,
+                context_questions,
+                existing_questions,
+                pattern_analysis,
+                max_retries,
+                validate,
+                question_type
+            )
+        finally:
+            current_trace.reset(token)
+            generation_telemetry.record(trace)
+        
+        return questions
+    
+    async def _generate_question_group(
+        self,
+        trace: GenerationTrace,
+        topic: str,
+        difficulty: str,
+        exam_type: str,
+        count: int,
+        context_questions: List[Dict[str, Any]],
+        existing_questions: List[Dict[str, Any]],
+        pattern_analysis: Optional[Dict[str, Any]],
+        max_retries: Optional[int],
+        validate: Optional[bool],
+        question_type: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """generate_question_group body, recording attempts, tokens and outcome on the trace"""
+        if not self.client.is_configured:
+            self.logger.error("Azure OpenAI client not initialized")
+            trace.outcome = "not_configured"
+            return []
+        
+        if max_retries is None:
+            max_retries = settings.MAX_GENERATION_RETRIES
+        if validate is None:
+            validate = settings.VALIDATE_WITH_ORIGINALITY
+        
+        accepted: List[Dict[str, Any]] = []
+        rejected: List[Dict[str, Any]] = []
+        token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "questions_requested": count}
+        
+        for attempt in range(max_retries):
+            wanted = count - len(accepted)
+            if wanted <= 0:
+                break
+            
+            self.logger.info(
+                f"Group generation attempt {attempt + 1}/{max_retries}: "
+                f"{wanted} questions on {topic}"
+            )
+            trace.attempts = attempt + 1
+            
+            with trace.stage("prompt_build"):
+                prompt = await self.prompt_builder.build_grouped_generation_prompt(
+                    target_topic=topic,
+                    target_difficulty=difficulty,
+                    exam_type=exam_type,
+                    context_questions=context_questions,
+                    count=wanted,
+                    pattern_analysis=pattern_analysis
+                )
+            if settings.ORIGINALITY_FEEDBACK and rejected:
+                prompt += self.prompt_builder.build_originality_feedback(rejected)
+            max_tokens = self.prompt_builder.budgeter.max_output_tokens(question_type) * wanted
+            
+            try:
+                with trace.stage("llm"):
+                    response = await self.client.chat_completion(
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": "You are an expert question paper setter."
+                            },
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=self._temperature(attempt),
+                        max_tokens=max_tokens,
+                        response_format={"type": "json_object"}
                     )
-                    # Retry with different temperature or prompt
+                self._record_usage(response, token_usage, trace)
+                
+                candidates = self._parse_group_candidates(response, topic, difficulty)[:wanted]
+                trace.candidates += len(candidates)
+                if not candidates:
                     continue
+                
+                # Questions accepted earlier go first, so refills are also
+                # checked against them as intra-batch duplicates
+                with trace_stage("originality"):
+                    checks = await self.similarity_checker.batch_check_originality(
+                        accepted + candidates,
+                        existing_questions
+                    )
+                checks = checks[len(accepted):]
+                
+                validations = None
+                if validate:
+                    validations = await self.validate_batch(candidates, exam_type)
+                
+                for index, (generated_question, originality_check) in enumerate(
+                    zip(candidates, checks)
+                ):
+                    if not originality_check["is_original"]:
+                        duplicate_of = originality_check.get("intra_batch_duplicate_of")
+                        if duplicate_of is not None:
+                            nearest = (accepted + candidates)[duplicate_of]
+                        else:
+                            nearest = originality_check.get("most_similar_question")
+                        similarity = originality_check.get(
+                            "intra_batch_similarity",
+                            originality_check["max_similarity"]
+                        )
+                        rejected.append({
+                            "draft": get_question_text(generated_question),
+                            "nearest": get_question_text(nearest) if nearest else None,
+                            "similarity": similarity,
+                        })
+                        continue
+                    if validations is not None and not validations[index].get("is_valid"):
+                        continue
                     
-            except json.JSONDecodeError as e:
-                self.logger.error(f"Failed to parse generated question: {str(e)}")
-                continue
+                    generated_question["originality_check"] = originality_check
+                    generated_question["generation_attempt"] = attempt + 1
+                    generated_question["token_usage"] = token_usage
+                    if validations is not None:
+                        generated_question["validation"] = validations[index]
+                    accepted.append(generated_question)
+                
+            except CircuitOpenError as e:
+                self.logger.error(f"Aborting group generation: {str(e)}")
+                trace.outcome = "circuit_open"
+                return accepted
             except Exception as e:
-                self.logger.error(f"Error generating question: {str(e)}")
+                self.logger.error(f"Error generating question group: {str(e)}")
+                trace.errors += 1
                 continue
         
-        self.logger.error(f"Failed to generate original question after {max_retries} attempts")
+        trace.questions = len(accepted)
+        if len(accepted) == count:
+            trace.outcome = "success"
+        elif accepted:
+            trace.outcome = "partial"
+        if accepted:
+            trace.max_similarity = max(q["originality_check"]["max_similarity"] for q in accepted)
+        
+        if len(accepted) < count:
+            self.logger.warning(
+                f"Group generation on {topic} produced {len(accepted)}/{count} questions"
+            )
+        return accepted
+    
+    def _parse_group_candidates(
+        self,
+        response: Any,
+        topic: str,
+        difficulty: str
+    ) -> List[Dict[str, Any]]:
+        """Parse a {"questions": [...]} completion (a single question object is also accepted)"""
+        try:
+            payload = json.loads(response.choices[0].message.content)
+        except (json.JSONDecodeError, TypeError, IndexError) as e:
+            self.logger.error(f"Failed to parse generated question group: {str(e)}")
+            return []
+        
+        if isinstance(payload, dict):
+            payload = payload.get("questions", [payload])
+        
+        candidates = []
+        for generated_question in payload if isinstance(payload, list) else []:
+            if isinstance(generated_question, dict) and get_question_text(generated_question):
+                generated_question.setdefault("topic", topic)
+                generated_question.setdefault("difficulty", difficulty)
+                candidates.append(generated_question)
+        
+        return candidates
+    
+    def _temperature(self, attempt: int) -> float:
+        """Sampling temperature for an attempt (the schedule's last value repeats)"""
+        schedule = settings.GENERATION_TEMPERATURE_SCHEDULE or [0.8]
+        return schedule[min(attempt, len(schedule) - 1)]
+    
+    def _record_usage(
+        self,
+        response: Any,
+        token_usage: Dict[str, int],
+        trace: Optional[GenerationTrace] = None
+    ) -> None:
+        """Add a completion's reported token usage to the request, trace and running totals"""
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        
+        token_usage["prompt_tokens"] += prompt_tokens
+        token_usage["completion_tokens"] += completion_tokens
+        if trace is not None:
+            trace.add_usage(prompt_tokens, completion_tokens)
+        
+        self.token_stats["requests"] += 1
+        self.token_stats["prompt_tokens"] += prompt_tokens
+        self.token_stats["completion_tokens"] += completion_tokens
+    
+    def _trace_usage(self, response: Any) -> None:
+        """Charge a side call's tokens (e.g. validation) to the running generation"""
+        trace = current_trace.get()
+        usage = getattr(response, "usage", None)
+        if trace is not None and usage is not None:
+            trace.add_usage(usage.prompt_tokens or 0, usage.completion_tokens or 0)
+    
+    def get_token_stats(self) -> Dict[str, Any]:
+        """Token totals and per-request averages for generation calls"""
+        requests = self.token_stats["requests"]
+        return {
+            **self.token_stats,
+            "avg_prompt_tokens": self.token_stats["prompt_tokens"] / requests if requests else 0.0,
+            "avg_completion_tokens": (
+                self.token_stats["completion_tokens"] / requests if requests else 0.0
+            ),
+            "prompt_token_budget": self.prompt_builder.budgeter.prompt_budget,
+        }
+    
+    async def _check_candidates_originality(
+        self,
+        candidates: List[Dict[str, Any]],
+        existing_questions: List[Dict[str, Any]],
+        exam_type: str
+    ) -> List[Dict[str, Any]]:
+        """Originality verdict per candidate (one batched pass for several)"""
+        with trace_stage("originality"):
+            return await self._originality_checks(candidates, existing_questions, exam_type)
+    
+    async def _originality_checks(
+        self,
+        candidates: List[Dict[str, Any]],
+        existing_questions: List[Dict[str, Any]],
+        exam_type: str
+    ) -> List[Dict[str, Any]]:
+        if len(candidates) == 1:
+            return [
+                await self.similarity_checker.check_originality(
+                    candidates[0],
+                    existing_questions,
+                    early_exit=settings.ORIGINALITY_EARLY_EXIT,
+                    exam_type=exam_type,
+                    cascade=settings.ORIGINALITY_CASCADE,
+                    corpus_version=self._corpus_version(existing_questions, exam_type)
+                )
+            ]
+        
+        return await self.similarity_checker.batch_check_originality(
+            candidates,
+            existing_questions
+        )
+    
+    def _corpus_version(
+        self,
+        existing_questions: List[Dict[str, Any]],
+        exam_type: str
+    ) -> Optional[int]:
+        """Bank version when checking against the indexed bank, else None"""
+        if existing_questions is self.context_retriever.get_exam_questions(exam_type):
+            return self.context_retriever.get_version(exam_type)
         return None
     
+    def _parse_candidates(
+        self,
+        response: Any,
+        topic: str,
+        difficulty: str
+    ) -> List[Dict[str, Any]]:
+        """Parse every completion choice into a question, skipping malformed ones"""
+        candidates = []
+        
+        for choice in response.choices:
+            try:
+                generated_question = json.loads(choice.message.content)
+            except (json.JSONDecodeError, TypeError) as e:
+                self.logger.error(f"Failed to parse generated question: {str(e)}")
+                continue
+            
+            if not isinstance(generated_question, dict):
+                self.logger.error(
+                    f"Generated question is not an object: {type(generated_question).__name__}"
+                )
+                continue
+            
+            generated_question.setdefault("topic", topic)
+            generated_question.setdefault("difficulty", difficulty)
+            candidates.append(generated_question)
+        
+        return candidates
+    
     async def generate_batch(
         self,
         specifications: List[Dict[str, Any]],
         exam_type: str,
-        context_questions: List[Dict[str, Any]],
-        existing_questions: List[Dict[str, Any]],
+        context_questions: Optional[List[Dict[str, Any]]] = None,
+        existing_questions: Optional[List[Dict[str, Any]]] = None,
         pattern_analysis: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
@@ -147,14 +820,25 @@ class QuestionGeneratorService:
         Args:
             specifications: List of question specifications
             exam_type: Type of exam
-            context_questions: Context from PYQs
-            existing_questions: All existing questions
+            context_questions: Context from PYQs (None: retrieve per spec
+                from the context index)
+            existing_questions: All existing questions (None: the indexed
+                bank for the exam)
             pattern_analysis: Pattern analysis data
             
         Returns:
             Batch generation results
         """
-        self.logger.info(f"Starting batch generation of {len(specifications)} questions")
+        generated: List[Optional[Dict[str, Any]]] = [None] * len(specifications)
+        
+        async for i, question in self.generate_batch_stream(
+            specifications,
+            exam_type,
+            context_questions,
+            existing_questions,
+            pattern_analysis
+        ):
+            generated[i] = question
         
         results = {
             "total_requested": len(specifications),
@@ -163,26 +847,8 @@ class QuestionGeneratorService:
             "questions": []
         }
         
-        for i, spec in enumerate(specifications):
-            self.logger.info(f"Generating question {i+1}/{len(specifications)}")
-            
-            # Filter relevant context
-            relevant_context = [
-                q for q in context_questions
-                if q.get("topic") == spec.get("topic")
-                and q.get("difficulty") == spec.get("difficulty")
-            ]
-            
-            # Generate question
-            question = await self.generate_question(
-                topic=spec["topic"],
-                difficulty=spec["difficulty"],
-                exam_type=exam_type,
-                context_questions=relevant_context[:10],
-                existing_questions=existing_questions,
-                pattern_analysis=pattern_analysis
-            )
-            
+        # Keep results in specification order
+        for question in generated:
             if question:
                 results["successful"] += 1
                 results["questions"].append(question)
@@ -196,6 +862,148 @@ class QuestionGeneratorService:
         
         return results
     
+    async def generate_batch_stream(
+        self,
+        specifications: List[Dict[str, Any]],
+        exam_type: str,
+        context_questions: Optional[List[Dict[str, Any]]] = None,
+        existing_questions: Optional[List[Dict[str, Any]]] = None,
+        pattern_analysis: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        """
+        Generate multiple questions concurrently, yielding each one as soon
+        as it passes originality (completion order, not specification order)
+        
+        Specs sharing a topic, difficulty and question type are generated
+        together when the batch is larger than the concurrency limit (see
+        _group_specifications).
+        
+        Args:
+            specifications: List of question specifications
+            exam_type: Type of exam
+            context_questions: Context from PYQs (None: retrieve per spec
+                from the context index)
+            existing_questions: All existing questions (None: the indexed
+                bank for the exam)
+            pattern_analysis: Pattern analysis data
+            
+        Yields:
+            (specification index, generated question or None if it failed)
+        """
+        self.logger.info(f"Starting batch generation of {len(specifications)} questions")
+        
+        # Quota pacing happens in the shared client's rate limiter; this caps
+        # how many generations one batch keeps in flight
+        semaphore = asyncio.Semaphore(settings.BATCH_GENERATION_CONCURRENCY)
+        
+        if existing_questions is None:
+            existing_questions = self.context_retriever.get_exam_questions(exam_type)
+        
+        # One pass over the supplied context instead of a scan per spec
+        context_by_key = None
+        if context_questions is not None:
+            context_by_key = group_by_topic_difficulty(context_questions)
+        
+        async def relevant_context(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+            if context_by_key is not None:
+                return context_by_key.get((spec.get("topic"), spec.get("difficulty")), [])[:10]
+            return await self.context_retriever.retrieve(
+                exam_type, spec["topic"], spec["difficulty"], k=10
+            )
+        
+        async def generate_one(
+            i: int,
+            spec: Dict[str, Any]
+        ) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+            async with semaphore:
+                self.logger.info(f"Generating question {i+1}/{len(specifications)}")
+                
+                # Generate question
+                question = await self.generate_question(
+                    topic=spec["topic"],
+                    difficulty=spec["difficulty"],
+                    exam_type=exam_type,
+                    context_questions=await relevant_context(spec),
+                    existing_questions=existing_questions,
+                    pattern_analysis=pattern_analysis,
+                    question_type=spec.get("question_type")
+                )
+                
+                if question:
+                    question["spec_index"] = i
+                return [(i, question)]
+        
+        async def generate_group(
+            indices: List[int]
+        ) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+            spec = specifications[indices[0]]
+            async with semaphore:
+                self.logger.info(
+                    f"Generating {len(indices)} questions on {spec['topic']} in one completion"
+                )
+                
+                questions = await self.generate_question_group(
+                    topic=spec["topic"],
+                    difficulty=spec["difficulty"],
+                    exam_type=exam_type,
+                    count=len(indices),
+                    context_questions=await relevant_context(spec),
+                    existing_questions=existing_questions,
+                    pattern_analysis=pattern_analysis,
+                    question_type=spec.get("question_type")
+                )
+            
+            # Unfilled specs of the group report None, like a failed single spec
+            results: List[Tuple[int, Optional[Dict[str, Any]]]] = []
+            for position, i in enumerate(indices):
+                question = questions[position] if position < len(questions) else None
+                if question:
+                    question["spec_index"] = i
+                results.append((i, question))
+            return results
+        
+        tasks = [
+            asyncio.create_task(
+                generate_one(group[0], specifications[group[0]]) if len(group) == 1
+                else generate_group(group)
+            )
+            for group in self._group_specifications(specifications)
+        ]
+        
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for result in await next_done:
+                    yield result
+        finally:
+            # Consumer went away (e.g. client disconnected): stop paying for LLM calls
+            for task in tasks:
+                task.cancel()
+    
+    def _group_specifications(self, specifications: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Spec indices grouped by (topic, difficulty, question_type)
+        
+        A grouped completion decodes its questions one after another, so
+        groups are only as large as needed to fit the batch into one wave of
+        BATCH_GENERATION_CONCURRENCY calls (capped at
+        GROUPED_GENERATION_MAX_QUESTIONS); with spare concurrency, separate
+        completions finish sooner.
+        """
+        group_size = min(
+            max(1, settings.GROUPED_GENERATION_MAX_QUESTIONS),
+            math.ceil(len(specifications) / max(1, settings.BATCH_GENERATION_CONCURRENCY))
+        )
+        by_key: Dict[Tuple[Any, ...], List[int]] = {}
+        for i, spec in enumerate(specifications):
+            key = (spec.get("topic"), spec.get("difficulty"), spec.get("question_type"))
+            by_key.setdefault(key, []).append(i)
+        
+        return [
+            indices[start:start + group_size]
+            for indices in by_key.values()
+            for start in range(0, len(indices), group_size)
+        ]
+    
     async def validate_generated_question(
         self,
         question: Dict[str, Any],
@@ -211,17 +1019,21 @@ class QuestionGeneratorService:
         Returns:
             Validation result
         """
-        if not self.client:
+        if not self.client.is_configured:
             self.logger.error("Azure OpenAI client not initialized")
             return {"is_valid": False, "error": "Client not initialized"}
         
+        cache_key = self._validation_key(question, exam_type)
+        cached = self.validation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Build validation prompt
             prompt = await self.prompt_builder.build_validation_prompt(question, exam_type)
             
             # Get validation from AI
-            response = self.client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT,
+            response = await self.client.chat_completion(
                 messages=[
                     {"role": "system", "content": "You are an expert question reviewer."},
                     {"role": "user", "content": prompt}
@@ -231,12 +1043,142 @@ class QuestionGeneratorService:
                 response_format={"type": "json_object"}
             )
             
+            self._trace_usage(response)
+            
             # Parse validation result
             validation_text = response.choices[0].message.content
             validation_result = json.loads(validation_text)
             
+            self.validation_cache.set(cache_key, validation_result)
             return validation_result
             
         except Exception as e:
             self.logger.error(f"Error validating question: {str(e)}")
             return {"is_valid": False, "error": str(e)}
+    
+    async def validate_batch(
+        self,
+        questions: List[Dict[str, Any]],
+        exam_type: str,
+        questions_per_prompt: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate several questions, packing them into shared prompts
+        
+        Cached results are reused; the rest are reviewed in groups of
+        questions_per_prompt, with at most VALIDATION_CONCURRENCY prompts in
+        flight.
+        
+        Args:
+            questions: Generated questions to validate
+            exam_type: Type of exam
+            questions_per_prompt: Questions reviewed per LLM call
+                (default from VALIDATION_BATCH_SIZE)
+            
+        Returns:
+            Validation results in input order
+        """
+        if questions_per_prompt is None:
+            questions_per_prompt = settings.VALIDATION_BATCH_SIZE
+        questions_per_prompt = max(1, questions_per_prompt)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(questions)
+        pending: List[int] = []
+        
+        for i, question in enumerate(questions):
+            cached = self.validation_cache.get(self._validation_key(question, exam_type))
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
+        
+        if pending and not self.client.is_configured:
+            self.logger.error("Azure OpenAI client not initialized")
+            for i in pending:
+                results[i] = {"is_valid": False, "error": "Client not initialized"}
+            return results
+        
+        semaphore = asyncio.Semaphore(settings.VALIDATION_CONCURRENCY)
+        
+        async def validate_group(indices: List[int]) -> None:
+            async with semaphore:
+                group = [questions[i] for i in indices]
+                
+                if len(group) == 1:
+                    results[indices[0]] = await self.validate_generated_question(
+                        group[0], exam_type
+                    )
+                    return
+                
+                for i, validation in zip(indices, await self._validate_group(group, exam_type)):
+                    results[i] = validation
+        
+        with trace_stage("validation"):
+            await asyncio.gather(*(
+                validate_group(pending[start:start + questions_per_prompt])
+                for start in range(0, len(pending), questions_per_prompt)
+            ))
+        
+        return results
+    
+    async def _validate_group(
+        self,
+        questions: List[Dict[str, Any]],
+        exam_type: str
+    ) -> List[Dict[str, Any]]:
+        """Review several questions in one LLM call, falling back to single calls"""
+        try:
+            prompt = await self.prompt_builder.build_batch_validation_prompt(questions, exam_type)
+            
+            response = await self.client.chat_completion(
+                messages=[
+                    {"role": "system", "content": "You are an expert question reviewer."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=500 * len(questions),
+                response_format={"type": "json_object"}
+            )
+            
+            self._trace_usage(response)
+            entries = json.loads(response.choices[0].message.content).get("results", [])
+        except CircuitOpenError as e:
+            self.logger.error(f"Error validating question batch: {str(e)}")
+            return [{"is_valid": False, "error": str(e)} for _ in questions]
+        except Exception as e:
+            self.logger.error(f"Error validating question batch: {str(e)}")
+            entries = []
+        
+        # Match entries by their 1-based index, falling back to position
+        by_index: Dict[int, Dict[str, Any]] = {}
+        for position, entry in enumerate(entries):
+            if isinstance(entry, dict):
+                index = entry.pop("index", position + 1)
+                by_index.setdefault(index if isinstance(index, int) else position + 1, entry)
+        
+        validations = []
+        for position, question in enumerate(questions):
+            validation = by_index.get(position + 1)
+            if validation is None:
+                # Missing from the batched answer: review it on its own
+                validation = await self.validate_generated_question(question, exam_type)
+            else:
+                self.validation_cache.set(self._validation_key(question, exam_type), validation)
+            validations.append(validation)
+        
+        return validations
+    
+    def _validation_key(self, question: Dict[str, Any], exam_type: str) -> str:
+        """Hash of everything _format_question_for_review shows the reviewer"""
+        content = {
+            "exam_type": exam_type,
+            "text": get_question_text(question),
+            "options": question.get("options", []),
+            "correct_answer": question.get("correct_answer"),
+            "explanation": question.get("explanation"),
+            "difficulty": question.get("difficulty"),
+            "topic": question.get("topic"),
+        }
+        return hashlib.sha256(
+            json.dumps(content, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
@@ -0,0 +1,377 @@
+"""
+Question Pool Service - Pre-generated warm pool of original questions
+Serves hot (exam_type, topic, difficulty) keys from validated questions
+generated in the background, refilling each key below its low-water mark
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import redis.asyncio as aioredis
+
+from src.config.settings import settings
+from src.services.admission import BACKGROUND, priority_scope
+
+logger = logging.getLogger(__name__)
+
+# Loads (context_questions, existing_questions) for a pool key
+ContextProvider = Callable[
+    [str, str, str], Awaitable[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]
+]
+
+
+class QuestionPoolStore(ABC):
+    """Storage backend for pooled questions"""
+    
+    @abstractmethod
+    async def push(self, key: str, questions: List[Dict[str, Any]], ttl_seconds: int) -> None:
+        """Add questions to a key's pool"""
+    
+    @abstractmethod
+    async def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        """Take one unexpired question from a key's pool"""
+    
+    @abstractmethod
+    async def size(self, key: str) -> int:
+        """Number of questions held for a key"""
+    
+    @abstractmethod
+    async def acquire_refill_lock(self, key: str, owner: str, ttl_seconds: int) -> bool:
+        """Claim the right to refill a key (one refiller across all workers)"""
+    
+    @abstractmethod
+    async def release_refill_lock(self, key: str, owner: str) -> None:
+        """Release a refill claim if owner still holds it (it may have expired)"""
+    
+    async def close(self) -> None:
+        """Release backend resources"""
+
+
+class InMemoryPoolStore(QuestionPoolStore):
+    """Per-process pool (single worker or development)"""
+    
+    def __init__(self):
+        self._pools: Dict[str, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+    
+    async def push(self, key: str, questions: List[Dict[str, Any]], ttl_seconds: int) -> None:
+        expires_at = time.time() + ttl_seconds
+        self._pools.setdefault(key, deque()).extend((expires_at, q) for q in questions)
+    
+    async def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        pool = self._pools.get(key)
+        while pool:
+            expires_at, question = pool.popleft()
+            if expires_at > time.time():
+                return question
+        return None
+    
+    async def size(self, key: str) -> int:
+        pool = self._pools.get(key)
+        if not pool:
+            return 0
+        
+        now = time.time()
+        while pool and pool[0][0] <= now:
+            pool.popleft()
+        return len(pool)
+    
+    async def acquire_refill_lock(self, key: str, owner: str, ttl_seconds: int) -> bool:
+        held = self._locks.get(key)
+        if held is not None and held[1] > time.monotonic():
+            return False
+        self._locks[key] = (owner, time.monotonic() + ttl_seconds)
+        return True
+    
+    async def release_refill_lock(self, key: str, owner: str) -> None:
+        held = self._locks.get(key)
+        if held is not None and held[0] == owner:
+            del self._locks[key]
+
+
+class RedisPoolStore(QuestionPoolStore):
+    """Redis-backed pool shared by all workers"""
+    
+    # Delete the lock only if it is still ours (atomic on the server)
+    _RELEASE_SCRIPT = """
+        if redis.call("GET", KEYS[1]) == ARGV[1] then
+            return redis.call("DEL", KEYS[1])
+        end
+        return 0
+    """
+    
+    def __init__(self, redis_url: str, prefix: str = "question_pool"):
+        self.redis = aioredis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+    
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+    
+    async def push(self, key: str, questions: List[Dict[str, Any]], ttl_seconds: int) -> None:
+        if not questions:
+            return
+        expires_at = time.time() + ttl_seconds
+        entries = [json.dumps({"expires_at": expires_at, "question": q}) for q in questions]
+        await self.redis.rpush(self._key(key), *entries)
+    
+    async def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        while True:
+            raw = await self.redis.lpop(self._key(key))
+            if raw is None:
+                return None
+            entry = json.loads(raw)
+            if entry["expires_at"] > time.time():
+                return entry["question"]
+    
+    async def size(self, key: str) -> int:
+        # Expired entries are only dropped on pop, so this may overcount slightly
+        return await self.redis.llen(self._key(key))
+    
+    async def acquire_refill_lock(self, key: str, owner: str, ttl_seconds: int) -> bool:
+        return bool(
+            await self.redis.set(f"{self._key(key)}:refill", owner, nx=True, ex=ttl_seconds)
+        )
+    
+    async def release_refill_lock(self, key: str, owner: str) -> None:
+        await self.redis.eval(self._RELEASE_SCRIPT, 1, f"{self._key(key)}:refill", owner)
+    
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class QuestionPoolService:
+    """Service for serving generated questions from a background-filled pool"""
+    
+    def __init__(
+        self,
+        generator: Any,
+        store: Optional[QuestionPoolStore] = None,
+        context_provider: Optional[ContextProvider] = None
+    ):
+        """
+        Initialize the pool
+        
+        Args:
+            generator: QuestionGeneratorService used for refills
+            store: Pool storage backend (default from QUESTION_POOL_BACKEND)
+            context_provider: Loads context and existing questions for a key
+        """
+        self.logger = logger
+        self.generator = generator
+        self.store = store or self._create_store()
+        self.context_provider = context_provider
+        
+        # Per-key targets: {"target": int, "low_water": int, "ttl_seconds": int}
+        self.key_configs: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        for entry in settings.QUESTION_POOL_KEYS:
+            self.configure_key(
+                entry["exam_type"],
+                entry["topic"],
+                entry["difficulty"],
+                target=entry.get("target"),
+                low_water=entry.get("low_water"),
+                ttl_seconds=entry.get("ttl_seconds")
+            )
+        
+        self._refill_tasks: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        # Recent request times of keys that are not hot (yet)
+        self._demand: Dict[Tuple[str, str, str], Deque[float]] = {}
+        self.stats = {"hits": 0, "misses": 0, "refills": 0, "questions_generated": 0}
+    
+    def _create_store(self) -> QuestionPoolStore:
+        """Pick the storage backend from settings"""
+        if settings.QUESTION_POOL_BACKEND == "redis":
+            return RedisPoolStore(settings.REDIS_URL)
+        return InMemoryPoolStore()
+    
+    def configure_key(
+        self,
+        exam_type: str,
+        topic: str,
+        difficulty: str,
+        target: Optional[int] = None,
+        low_water: Optional[int] = None,
+        ttl_seconds: Optional[int] = None
+    ) -> None:
+        """Register (or update) a hot key and its pool sizing"""
+        self.key_configs[(exam_type, topic, difficulty.upper())] = {
+            "target": target or settings.QUESTION_POOL_DEFAULT_TARGET,
+            "low_water": (
+                low_water if low_water is not None else settings.QUESTION_POOL_DEFAULT_LOW_WATER
+            ),
+            "ttl_seconds": ttl_seconds or settings.QUESTION_POOL_DEFAULT_TTL_SECONDS,
+        }
+    
+    def _store_key(self, key: Tuple[str, str, str]) -> str:
+        return ":".join(part.replace(":", "_") for part in key)
+    
+    async def get_question(
+        self,
+        exam_type: str,
+        topic: str,
+        difficulty: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Take a pre-generated question for a key, triggering a refill when the
+        pool drops below its low-water mark
+        
+        Args:
+            exam_type: Type of exam
+            topic: Topic
+            difficulty: Difficulty level
+            
+        Returns:
+            Pooled question or None on a miss
+        """
+        key = (exam_type, topic, difficulty.upper())
+        
+        # Keys in repeated demand become hot, up to QUESTION_POOL_MAX_KEYS
+        if (
+            key not in self.key_configs
+            and len(self.key_configs) < settings.QUESTION_POOL_MAX_KEYS
+            and self._record_demand(key)
+        ):
+            self.configure_key(*key)
+        
+        question = await self.store.pop(self._store_key(key))
+        
+        if question is not None:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+        
+        config = self.key_configs.get(key)
+        if config and await self.store.size(self._store_key(key)) < config["low_water"]:
+            self.schedule_refill(key)
+        
+        return question
+    
+    def _record_demand(self, key: Tuple[str, str, str]) -> bool:
+        """
+        Count a request for a key that is not hot
+        
+        Returns:
+            True once the key was requested QUESTION_POOL_PROMOTE_REQUESTS
+            times within QUESTION_POOL_PROMOTE_WINDOW_SECONDS
+        """
+        if settings.QUESTION_POOL_PROMOTE_REQUESTS <= 0:
+            return False
+        
+        now = time.monotonic()
+        cutoff = now - settings.QUESTION_POOL_PROMOTE_WINDOW_SECONDS
+        requests = self._demand.setdefault(key, deque())
+        requests.append(now)
+        while requests[0] <= cutoff:
+            requests.popleft()
+        
+        if len(requests) >= settings.QUESTION_POOL_PROMOTE_REQUESTS:
+            del self._demand[key]
+            return True
+        
+        # Bound the tracking of long-tail keys: forget stale ones, then the oldest
+        if len(self._demand) > settings.QUESTION_POOL_MAX_KEYS:
+            self._demand = {k: v for k, v in self._demand.items() if v[-1] > cutoff}
+            while len(self._demand) > settings.QUESTION_POOL_MAX_KEYS:
+                del self._demand[next(iter(self._demand))]
+        return False
+    
+    def schedule_refill(self, key: Tuple[str, str, str]) -> None:
+        """Start a background refill for a key unless one is already running"""
+        running = self._refill_tasks.get(key)
+        if running is not None and not running.done():
+            return
+        # Refills queue behind interactive and batch LLM calls
+        with priority_scope(BACKGROUND):
+            self._refill_tasks[key] = asyncio.create_task(self.refill(key))
+    
+    async def refill(self, key: Tuple[str, str, str]) -> int:
+        """
+        Top a key's pool back up to its target
+        
+        Args:
+            key: (exam_type, topic, difficulty)
+            
+        Returns:
+            Number of questions added
+        """
+        config = self.key_configs[key]
+        store_key = self._store_key(key)
+        # A slow refill may outlive its lock; the token keeps it from
+        # releasing the lock another worker took over since
+        owner = uuid.uuid4().hex
+        
+        if not await self.store.acquire_refill_lock(
+            store_key, owner, settings.QUESTION_POOL_REFILL_LOCK_SECONDS
+        ):
+            return 0
+        
+        try:
+            deficit = config["target"] - await self.store.size(store_key)
+            if deficit <= 0:
+                return 0
+            
+            exam_type, topic, difficulty = key
+            # Without a provider the generator uses its context index
+            context_questions, existing_questions = None, None
+            if self.context_provider:
+                context_questions, existing_questions = await self.context_provider(
+                    exam_type, topic, difficulty
+                )
+            
+            self.logger.info(f"Refilling question pool {store_key} with {deficit} questions")
+            
+            results = await self.generator.generate_batch(
+                specifications=[{"topic": topic, "difficulty": difficulty}] * deficit,
+                exam_type=exam_type,
+                context_questions=context_questions,
+                existing_questions=existing_questions
+            )
+            
+            questions = results["questions"]
+            
+            # Pool entries are served without a user waiting, so vet them first
+            if settings.QUESTION_POOL_VALIDATE and questions:
+                validations = await self.generator.validate_batch(questions, exam_type)
+                questions = [
+                    {**q, "validation": v}
+                    for q, v in zip(questions, validations)
+                    if v.get("is_valid")
+                ]
+            
+            await self.store.push(store_key, questions, config["ttl_seconds"])
+            
+            self.stats["refills"] += 1
+            self.stats["questions_generated"] += len(questions)
+            return len(questions)
+        
+        except Exception as e:
+            self.logger.error(f"Error refilling question pool {store_key}: {str(e)}")
+            return 0
+        finally:
+            await self.store.release_refill_lock(store_key, owner)
+    
+    async def start(self) -> None:
+        """Warm every configured key in the background"""
+        for key in list(self.key_configs):
+            self.schedule_refill(key)
+    
+    async def stop(self) -> None:
+        """Cancel running refills and close the store"""
+        for task in self._refill_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._refill_tasks.values(), return_exceptions=True)
+        self._refill_tasks.clear()
+        await self.store.close()
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current pool sizes per key"""
+        sizes = {}
+        for key in self.key_configs:
+            store_key = self._store_key(key)
+            sizes[store_key] = await self.store.size(store_key)
+        
+        return {**self.stats, "pool_sizes": sizes}
@@ -0,0 +1,167 @@
+"""
+Rate Limiter - Token-bucket scheduling for Azure OpenAI deployment quotas
+Keeps callers under the deployment's requests-per-minute and tokens-per-minute
+limits and backs off everyone when the service answers 429
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from src.services.resilience import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at a per-minute rate"""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.refill_per_second
+        )
+        self._updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self._refill()
+        # Requests larger than the bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+    
+    def consume(self, amount: float) -> None:
+        """Take tokens (may go negative when reconciling actual usage)"""
+        self._refill()
+        self.tokens -= amount
+
+
+class LLMRateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter for one deployment"""
+    
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        queue: Optional[Any] = None
+    ):
+        """
+        Args:
+            requests_per_minute: RPM quota (0 disables the request bucket)
+            tokens_per_minute: TPM quota (0 disables the token bucket)
+            queue: Single-slot scheduler ordering the waiters (e.g. by
+                priority); default first come, first served
+        """
+        self.logger = logger
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._paused_until = 0.0
+        self.queue = queue
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "acquired": 0,
+            "throttled": 0,
+            "rate_limited": 0,
+            "deadline_exceeded": 0,
+            "wait_seconds": 0.0,
+        }
+    
+    async def acquire(self, estimated_tokens: int, deadline: Optional[float] = None) -> None:
+        """
+        Wait until a request of the estimated size fits within the quotas
+        
+        Args:
+            estimated_tokens: Prompt plus max completion tokens
+            deadline: time.monotonic() by which the request must be sent
+                (None waits as long as the quotas require)
+            
+        Raises:
+            DeadlineExceeded: The quotas would only allow the request after
+                the deadline (nothing is consumed)
+        """
+        waited = 0.0
+        timeout = None if deadline is None else deadline - time.monotonic()
+        
+        try:
+            # One waiter at a time keeps the buckets fair
+            async with asyncio.timeout(timeout):
+                async with (self.queue.slot() if self.queue is not None else self._lock):
+                    while True:
+                        delay = max(0.0, self._paused_until - time.monotonic())
+                        if self.requests is not None:
+                            delay = max(delay, self.requests.wait_time(1))
+                        if self.tokens is not None:
+                            delay = max(delay, self.tokens.wait_time(estimated_tokens))
+                        
+                        if delay <= 0:
+                            break
+                        # Fail now rather than sleep into a deadline we cannot meet
+                        if deadline is not None and time.monotonic() + delay > deadline:
+                            raise DeadlineExceeded("Quota frees up only after the request deadline")
+                        
+                        waited += delay
+                        await asyncio.sleep(delay)
+                    
+                    if self.requests is not None:
+                        self.requests.consume(1)
+                    if self.tokens is not None:
+                        self.tokens.consume(estimated_tokens)
+        except DeadlineExceeded:
+            self.stats["deadline_exceeded"] += 1
+            raise
+        except TimeoutError:
+            self.stats["deadline_exceeded"] += 1
+            raise DeadlineExceeded("Request deadline passed while queued for quota") from None
+        
+        self.stats["acquired"] += 1
+        if waited > 0:
+            self.stats["throttled"] += 1
+            self.stats["wait_seconds"] += waited
+    
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the real usage is known"""
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+    
+    def pause(self, seconds: float) -> None:
+        """Hold all callers after a 429 for the server-advised interval"""
+        self.stats["rate_limited"] += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.logger.warning(f"Rate limited by Azure OpenAI, pausing for {seconds:.1f}s")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus remaining bucket levels"""
+        stats = dict(self.stats)
+        stats["requests_available"] = self.requests.tokens if self.requests else None
+        stats["tokens_available"] = self.tokens.tokens if self.tokens else None
+        return stats
+
+
+def retry_after_seconds(error: Any, default: float) -> float:
+    """Read the Retry-After hint from a 429 response, falling back to a default"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+    
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    
+    return default
@@ -0,0 +1,277 @@
+"""
+Resilience - Deadlines, retries, circuit breaking and hedging for LLM calls
+Wraps outbound calls so a degraded Azure deployment fails fast instead of
+holding every request until the SDK timeout
+"""
+import asyncio
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# time.monotonic() by which the request being served must be answered
+# (None: no request deadline). Set per generation, read by outbound calls.
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when work would start after the request's deadline"""
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the request deadline (None without one)"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def deadline_budget(default: float) -> float:
+    """
+    Budget for one outbound call: the default, capped by the request deadline
+    
+    Raises:
+        DeadlineExceeded: The request deadline has already passed
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, remaining)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    closed: calls pass through. After `failure_threshold` consecutive
+    failures it opens and rejects calls for `recovery_timeout` seconds, then
+    lets a single probe through (half-open); a success closes it again.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        """Whether a call may proceed right now"""
+        if self.state == "closed":
+            return True
+        
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.recovery_timeout:
+                return False
+            self.state = "half_open"
+            self._probe_in_flight = False
+        
+        # Half-open: exactly one probe at a time
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+    
+    def is_available(self) -> bool:
+        """Whether a call could be let through now (without claiming the probe)"""
+        if self.state == "open":
+            return time.monotonic() - self._opened_at >= self.recovery_timeout
+        return not (self.state == "half_open" and self._probe_in_flight)
+    
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"Circuit '{self.name}' closed")
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._probe_in_flight = False
+    
+    def release(self) -> None:
+        """End a call that says nothing about health (client error, cancellation)"""
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        self._probe_in_flight = False
+        
+        if self.state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(
+                    f"Circuit '{self.name}' opened after {self._consecutive_failures} failures"
+                )
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """Runs an async call with per-attempt timeouts, jittered backoff, a breaker and hedging"""
+    
+    def __init__(
+        self,
+        name: str,
+        attempt_timeout: float,
+        deadline: float,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        breaker: CircuitBreaker,
+        retry_on: Tuple[Type[BaseException], ...],
+        hedge_delay: float = 0.0
+    ):
+        """
+        Args:
+            name: Name used in logs and stats
+            attempt_timeout: Timeout for a single attempt in seconds
+            deadline: Overall budget across all attempts in seconds
+            max_attempts: Attempts before giving up
+            base_delay: First backoff delay in seconds
+            max_delay: Backoff cap in seconds
+            breaker: Circuit breaker guarding the dependency
+            retry_on: Exception types treated as transient
+            hedge_delay: Launch a second identical request if the first has
+                not answered after this many seconds (0 disables hedging)
+        """
+        self.logger = logger
+        self.name = name
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+        self.retry_on = retry_on
+        self.hedge_delay = hedge_delay
+        self.stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "short_circuited": 0,
+            "hedges_launched": 0,
+            "hedges_won": 0,
+        }
+    
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        deadline: Optional[float] = None,
+        hedge: bool = True
+    ) -> T:
+        """
+        Run `fn` under the resilience policy
+        
+        Args:
+            fn: Zero-argument coroutine factory (called once per attempt/hedge)
+            deadline: Overall budget in seconds (default from the caller config)
+            hedge: Allow a hedged duplicate request (off for calls with side
+                effects while running, e.g. streams reporting partial output)
+            
+        Returns:
+            The call's result
+            
+        Raises:
+            CircuitOpenError: The breaker is open
+            asyncio.TimeoutError: The deadline ran out
+            Exception: The last error once retries are exhausted, or any
+                non-transient error immediately
+        """
+        self.stats["calls"] += 1
+        budget_ends = time.monotonic() + (deadline if deadline is not None else self.deadline)
+        last_error: Optional[BaseException] = None
+        
+        for attempt in range(self.max_attempts):
+            # Checked before allow(), which may claim the half-open probe
+            remaining = budget_ends - time.monotonic()
+            if remaining <= 0:
+                break
+            
+            if not self.breaker.allow():
+                self.stats["short_circuited"] += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            
+            try:
+                result = await asyncio.wait_for(
+                    self._attempt(fn, hedge),
+                    timeout=min(self.attempt_timeout, remaining)
+                )
+                self.breaker.record_success()
+                self.stats["successes"] += 1
+                return result
+            
+            except asyncio.TimeoutError as e:
+                self.stats["timeouts"] += 1
+                last_error = e
+            except self.retry_on as e:
+                last_error = e
+            except BaseException:
+                # Not a health problem of the deployment (bad request, 429,
+                # cancellation): free a half-open probe without judging health
+                self.breaker.release()
+                raise
+            
+            self.breaker.record_failure()
+            
+            if attempt + 1 < self.max_attempts:
+                # Full jitter keeps retrying callers from stampeding together
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if time.monotonic() + delay >= budget_ends:
+                    break
+                self.stats["retries"] += 1
+                self.logger.warning(
+                    f"{self.name} attempt {attempt + 1} failed ({type(last_error).__name__}), "
+                    f"retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+        
+        self.stats["failures"] += 1
+        if last_error is None:
+            raise asyncio.TimeoutError(f"{self.name} deadline exceeded")
+        raise last_error
+    
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+        """One attempt, optionally hedged with a delayed duplicate request"""
+        if not hedge or self.hedge_delay <= 0:
+            return await fn()
+        
+        primary = asyncio.ensure_future(fn())
+        hedge: Optional[asyncio.Future] = None
+        
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay)
+            if done:
+                return primary.result()
+            
+            self.stats["hedges_launched"] += 1
+            hedge = asyncio.ensure_future(fn())
+            pending = {primary, hedge}
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedges_won"] += 1
+                        return task.result()
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None:
+                    task.cancel()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus the breaker state"""
+        return {**self.stats, "circuit_state": self.breaker.state}
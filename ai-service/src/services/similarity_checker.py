@@ -2,12 +2,19 @@
 Similarity Checker Service - Check similarity between questions using embeddings
 Uses Azure OpenAI embeddings to calculate semantic similarity
 """
+import asyncio
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import numpy as np
-from openai import AzureOpenAI
 
 from src.config.settings import settings
+from src.services.cache import LRUCache
+from src.services.deduplicator import get_question_text
+from src.services.embedding_coalescer import embedding_coalescer
+from src.services.lexical_index import LexicalIndex
+from src.services.llm_client import llm_client
+from src.services.telemetry import trace_stage
 
 logger = logging.getLogger(__name__)
 
@@ -16,23 +23,26 @@ class SimilarityCheckerService:
     """Service for checking question similarity using embeddings"""
     
     def __init__(self):
-        """Initialize similarity checker with Azure OpenAI client"""
+        """Initialize similarity checker with the shared Azure OpenAI client"""
         self.logger = logger
-        self.client = None
-        
-        # Initialize Azure OpenAI client if credentials available
-        if settings.AZURE_OPENAI_API_KEY and settings.AZURE_OPENAI_ENDPOINT:
-            try:
-                self.client = AzureOpenAI(
-                    api_key=settings.AZURE_OPENAI_API_KEY,
-                    api_version=settings.AZURE_OPENAI_API_VERSION,
-                    azure_endpoint=settings.AZURE_OPENAI_ENDPOINT
-                )
-                self.logger.info("Azure OpenAI client initialized successfully")
-            except Exception as e:
-                self.logger.error(f"Failed to initialize Azure OpenAI client: {str(e)}")
-        else:
-            self.logger.warning("Azure OpenAI credentials not configured")
+        self.client = llm_client
+        self.coalescer = embedding_coalescer
+        
+        # PYQ texts are embedded over and over across checks, so keep them
+        self.embedding_cache = LRUCache(max_size=settings.EMBEDDING_CACHE_SIZE)
+        
+        # Sparse first stage of the lexical-then-semantic cascade
+        # corpus (exam type) -> (corpus version, index)
+        self.lexical_indexes: Dict[str, Tuple[int, LexicalIndex]] = {}
+        self._lexical_builds: Dict[Tuple[str, int], asyncio.Task] = {}
+        self.cascade_stats = {
+            "checks": 0,
+            "short_circuited": 0,
+            "skipped_unversioned": 0,
+            "candidates": 0,
+            "embedding_comparisons": 0,
+            "embedding_comparisons_saved": 0,
+        }
     
     async def get_embedding(self, text: str) -> Optional[List[float]]:
         """
@@ -44,22 +54,72 @@ class SimilarityCheckerService:
         Returns:
             Embedding vector or None if failed
         """
-        if not self.client:
-            self.logger.error("Azure OpenAI client not initialized")
-            return None
+        embeddings = await self.get_embeddings([text])
+        return embeddings[0]
+    
+    async def get_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Get embedding vectors for many texts. Uncached texts go through the
+        shared coalescer, which batches them with concurrent callers' texts
         
-        try:
-            response = self.client.embeddings.create(
-                input=text,
-                model=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
-            )
+        Args:
+            texts: Texts to embed
             
-            embedding = response.data[0].embedding
-            return embedding
+        Returns:
+            Embedding vectors in input order (all None when no client is configured)
             
-        except Exception as e:
-            self.logger.error(f"Error getting embedding: {str(e)}")
-            return None
+        Raises:
+            The embeddings error if any uncached text could not be embedded,
+            so originality checks fail closed instead of passing unchecked
+        """
+        if not self.client.is_configured:
+            self.logger.error("Azure OpenAI client not initialized")
+            return [None] * len(texts)
+        
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        
+        for i, text in enumerate(texts):
+            key = self._cache_key(text)
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                missing.setdefault(text, []).append(i)
+        
+        pending = list(missing.keys())
+        with trace_stage("embedding"):
+            vectors = await self.coalescer.embed_many(pending)
+        
+        for text, vector in zip(pending, vectors):
+            if vector is None:
+                continue
+            self.embedding_cache.set(self._cache_key(text), vector)
+            for i in missing[text]:
+                embeddings[i] = vector
+        
+        return embeddings
+    
+    def _cache_key(self, text: str) -> str:
+        """Cache key for an embedding (model-specific)"""
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return f"{settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT}:{digest}"
+    
+    def _embedding_matrix(
+        self,
+        embeddings: List[Optional[List[float]]]
+    ) -> np.ndarray:
+        """Stack embeddings into a row-normalized matrix (zero rows where missing)"""
+        dim = next((len(e) for e in embeddings if e is not None), 0)
+        matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+        
+        for i, emb in enumerate(embeddings):
+            if emb is not None:
+                matrix[i] = emb
+        
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
     
     async def calculate_similarity(
         self,
@@ -77,8 +137,7 @@ class SimilarityCheckerService:
             Similarity score (0-1) or None if failed
         """
         # Get embeddings
-        emb1 = await self.get_embedding(text1)
-        emb2 = await self.get_embedding(text2)
+        emb1, emb2 = await self.get_embeddings([text1, text2])
         
         if emb1 is None or emb2 is None:
             return None
@@ -124,28 +183,25 @@ class SimilarityCheckerService:
         Returns:
             List of similar questions with similarity scores
         """
-        question_text = question.get("text", "")
+        question_text = get_question_text(question)
         if not question_text:
             return []
         
-        # Get embedding for target question
-        question_embedding = await self.get_embedding(question_text)
-        if question_embedding is None:
+        candidates = [c for c in candidate_questions if get_question_text(c)]
+        embeddings = await self.get_embeddings(
+            [question_text] + [get_question_text(c) for c in candidates]
+        )
+        if embeddings[0] is None:
             return []
         
         # Calculate similarity with each candidate
         similarities = []
         
-        for candidate in candidate_questions:
-            candidate_text = candidate.get("text", "")
-            if not candidate_text:
-                continue
-            
-            candidate_embedding = await self.get_embedding(candidate_text)
+        for candidate, candidate_embedding in zip(candidates, embeddings[1:]):
             if candidate_embedding is None:
                 continue
             
-            similarity = self._cosine_similarity(question_embedding, candidate_embedding)
+            similarity = self._cosine_similarity(embeddings[0], candidate_embedding)
             
             if similarity >= threshold:
                 similarities.append({
@@ -161,7 +217,12 @@ class SimilarityCheckerService:
         self,
         generated_question: Dict[str, Any],
         existing_questions: List[Dict[str, Any]],
-        max_similarity_threshold: float = None
+        max_similarity_threshold: float = None,
+        early_exit: bool = False,
+        exam_type: Optional[str] = None,
+        include_near_matches: bool = True,
+        cascade: bool = False,
+        corpus_version: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Check if a generated question is original enough
@@ -170,6 +231,16 @@ class SimilarityCheckerService:
             generated_question: The generated question to check
             existing_questions: List of existing PYQs
             max_similarity_threshold: Maximum allowed similarity (default from settings)
+            early_exit: Only scan the exam type / topic neighbourhood and stop
+                at the first candidate over the threshold
+            exam_type: Exam type to restrict candidates to (early-exit mode)
+            include_near_matches: Report the closest matches, not just the verdict
+            cascade: Shortlist candidates by TF-IDF score before comparing embeddings
+            corpus_version: Version of existing_questions for the exam
+                (context_retriever.get_version); the cascade's lexical index
+                is reused until it changes. The cascade is skipped for an
+                unversioned corpus (None), which it would have to re-index
+                on every check.
             
         Returns:
             Originality check result
@@ -177,21 +248,310 @@ class SimilarityCheckerService:
         if max_similarity_threshold is None:
             max_similarity_threshold = settings.MAX_SIMILARITY_THRESHOLD
         
-        # Find similar questions
-        similar = await self.find_similar_questions(
-            generated_question,
-            existing_questions,
-            threshold=0.3,  # Lower threshold to catch potential issues
-            max_results=5
+        cascade_info = None
+        if cascade and corpus_version is None:
+            self.cascade_stats["skipped_unversioned"] += 1
+        elif cascade:
+            existing_questions, cascade_info = await self.lexical_shortlist(
+                generated_question,
+                existing_questions,
+                corpus=exam_type,
+                corpus_version=corpus_version
+            )
+        
+        if cascade_info is not None and not existing_questions:
+            # Nothing shares enough terms to be a copy: no embedding call needed
+            self.cascade_stats["short_circuited"] += 1
+            result = self._originality_result([], max_similarity_threshold)
+        elif early_exit:
+            result = await self._check_originality_early_exit(
+                generated_question,
+                existing_questions,
+                max_similarity_threshold,
+                exam_type,
+                include_near_matches
+            )
+        else:
+            # Find similar questions
+            similar = await self.find_similar_questions(
+                generated_question,
+                existing_questions,
+                threshold=0.3,  # Lower threshold to catch potential issues
+                max_results=5
+            )
+            
+            result = self._originality_result(similar, max_similarity_threshold)
+            if not include_near_matches:
+                result["similar_questions"] = []
+        
+        if cascade_info is not None:
+            result["cascade"] = cascade_info
+        return result
+    
+    def build_lexical_index(self, questions: List[Dict[str, Any]]) -> LexicalIndex:
+        """
+        Build a TF-IDF index over a PYQ bank (CPU-bound: run it in a thread)
+        
+        Args:
+            questions: Questions to index
+            
+        Returns:
+            The index
+        """
+        index = LexicalIndex()
+        index.add(questions)
+        index.prepare()
+        self.logger.info(f"Lexical index built over {len(questions)} questions")
+        return index
+    
+    async def get_lexical_index(
+        self,
+        questions: List[Dict[str, Any]],
+        corpus: Optional[str] = None,
+        corpus_version: Optional[int] = None
+    ) -> LexicalIndex:
+        """
+        TF-IDF index for a corpus, rebuilt off the event loop when its version changes
+        
+        Concurrent checks against the same version share one build.
+        
+        Args:
+            questions: The corpus
+            corpus: Corpus name (exam type)
+            corpus_version: Version of the corpus; None builds an uncached index
+            
+        Returns:
+            The index
+        """
+        # Snapshot: the bank may grow on the loop while the thread indexes it
+        snapshot = list(questions)
+        if corpus_version is None:
+            return await asyncio.to_thread(self.build_lexical_index, snapshot)
+        
+        corpus = corpus or ""
+        cached = self.lexical_indexes.get(corpus)
+        if cached is not None and cached[0] == corpus_version:
+            return cached[1]
+        
+        key = (corpus, corpus_version)
+        build = self._lexical_builds.get(key)
+        if build is None:
+            build = asyncio.ensure_future(asyncio.to_thread(self.build_lexical_index, snapshot))
+            self._lexical_builds[key] = build
+        try:
+            index = await asyncio.shield(build)
+        finally:
+            if build.done():
+                self._lexical_builds.pop(key, None)
+        
+        cached = self.lexical_indexes.get(corpus)
+        if cached is None or cached[0] < corpus_version:
+            self.lexical_indexes[corpus] = (corpus_version, index)
+        return index
+    
+    async def lexical_shortlist(
+        self,
+        question: Dict[str, Any],
+        candidate_questions: List[Dict[str, Any]],
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None,
+        corpus: Optional[str] = None,
+        corpus_version: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        First cascade stage: keep only candidates with a high lexical score
+        
+        Recall is tuned with top_k (more candidates, more embedding work) and
+        min_score (drop candidates with almost no term overlap).
+        
+        Args:
+            question: The question to compare
+            candidate_questions: Full candidate list
+            top_k: Shortlist size (default CASCADE_SHORTLIST_SIZE)
+            min_score: Minimum TF-IDF cosine (default CASCADE_MIN_LEXICAL_SCORE)
+            corpus: Corpus name the lexical index is cached under
+            corpus_version: Version of candidate_questions (see get_lexical_index)
+            
+        Returns:
+            Tuple of (shortlisted candidates, cascade stats for this check)
+        """
+        if top_k is None:
+            top_k = settings.CASCADE_SHORTLIST_SIZE
+        if min_score is None:
+            min_score = settings.CASCADE_MIN_LEXICAL_SCORE
+        
+        index = await self.get_lexical_index(candidate_questions, corpus, corpus_version)
+        hits = index.search(get_question_text(question), top_k, min_score)
+        shortlist = [index.documents[doc_id] for doc_id, _ in hits]
+        
+        info = {
+            "candidates": len(candidate_questions),
+            "shortlisted": len(shortlist),
+            "embedding_comparisons_saved": len(candidate_questions) - len(shortlist),
+        }
+        
+        self.cascade_stats["checks"] += 1
+        self.cascade_stats["candidates"] += info["candidates"]
+        self.cascade_stats["embedding_comparisons"] += info["shortlisted"]
+        self.cascade_stats["embedding_comparisons_saved"] += info["embedding_comparisons_saved"]
+        
+        return shortlist, info
+    
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        """
+        Cumulative cascade counters
+        
+        Checks either short-circuit (empty shortlist, no embedding call) or
+        go on to embed the shortlist (embedding_checks); saved_ratio is the
+        fraction of candidate comparisons the lexical stage removed.
+        """
+        stats = dict(self.cascade_stats)
+        stats["embedding_checks"] = stats["checks"] - stats["short_circuited"]
+        stats["saved_ratio"] = (
+            stats["embedding_comparisons_saved"] / stats["candidates"]
+            if stats["candidates"] else 0.0
+        )
+        return stats
+    
+    async def _check_originality_early_exit(
+        self,
+        generated_question: Dict[str, Any],
+        existing_questions: List[Dict[str, Any]],
+        max_similarity_threshold: float,
+        exam_type: Optional[str],
+        include_near_matches: bool
+    ) -> Dict[str, Any]:
+        """
+        Scan the topic neighbourhood block by block, most likely matches first,
+        and stop as soon as one candidate crosses the threshold
+        """
+        question_text = get_question_text(generated_question)
+        blocks = self._originality_blocks(generated_question, existing_questions, exam_type)
+        candidates_total = sum(len(block) for block in blocks)
+        
+        if not blocks:
+            # No neighbourhood (missing or unseen topic): scan everything
+            # rather than pass the question unchecked
+            similar = await self.find_similar_questions(
+                generated_question,
+                existing_questions,
+                threshold=0.3,
+                max_results=5
+            )
+            result = self._originality_result(similar, max_similarity_threshold)
+            if not include_near_matches:
+                result["similar_questions"] = []
+            result.update({
+                "candidates_scanned": len(existing_questions),
+                "candidates_total": len(existing_questions),
+            })
+            return result
+        
+        query_embedding = await self.get_embedding(question_text) if question_text else None
+        if query_embedding is None:
+            result = self._originality_result([], max_similarity_threshold)
+            result.update({"candidates_scanned": 0, "candidates_total": candidates_total})
+            return result
+        
+        query = self._embedding_matrix([query_embedding])[0]
+        block_size = settings.ORIGINALITY_BLOCK_SIZE
+        
+        best: Optional[Dict[str, Any]] = None
+        similar: List[Dict[str, Any]] = []
+        scanned = 0
+        
+        chunks = (
+            block[start:start + block_size]
+            for block in blocks
+            for start in range(0, len(block), block_size)
+        )
+        
+        for chunk in chunks:
+            embeddings = await self.get_embeddings([get_question_text(q) for q in chunk])
+            scores = self._embedding_matrix(embeddings) @ query
+            scanned += len(chunk)
+            
+            top = int(np.argmax(scores))
+            if best is None or scores[top] > best["similarity"]:
+                best = {"question": chunk[top], "similarity": float(scores[top])}
+            
+            if include_near_matches:
+                similar.extend(
+                    {"question": chunk[j], "similarity": float(scores[j])}
+                    for j in np.flatnonzero(scores >= 0.3)
+                )
+                similar.sort(key=lambda x: x["similarity"], reverse=True)
+                del similar[5:]
+            
+            if best["similarity"] >= max_similarity_threshold:
+                break
+        
+        result = self._originality_result(similar, max_similarity_threshold, best)
+        result.update({"candidates_scanned": scanned, "candidates_total": candidates_total})
+        
+        self.logger.debug(
+            f"Early-exit originality check scanned {scanned}/{candidates_total} candidates"
         )
+        return result
+    
+    def _originality_blocks(
+        self,
+        question: Dict[str, Any],
+        existing_questions: List[Dict[str, Any]],
+        exam_type: Optional[str]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Split the relevant candidates into blocks ordered by how likely they
+        are to be near-duplicates: same topic and difficulty, same topic, then
+        the topic neighbourhood (same parent topic or a shared concept).
+        Other exam types and unrelated topics are skipped entirely.
+        """
+        topic = (question.get("topic") or "").strip().lower()
+        parent_topic = topic.split(" - ")[0]
+        difficulty = (question.get("difficulty") or "").upper()
+        concepts = {c.lower() for c in question.get("concepts_tested") or []}
+        
+        same_difficulty, same_topic, neighbourhood = [], [], []
+        
+        for candidate in existing_questions:
+            if not get_question_text(candidate):
+                continue
+            
+            candidate_exam = candidate.get("exam_type") or candidate.get("examType")
+            if exam_type and candidate_exam and candidate_exam != exam_type:
+                continue
+            
+            candidate_topic = (candidate.get("topic") or "").strip().lower()
+            
+            if topic and candidate_topic == topic:
+                if (candidate.get("difficulty") or "").upper() == difficulty:
+                    same_difficulty.append(candidate)
+                else:
+                    same_topic.append(candidate)
+            elif parent_topic and candidate_topic.split(" - ")[0] == parent_topic:
+                neighbourhood.append(candidate)
+            elif concepts & {c.lower() for c in candidate.get("concepts_tested") or []}:
+                neighbourhood.append(candidate)
+        
+        return [block for block in (same_difficulty, same_topic, neighbourhood) if block]
+    
+    def _originality_result(
+        self,
+        similar: List[Dict[str, Any]],
+        max_similarity_threshold: float,
+        best_match: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Build the originality verdict from the closest matches"""
+        if best_match is None and similar:
+            best_match = similar[0]
         
         # Calculate maximum similarity
         max_similarity = 0.0
         most_similar_question = None
         
-        if similar:
-            max_similarity = similar[0]["similarity"]
-            most_similar_question = similar[0]["question"]
+        if best_match:
+            max_similarity = best_match["similarity"]
+            most_similar_question = best_match["question"]
         
         # Determine if original
         is_original = max_similarity < max_similarity_threshold
@@ -205,28 +565,109 @@ class SimilarityCheckerService:
             "verdict": "PASS" if is_original else "FAIL - Too similar to existing questions"
         }
     
+    def _unchecked_result(
+        self,
+        question_index: int,
+        max_similarity_threshold: float,
+        reason: str
+    ) -> Dict[str, Any]:
+        """Failing verdict for a question whose originality could not be checked"""
+        return {
+            "is_original": False,
+            # Unknown: rank it below every question that was actually checked
+            "max_similarity": 1.0,
+            "max_similarity_threshold": max_similarity_threshold,
+            "similar_questions": [],
+            "most_similar_question": None,
+            "verdict": f"ERROR - {reason}",
+            "error": reason,
+            "question_index": question_index,
+        }
+    
     async def batch_check_originality(
         self,
         generated_questions: List[Dict[str, Any]],
-        existing_questions: List[Dict[str, Any]]
+        existing_questions: List[Dict[str, Any]],
+        max_similarity_threshold: float = None
     ) -> List[Dict[str, Any]]:
         """
         Check originality for multiple generated questions
         
+        All texts are embedded in batched calls and the generated x existing
+        and generated x generated similarity blocks are computed with one
+        matrix multiply each. A question that passes against the PYQs but
+        duplicates an earlier accepted question in the same batch is rejected.
+        Questions that cannot be fully compared (their embedding, or a PYQ's,
+        is missing) fail closed with an "error" instead of passing.
+        
         Args:
             generated_questions: List of generated questions
             existing_questions: List of existing PYQs
+            max_similarity_threshold: Maximum allowed similarity (default from settings)
             
         Returns:
             List of originality check results
         """
+        if max_similarity_threshold is None:
+            max_similarity_threshold = settings.MAX_SIMILARITY_THRESHOLD
+        
+        if not generated_questions:
+            return []
+        
+        existing = [q for q in existing_questions if get_question_text(q)]
+        embeddings = await self.get_embeddings(
+            [get_question_text(q) for q in generated_questions]
+            + [get_question_text(q) for q in existing]
+        )
+        
+        n_generated = len(generated_questions)
+        # A zero row would score 0 against everything, i.e. look original
+        missing_existing = sum(1 for e in embeddings[n_generated:] if e is None)
+        matrix = self._embedding_matrix(embeddings)
+        generated_matrix = matrix[:n_generated]
+        existing_matrix = matrix[n_generated:]
+        
+        vs_existing = generated_matrix @ existing_matrix.T
+        vs_generated = generated_matrix @ generated_matrix.T
+        
         results = []
+        accepted: List[int] = []
         
-        for i, question in enumerate(generated_questions):
-            self.logger.info(f"Checking originality for question {i+1}/{len(generated_questions)}")
+        for i in range(n_generated):
+            if embeddings[i] is None or missing_existing:
+                reason = (
+                    "Question could not be embedded" if embeddings[i] is None
+                    else f"{missing_existing} existing questions could not be embedded"
+                )
+                results.append(self._unchecked_result(i, max_similarity_threshold, reason))
+                continue
             
-            result = await self.check_originality(question, existing_questions)
+            row = vs_existing[i]
+            top = np.argsort(-row)[:5]
+            similar = [
+                {"question": existing[j], "similarity": float(row[j])}
+                for j in top
+                if row[j] >= 0.3
+            ]
+            
+            result = self._originality_result(similar, max_similarity_threshold)
             result["question_index"] = i
+            
+            if result["is_original"]:
+                duplicate_of = next(
+                    (j for j in accepted if vs_generated[i, j] >= max_similarity_threshold),
+                    None
+                )
+                if duplicate_of is not None:
+                    result.update({
+                        "is_original": False,
+                        "intra_batch_duplicate_of": duplicate_of,
+                        "intra_batch_similarity": float(vs_generated[i, duplicate_of]),
+                        "verdict": f"FAIL - Duplicate of question {duplicate_of + 1} in this batch"
+                    })
+                else:
+                    accepted.append(i)
+            
             results.append(result)
         
         # Summary
@@ -0,0 +1,317 @@
+"""
+Generation Telemetry - Structured per-generation records and metrics
+Each generate_question call produces one record (tokens, attempts, stage
+latencies, cost, outcome) kept in a ring buffer, plus process-wide counters
+and histograms that can be scraped in Prometheus text format
+"""
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from src.config.settings import settings
+
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+ATTEMPT_BUCKETS = [1, 2, 3, 4, 5, 10]
+
+# Stages timed inside a generation. "originality" includes the embedding time
+# spent on the candidates; "validation" overlaps it when run concurrently.
+STAGES = ("prompt_build", "llm", "embedding", "originality", "validation")
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style)"""
+    
+    def __init__(self, buckets: List[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+    
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound label, cumulative count) pairs including +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            total += count
+            pairs.append(("+Inf" if bound == float("inf") else f"{bound:g}", total))
+        return pairs
+
+
+class GenerationTrace:
+    """Accumulates telemetry for one generate_question call"""
+    
+    def __init__(self, exam_type: str, topic: str, difficulty: str):
+        self.exam_type = exam_type
+        self.topic = topic
+        self.difficulty = difficulty
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.attempts = 0
+        self.candidates = 0
+        self.questions = 0
+        self.errors = 0
+        self.early_rejections = 0  # Streams cancelled once question_text was too similar
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.max_similarity: Optional[float] = None
+        self.outcome = "exhausted"
+        self.total_seconds: Optional[float] = None
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the wall time of the block to a stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+    
+    def add_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+    
+    @property
+    def cost_usd(self) -> float:
+        return (
+            self.prompt_tokens / 1000.0 * settings.LLM_PROMPT_COST_PER_1K
+            + self.completion_tokens / 1000.0 * settings.LLM_COMPLETION_COST_PER_1K
+        )
+    
+    def finish(self) -> None:
+        self.total_seconds = time.perf_counter() - self._started
+    
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "timestamp": self.started_at,
+            "exam_type": self.exam_type,
+            "topic": self.topic,
+            "difficulty": self.difficulty,
+            "outcome": self.outcome,
+            "attempts": self.attempts,
+            "candidates": self.candidates,
+            "questions": self.questions,
+            "errors": self.errors,
+            "early_rejections": self.early_rejections,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "max_similarity": self.max_similarity,
+            "total_seconds": self.total_seconds,
+            "stage_seconds": dict(self.stages),
+        }
+
+
+# Trace of the generation running in the current task (None outside one)
+current_trace: ContextVar[Optional[GenerationTrace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def trace_stage(name: str) -> Iterator[None]:
+    """Time a block against the current generation's trace, if any"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+class GenerationTelemetry:
+    """Ring buffer of recent generation records plus cumulative metrics"""
+    
+    def __init__(self, capacity: int):
+        self.records: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.outcomes: Dict[str, int] = {}
+        self.accepted = 0  # Questions returned (a grouped generation can return several)
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.cost_usd = 0.0
+        self.latency = {stage: Histogram(LATENCY_BUCKETS) for stage in ("total",) + STAGES}
+        self.attempts = Histogram(ATTEMPT_BUCKETS)
+        self.attempts_per_success = Histogram(ATTEMPT_BUCKETS)
+    
+    def record(self, trace: GenerationTrace) -> Dict[str, Any]:
+        """Store a finished trace and update the metrics"""
+        if trace.total_seconds is None:
+            trace.finish()
+        record = trace.to_record()
+        self.records.append(record)
+        
+        self.outcomes[trace.outcome] = self.outcomes.get(trace.outcome, 0) + 1
+        self.accepted += trace.questions
+        self.tokens["prompt"] += trace.prompt_tokens
+        self.tokens["completion"] += trace.completion_tokens
+        self.cost_usd += trace.cost_usd
+        self.attempts.observe(trace.attempts)
+        if trace.outcome == "success":
+            self.attempts_per_success.observe(trace.attempts)
+        self.latency["total"].observe(trace.total_seconds)
+        for stage, seconds in trace.stages.items():
+            if stage in self.latency:
+                self.latency[stage].observe(seconds)
+        
+        return record
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Cumulative LLM attempts against accepted questions since startup"""
+        attempts = int(self.attempts.sum)
+        return {
+            "generations": self.attempts.count,
+            "attempts": attempts,
+            "accepted": self.accepted,
+            "attempts_per_accepted": attempts / self.accepted if self.accepted else None,
+        }
+    
+    def summary(self, last_n: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Summarize the most recent generations
+        
+        Args:
+            last_n: Number of records to summarize (default: whole buffer)
+            
+        Returns:
+            Outcomes, attempts, tokens, cost, latency percentiles per stage
+            and the (exam, topic, difficulty) keys burning the most attempts
+        """
+        records = list(self.records)
+        if last_n:
+            records = records[-last_n:]
+        count = len(records)
+        
+        outcomes: Dict[str, int] = {}
+        by_key: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        for r in records:
+            outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+            
+            key = (r["exam_type"], r["topic"], r["difficulty"])
+            entry = by_key.setdefault(key, {
+                "exam_type": key[0], "topic": key[1], "difficulty": key[2],
+                "generations": 0, "successes": 0, "attempts": 0, "cost_usd": 0.0,
+            })
+            entry["generations"] += 1
+            entry["successes"] += r["outcome"] == "success"
+            entry["attempts"] += r["attempts"]
+            entry["cost_usd"] += r["cost_usd"]
+        
+        for entry in by_key.values():
+            entry["avg_attempts"] = entry["attempts"] / entry["generations"]
+            entry["cost_usd"] = round(entry["cost_usd"], 6)
+        
+        latency = {}
+        for stage in ("total",) + STAGES:
+            values = [
+                r["total_seconds"] if stage == "total" else r["stage_seconds"].get(stage)
+                for r in records
+            ]
+            values = [v for v in values if v is not None]
+            latency[stage] = {
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "p99": _percentile(values, 99),
+            }
+        
+        # How many LLM calls each accepted question took
+        attempts_per_success: Dict[int, int] = {}
+        for r in records:
+            if r["outcome"] == "success":
+                attempts_per_success[r["attempts"]] = attempts_per_success.get(r["attempts"], 0) + 1
+        
+        prompt_tokens = sum(r["prompt_tokens"] for r in records)
+        completion_tokens = sum(r["completion_tokens"] for r in records)
+        cost = sum(r["cost_usd"] for r in records)
+        attempts = sum(r["attempts"] for r in records)
+        
+        return {
+            "generations": count,
+            "outcomes": outcomes,
+            "success_rate": outcomes.get("success", 0) / count if count else 0.0,
+            "avg_attempts": attempts / count if count else 0.0,
+            "attempts_per_success": dict(sorted(attempts_per_success.items())),
+            "llm_calls_per_success": (
+                attempts / outcomes["success"] if outcomes.get("success") else None
+            ),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": round(cost, 6),
+            "avg_cost_usd": round(cost / count, 6) if count else 0.0,
+            "latency_seconds": latency,
+            "top_keys_by_attempts": sorted(
+                by_key.values(), key=lambda e: e["attempts"], reverse=True
+            )[:10],
+            "top_keys_by_cost": sorted(
+                by_key.values(), key=lambda e: e["cost_usd"], reverse=True
+            )[:10],
+        }
+    
+    def prometheus(self) -> str:
+        """Counters and histograms in Prometheus text exposition format"""
+        lines = [
+            "# HELP generation_total Generations by outcome",
+            "# TYPE generation_total counter",
+        ]
+        for outcome, value in sorted(self.outcomes.items()):
+            lines.append(f'generation_total{{outcome="{outcome}"}} {value}')
+        
+        lines += [
+            "# HELP generation_tokens_total LLM tokens used by generation",
+            "# TYPE generation_tokens_total counter",
+        ]
+        for kind, value in self.tokens.items():
+            lines.append(f'generation_tokens_total{{kind="{kind}"}} {value}')
+        
+        lines += [
+            "# HELP generation_cost_usd_total Estimated LLM cost of generation",
+            "# TYPE generation_cost_usd_total counter",
+            f"generation_cost_usd_total {self.cost_usd:.6f}",
+            "# HELP generation_stage_seconds Time spent per generation stage",
+            "# TYPE generation_stage_seconds histogram",
+        ]
+        for stage, histogram in self.latency.items():
+            for bound, count in histogram.cumulative():
+                lines.append(
+                    f'generation_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}'
+                )
+            lines.append(f'generation_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'generation_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        
+        lines += [
+            "# HELP generation_attempts LLM attempts per generation",
+            "# TYPE generation_attempts histogram",
+        ]
+        for bound, count in self.attempts.cumulative():
+            lines.append(f'generation_attempts_bucket{{le="{bound}"}} {count}')
+        lines.append(f"generation_attempts_sum {self.attempts.sum:g}")
+        lines.append(f"generation_attempts_count {self.attempts.count}")
+        
+        lines += [
+            "# HELP generation_attempts_per_success LLM attempts per accepted question",
+            "# TYPE generation_attempts_per_success histogram",
+        ]
+        for bound, count in self.attempts_per_success.cumulative():
+            lines.append(f'generation_attempts_per_success_bucket{{le="{bound}"}} {count}')
+        lines.append(f"generation_attempts_per_success_sum {self.attempts_per_success.sum:g}")
+        lines.append(f"generation_attempts_per_success_count {self.attempts_per_success.count}")
+        
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide telemetry shared by all generators
+generation_telemetry = GenerationTelemetry(settings.TELEMETRY_BUFFER_SIZE)
@@ -0,0 +1,137 @@
+"""
+Token Budgeter - Token counting and prompt budgets
+Counts tokens with tiktoken once its encoding is loaded at startup (falling
+back to a characters-per-token heuristic), fits context examples into a
+prompt budget and picks the completion size per question type
+"""
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency: the heuristic is close enough for budgeting
+    tiktoken = None
+
+from src.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token for English/maths text on GPT-4 tokenizers
+CHARS_PER_TOKEN = 4.0
+
+_encoding: Any = None
+
+
+def load_encoding() -> bool:
+    """
+    Load the tokenizer (blocking: run it in a thread at startup)
+    
+    tiktoken downloads the encoding file on first use unless it is cached
+    under TIKTOKEN_CACHE_DIR, so this never runs on the request path.
+    
+    Returns:
+        Whether exact token counts are available
+    """
+    global _encoding
+    
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable, using heuristic counts: {str(e)}")
+    
+    return _encoding is not None
+
+
+def _get_encoding() -> Any:
+    """The loaded tokenizer; None until load_encoding succeeds"""
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in a text (exact with tiktoken, estimated otherwise)"""
+    if not text:
+        return 0
+    
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text down to at most max_tokens tokens, marking the cut"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())[:max_tokens]
+        return encoding.decode(tokens).rstrip() + "..."
+    return text[:int(max_tokens * CHARS_PER_TOKEN)].rstrip() + "..."
+
+
+class TokenBudgeter:
+    """Fits prompt sections into a token budget"""
+    
+    def __init__(
+        self,
+        prompt_budget: Optional[int] = None,
+        max_tokens_by_type: Optional[Dict[str, int]] = None,
+        default_max_tokens: Optional[int] = None
+    ):
+        """
+        Args:
+            prompt_budget: Maximum prompt tokens (default PROMPT_TOKEN_BUDGET)
+            max_tokens_by_type: Completion tokens per question type
+                (default OUTPUT_MAX_TOKENS_BY_TYPE)
+            default_max_tokens: Completion tokens for unlisted question types
+        """
+        self.prompt_budget = prompt_budget or settings.PROMPT_TOKEN_BUDGET
+        self.max_tokens_by_type = max_tokens_by_type or settings.OUTPUT_MAX_TOKENS_BY_TYPE
+        self.default_max_tokens = default_max_tokens or settings.OUTPUT_MAX_TOKENS_DEFAULT
+    
+    def max_output_tokens(self, question_type: Optional[str]) -> int:
+        """Completion budget for one generated question of the given type"""
+        return self.max_tokens_by_type.get((question_type or "").upper(), self.default_max_tokens)
+    
+    def fit_examples(
+        self,
+        examples: List[Dict[str, Any]],
+        available_tokens: int,
+        format_full: Callable[[int, Dict[str, Any]], str],
+        format_condensed: Callable[[int, Dict[str, Any]], str]
+    ) -> List[str]:
+        """
+        Take examples in order while they fit the budget
+        
+        Each example is included in full when it fits, otherwise condensed;
+        packing stops at the first example that does not fit either way.
+        
+        Args:
+            examples: Context examples, most relevant first
+            available_tokens: Tokens left for the examples
+            format_full: Renders an example with all details
+            format_condensed: Renders a shorter version of an example
+            
+        Returns:
+            Rendered examples that fit
+        """
+        rendered = []
+        remaining = available_tokens
+        
+        for i, example in enumerate(examples, 1):
+            text = format_full(i, example)
+            cost = count_tokens(text)
+            
+            if cost > remaining:
+                text = format_condensed(i, example)
+                cost = count_tokens(text)
+                if cost > remaining:
+                    break
+            
+            rendered.append(text)
+            remaining -= cost
+        
+        return rendered
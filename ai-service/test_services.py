@@ -147,7 +147,7 @@ async def test_similarity_checker(questions: list):
             return
         
         # Check if Azure OpenAI is configured
-        if not checker.client:
+        if not checker.client.is_configured:
             print("⚠ Azure OpenAI not configured - using fallback method")
             
             # Test basic text comparison
@@ -198,7 +198,7 @@ async def test_question_generator():
     
     try:
         print(f"✓ Question generator initialized")
-        print(f"  OpenAI client configured: {generator.client is not None}")
+        print(f"  OpenAI client configured: {generator.client.is_configured}")
         print(f"  Note: Actual generation requires AZURE_OPENAI_KEY in .env")
         
         # Show that the service is ready
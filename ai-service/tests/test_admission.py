@@ -0,0 +1,123 @@
+"""Tests for the priority-class admission scheduler"""
+
+import asyncio
+
+from src.services.admission import BACKGROUND, BATCH, INTERACTIVE, AdmissionScheduler
+
+WEIGHTS = {INTERACTIVE: 3.0, BATCH: 1.0, BACKGROUND: 0.5}
+
+
+async def take(scheduler, priority):
+    async with scheduler.slot(priority):
+        pass
+
+
+async def acquire_within(scheduler, priority, timeout=1.0):
+    await asyncio.wait_for(take(scheduler, priority), timeout)
+
+
+def test_cancel_after_release_does_not_leak_the_slot():
+    async def scenario():
+        scheduler = AdmissionScheduler("test", capacity=1, weights=WEIGHTS)
+        hold = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(BATCH):
+                await hold.wait()
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(take(scheduler, BATCH))
+        await asyncio.sleep(0)
+
+        # The holder releases while the waiter's cancellation is pending
+        hold.set()
+        waiter.cancel()
+        await asyncio.gather(holding, waiter, return_exceptions=True)
+
+        await acquire_within(scheduler, BATCH)
+        return scheduler.get_stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["in_flight"] == 0
+    assert stats["classes"][BATCH]["queued"] == 0
+
+
+def test_cancel_while_granted_gives_the_slot_back():
+    async def scenario():
+        scheduler = AdmissionScheduler("test", capacity=1, weights=WEIGHTS)
+        hold = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot(BATCH):
+                await hold.wait()
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(take(scheduler, BATCH))
+        await asyncio.sleep(0)
+
+        # Let the release grant the waiter's future, then cancel the waiter
+        hold.set()
+        await holding
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        await acquire_within(scheduler, BATCH)
+        return scheduler.get_stats()
+
+    assert asyncio.run(scenario())["in_flight"] == 0
+
+
+def test_admissions_follow_class_weights():
+    async def scenario():
+        scheduler = AdmissionScheduler("test", capacity=1, weights=WEIGHTS)
+        order = []
+        gate = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot(BACKGROUND):
+                await gate.wait()
+
+        async def call(priority):
+            async with scheduler.slot(priority):
+                order.append(priority)
+
+        blocking = asyncio.create_task(blocker())
+        await asyncio.sleep(0)
+        calls = [asyncio.create_task(call(p)) for p in [BATCH] * 4 + [INTERACTIVE] * 4]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(blocking, *calls)
+        return order
+
+    order = asyncio.run(scenario())
+
+    # Interactive (weight 3) gets three admissions for each batch one
+    assert order[:4].count(INTERACTIVE) == 3
+
+
+def test_reserved_slots_are_kept_for_their_class():
+    async def scenario():
+        scheduler = AdmissionScheduler(
+            "test", capacity=2, weights=WEIGHTS, reserved={INTERACTIVE: 1}
+        )
+        gate = asyncio.Event()
+        peak = {"batch": 0}
+
+        async def batch_call():
+            async with scheduler.slot(BATCH):
+                peak["batch"] = max(peak["batch"], scheduler.get_stats()["in_flight"])
+                await gate.wait()
+
+        batch = [asyncio.create_task(batch_call()) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        # Batch work fills only the shared slot; interactive still gets in
+        await acquire_within(scheduler, INTERACTIVE)
+        gate.set()
+        await asyncio.gather(*batch)
+        return peak["batch"]
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,165 @@
+"""Tests for checkpointed, leased background batch jobs"""
+
+import asyncio
+
+from src.services.batch_jobs import BatchJobService, SQLiteJobStore
+
+SPECS = [{"topic": f"Topic {i}", "difficulty": "MEDIUM"} for i in range(4)]
+
+
+class FakeGenerator:
+    """Yields one question per spec whenever the test releases it"""
+
+    def __init__(self):
+        self.requested = []
+        self.release = asyncio.Queue()
+
+    async def generate_batch_stream(self, specifications, exam_type):
+        self.requested.append([spec["topic"] for spec in specifications])
+        for i, spec in enumerate(specifications):
+            await self.release.get()
+            yield i, {"question_text": f"Q on {spec['topic']}"}
+
+
+def make_service(db_path, lease_seconds=60.0):
+    generator = FakeGenerator()
+    service = BatchJobService(generator, store=SQLiteJobStore(str(db_path)))
+    service.lease_seconds = lease_seconds
+    return service, generator
+
+
+async def wait_for_results(service, job_id, count):
+    for _ in range(200):
+        if len(await service.store.get_results(job_id)) >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {count} results")
+
+
+def test_resume_skips_checkpointed_specs(tmp_path):
+    async def scenario():
+        first, first_generator = make_service(tmp_path / "jobs.db")
+        job_id = await first.submit(SPECS, "JEE_MAIN")
+        first_generator.release.put_nowait(None)
+        first_generator.release.put_nowait(None)
+        await wait_for_results(first, job_id, 2)
+        # Simulated crash: the task dies without touching the job status
+        first._tasks[job_id].cancel()
+        await asyncio.gather(*first._tasks.values(), return_exceptions=True)
+        await first.store.close()
+
+        second, second_generator = make_service(tmp_path / "jobs.db")
+        for _ in range(2):
+            second_generator.release.put_nowait(None)
+        assert await second.resume() == 1
+        await asyncio.gather(*second._tasks.values())
+
+        progress = await second.get_progress(job_id)
+        results = await second.get_results(job_id)
+        await second.stop()
+        return second_generator.requested, progress, results
+
+    requested, progress, results = asyncio.run(scenario())
+
+    assert requested == [["Topic 2", "Topic 3"]]
+    assert progress["status"] == "completed"
+    assert progress["completed"] == 4
+    assert [q["spec_index"] for q in results] == [0, 1, 2, 3]
+
+
+def test_leased_job_is_not_run_by_a_second_worker(tmp_path):
+    async def scenario():
+        owner, _ = make_service(tmp_path / "jobs.db")
+        await owner.submit(SPECS, "JEE_MAIN")
+        await asyncio.sleep(0.05)
+
+        other, other_generator = make_service(tmp_path / "jobs.db")
+        await other.resume()
+        await asyncio.gather(*other._tasks.values())
+
+        await owner.stop()
+        await other.stop()
+        return other_generator.requested
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_expired_lease_can_be_claimed(tmp_path):
+    async def scenario():
+        store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+        claims = [
+            await store.claim("job", "a", ttl=0.5),
+            await store.claim("job", "b", ttl=0.5),
+            await store.claim("job", "a", ttl=0.5),
+        ]
+        await asyncio.sleep(0.6)
+        claims.append(await store.claim("job", "b", ttl=0.5))
+        await store.release("job", "a")
+        claims.append(await store.claim("job", "a", ttl=0.5))
+        await store.close()
+        return claims
+
+    assert asyncio.run(scenario()) == [True, False, True, True, False]
+
+
+def test_cancel_from_another_worker_stops_the_runner(tmp_path):
+    async def scenario():
+        owner, generator = make_service(tmp_path / "jobs.db")
+        job_id = await owner.submit(SPECS, "JEE_MAIN")
+        generator.release.put_nowait(None)
+        await wait_for_results(owner, job_id, 1)
+
+        other, _ = make_service(tmp_path / "jobs.db")
+        assert await other.cancel(job_id)
+
+        for _ in range(3):
+            generator.release.put_nowait(None)
+        await asyncio.gather(*owner._tasks.values())
+
+        progress = await owner.get_progress(job_id)
+        await owner.store.close()
+        await other.store.close()
+        return progress
+
+    progress = asyncio.run(scenario())
+
+    assert progress["status"] == "cancelled"
+    assert progress["completed"] == 1
+
+
+def test_sweep_picks_up_a_job_once_a_dead_workers_lease_expires(tmp_path):
+    async def scenario():
+        service, generator = make_service(tmp_path / "jobs.db", lease_seconds=0.1)
+        now = asyncio.get_running_loop().time()
+        await service.store.create_job(
+            {
+                "job_id": "stale",
+                "exam_type": "JEE_MAIN",
+                "specifications": SPECS,
+                "status": "running",
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+        # The crashed worker's lease outlives the restart
+        await service.store.claim("stale", "dead-worker", ttl=0.15)
+        for _ in SPECS:
+            generator.release.put_nowait(None)
+
+        await service.resume()
+        await asyncio.sleep(0.05)
+        assert generator.requested == []
+        for _ in range(100):
+            progress = await service.get_progress("stale")
+            if progress["status"] == "completed":
+                break
+            await asyncio.sleep(0.02)
+
+        await service.stop()
+        return generator.requested, progress
+
+    requested, progress = asyncio.run(scenario())
+
+    assert requested == [[spec["topic"] for spec in SPECS]]
+    assert progress["status"] == "completed"
+    assert progress["completed"] == 4
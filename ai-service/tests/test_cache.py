@@ -0,0 +1,43 @@
+"""Tests for the in-process LRU cache"""
+
+from src.services import cache
+from src.services.cache import LRUCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache(max_size=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+    assert len(lru) == 2
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = LRUCache(max_size=10, ttl_seconds=5)
+    lru.set("a", 1)
+
+    now[0] = 105.0
+    assert lru.get("a") == 1
+
+    now[0] = 105.1
+    assert lru.get("a") is None
+    assert len(lru) == 0
+    assert (lru.hits, lru.misses) == (1, 1)
+
+
+def test_setting_a_key_again_refreshes_its_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = LRUCache(max_size=10, ttl_seconds=5)
+    lru.set("a", 1)
+
+    now[0] = 4.0
+    lru.set("a", 2)
+    now[0] = 8.0
+
+    assert lru.get("a") == 2
@@ -0,0 +1,102 @@
+"""Tests for the indexed PYQ context retriever"""
+
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.context_retriever import ContextRetrieverService
+from src.services.deduplicator import NearDuplicateDetectorService
+from src.services.similarity_checker import SimilarityCheckerService
+
+
+def pyq(n, topic, difficulty, year):
+    return {
+        "id": f"q{n}",
+        "question_text": f"Question {n} on {topic} from {year}",
+        "exam_type": "JEE_MAIN",
+        "topic": topic,
+        "difficulty": difficulty,
+        "year": year,
+    }
+
+
+BANK = [
+    pyq(1, "Kinematics", "MEDIUM", 2019),
+    pyq(2, "Kinematics", "MEDIUM", 2023),
+    pyq(3, "Kinematics", "HARD", 2022),
+    pyq(4, "Rotational Kinematics", "MEDIUM", 2021),
+    pyq(5, "Organic Chemistry", "MEDIUM", 2020),
+]
+
+
+class TopicEmbedder(SimilarityCheckerService):
+    """Embeds a topic as its set of words, so topics sharing words are close"""
+
+    VOCABULARY = ["kinematics", "rotational", "organic", "chemistry", "optics"]
+
+    async def get_embeddings(self, texts):
+        return [await self.get_embedding(text) for text in texts]
+
+    async def get_embedding(self, text):
+        return [float(word in text.lower().split()) for word in self.VOCABULARY]
+
+
+@pytest.fixture
+def retriever():
+    retriever = ContextRetrieverService(
+        similarity_checker=TopicEmbedder(), deduplicator=NearDuplicateDetectorService()
+    )
+    retriever.add_questions(BANK)
+    return retriever
+
+
+def ids(questions):
+    return [q["id"] for q in questions]
+
+
+def test_exact_key_most_recent_first_then_same_topic(retriever):
+    assert ids(retriever.get_context("JEE_MAIN", "kinematics ", "medium", k=2)) == ["q2", "q1"]
+    assert ids(retriever.get_context("JEE_MAIN", "Kinematics", "MEDIUM", k=3)) == ["q2", "q1", "q3"]
+    assert retriever.get_context("NEET", "Kinematics", "MEDIUM") == []
+
+
+def test_related_topics_fill_a_short_context(retriever):
+    context = asyncio.run(retriever.retrieve("JEE_MAIN", "Optics Kinematics", "MEDIUM", k=2))
+
+    assert ids(context) == ["q2", "q1"]
+    assert retriever.stats["embedding_fallbacks"] == 1
+
+    context = asyncio.run(retriever.retrieve("JEE_MAIN", "Rotational Kinematics", "MEDIUM", k=3))
+
+    assert ids(context) == ["q4", "q2", "q1"]
+
+
+def test_known_questions_are_not_added_twice(retriever):
+    version = retriever.get_version("JEE_MAIN")
+
+    assert retriever.add_questions([dict(BANK[0], id="copy")]) == 0
+    assert retriever.get_version("JEE_MAIN") == version
+    assert retriever.add_questions([pyq(6, "Optics", "EASY", 2024)]) == 1
+    assert retriever.get_version("JEE_MAIN") == version + 1
+    assert len(retriever.get_exam_questions("JEE_MAIN")) == len(BANK) + 1
+
+
+def test_bank_refresh_only_reads_changed_files(tmp_path):
+    retriever = ContextRetrieverService(
+        similarity_checker=SimpleNamespace(), deduplicator=NearDuplicateDetectorService()
+    )
+    (tmp_path / "2023.json").write_text(json.dumps({"questions": BANK[:3]}))
+    jsonl = tmp_path / "2024.jsonl"
+    jsonl.write_text("\n".join(json.dumps(q) for q in BANK[3:]) + "\n")
+
+    assert asyncio.run(retriever.load_bank(str(tmp_path))) == 5
+    assert asyncio.run(retriever.load_bank(str(tmp_path))) == 0
+
+    jsonl.write_text(jsonl.read_text() + json.dumps(pyq(6, "Optics", "EASY", 2024)) + "\n")
+    os.utime(jsonl, (0, jsonl.stat().st_mtime + 1))
+
+    assert asyncio.run(retriever.load_bank(str(tmp_path))) == 1
+    assert ids(retriever.get_by_ids(["q6", "missing", "q1"])) == ["q6", "q1"]
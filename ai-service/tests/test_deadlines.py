@@ -0,0 +1,138 @@
+"""Tests for per-request deadlines through the generation pipeline"""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.api import generate
+from src.config.settings import settings
+from src.services import question_generator
+from src.services.question_generator import QuestionGeneratorService
+from src.services.resilience import DeadlineExceeded, deadline_budget, request_deadline
+from src.services.telemetry import GenerationTelemetry
+
+PYQ = {"question_text": "A ball is thrown vertically upward at 20 m/s. Find the maximum height."}
+
+
+class StallingWriter:
+    """Answers with a copy of the PYQ first, then stalls; records each call's deadline"""
+
+    is_configured = True
+
+    def __init__(self, answers=1):
+        self.answers = answers
+        self.deadlines = []
+
+    async def chat_completion(self, **request):
+        self.deadlines.append(request_deadline.get())
+        if len(self.deadlines) > self.answers:
+            await asyncio.sleep(60)
+        content = json.dumps({"question_text": PYQ["question_text"]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+async def copies_are_rejected(question, existing_questions, **kwargs):
+    return {
+        "is_original": False,
+        "max_similarity": 0.99,
+        "most_similar_question": PYQ,
+        "verdict": "duplicate",
+    }
+
+
+@pytest.fixture
+def generator(monkeypatch):
+    telemetry = GenerationTelemetry(10)
+    monkeypatch.setattr(question_generator, "generation_telemetry", telemetry)
+    generator = QuestionGeneratorService()
+    monkeypatch.setattr(generator.similarity_checker, "check_originality", copies_are_rejected)
+    return generator
+
+
+def generate_within(generator, seconds, outer=None):
+    async def run():
+        if outer is not None:
+            request_deadline.set(time.monotonic() + outer)
+        return await generator.generate_question(
+            "Kinematics",
+            "MEDIUM",
+            "JEE_MAIN",
+            [PYQ],
+            [PYQ],
+            max_retries=3,
+            validate=False,
+            deadline=time.monotonic() + seconds,
+        )
+
+    started = time.monotonic()
+    question = asyncio.run(run())
+    return question, time.monotonic() - started
+
+
+def test_deadline_returns_the_best_candidate_so_far(generator):
+    generator.client = StallingWriter(answers=1)
+
+    question, elapsed = generate_within(generator, 0.2)
+
+    assert elapsed < 1.0
+    assert question["partial"] and question["partial_reason"] == "deadline"
+    assert question["originality_check"]["max_similarity"] == 0.99
+    assert question_generator.generation_telemetry.records[-1]["outcome"] == "deadline"
+
+
+def test_deadline_before_any_candidate_returns_nothing(generator):
+    generator.client = StallingWriter(answers=0)
+
+    question, elapsed = generate_within(generator, 0.1)
+
+    assert question is None and elapsed < 1.0
+
+
+def test_the_tighter_of_the_outer_and_own_deadline_reaches_llm_calls(generator):
+    generator.client = StallingWriter(answers=0)
+    started = time.monotonic()
+
+    generate_within(generator, 5.0, outer=0.1)
+
+    assert generator.client.deadlines[0] - started == pytest.approx(0.1, abs=0.05)
+
+
+def test_call_budget_is_capped_by_the_request_deadline():
+    assert deadline_budget(30.0) == 30.0
+
+    token = request_deadline.set(time.monotonic() + 2.0)
+    try:
+        assert deadline_budget(30.0) == pytest.approx(2.0, abs=0.1)
+        assert deadline_budget(1.0) == 1.0
+    finally:
+        request_deadline.reset(token)
+
+    token = request_deadline.set(time.monotonic() - 1.0)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            deadline_budget(30.0)
+    finally:
+        request_deadline.reset(token)
+
+
+@pytest.mark.parametrize(
+    "header_ms, body_ms, default_ms, expected",
+    [(None, None, 0, None), (500, 2000, 0, 0.5), (None, 2000, 0, 2.0), (None, None, 3000, 3.0)],
+)
+def test_request_deadline_prefers_the_tighter_budget(
+    monkeypatch, header_ms, body_ms, default_ms, expected
+):
+    monkeypatch.setattr(settings, "GENERATION_DEFAULT_DEADLINE_MS", default_ms)
+    request = generate.GenerationRequest(
+        topic="Kinematics", difficulty="MEDIUM", exam_type="JEE_MAIN", deadline_ms=body_ms
+    )
+
+    deadline = generate._request_deadline(request, header_ms)
+
+    if expected is None:
+        assert deadline is None
+    else:
+        assert deadline - time.monotonic() == pytest.approx(expected, abs=0.05)
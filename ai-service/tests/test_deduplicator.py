@@ -0,0 +1,79 @@
+"""Tests for MinHash near-duplicate detection"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.context_retriever import ContextRetrieverService
+from src.services.deduplicator import NearDuplicateDetectorService
+
+ORIGINAL = {
+    "question_text": (
+        "A block of mass 2 kg slides down a rough inclined plane of angle 30 degrees "
+        "with coefficient of kinetic friction 0.2. Find the acceleration of the block."
+    ),
+    "topic": "Mechanics",
+    "difficulty": "medium",
+}
+REFORMATTED = {
+    "question_text": (
+        "Q7. A block of mass 2 kg slides down a rough inclined plane of angle 30 degrees, "
+        "with coefficient of kinetic friction 0.2; find the acceleration of the block!"
+    )
+}
+REWORDED = {
+    "question_text": (
+        "A block of mass 2 kg slides down a rough inclined plane of angle 30 degrees "
+        "with coefficient of kinetic friction 0.2. Find the acceleration of this block."
+    )
+}
+DISTINCT = {
+    "question_text": (
+        "Calculate the pH of a buffer made by mixing 0.1 M acetic acid with 0.1 M sodium "
+        "acetate, given that the pKa of acetic acid is 4.76."
+    )
+}
+
+
+@pytest.fixture
+def detector():
+    return NearDuplicateDetectorService()
+
+
+@pytest.mark.parametrize("variant", [REFORMATTED, REWORDED])
+def test_near_duplicate_is_found(detector, variant):
+    detector.add_question(ORIGINAL, key="jee-2023-Q1")
+
+    match = detector.find_duplicate(variant)
+
+    assert match is not None
+    assert match["key"] == "jee-2023-Q1"
+
+
+def test_distinct_question_is_not_a_duplicate(detector):
+    detector.add_question(ORIGINAL, key="jee-2023-Q1")
+
+    assert detector.find_duplicate(DISTINCT) is None
+    assert detector.add_question(DISTINCT) is None
+    assert len(detector.index) == 2
+
+
+def test_deduplicate_flags_or_merges_copies(detector):
+    batch = [dict(ORIGINAL, year=2023, question_number=1), dict(REFORMATTED, year=2024)]
+
+    flagged = detector.deduplicate([dict(q) for q in batch])
+    assert flagged["duplicates_found"] == 1
+    assert [q["is_duplicate"] for q in flagged["questions"]] == [False, True]
+
+    merged = NearDuplicateDetectorService().deduplicate([dict(q) for q in batch], merge=True)
+    assert len(merged["questions"]) == 1
+    assert merged["questions"][0]["duplicate_sources"][0]["year"] == 2024
+
+
+def test_questions_added_to_the_bank_are_indexed(detector):
+    retriever = ContextRetrieverService(similarity_checker=SimpleNamespace(), deduplicator=detector)
+
+    retriever.add_questions([ORIGINAL], exam_type="JEE_MAIN")
+
+    assert detector.find_duplicate(REWORDED) is not None
+    assert detector.find_duplicate(DISTINCT) is None
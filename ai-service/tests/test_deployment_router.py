@@ -0,0 +1,114 @@
+"""Tests for routing and failover across Azure OpenAI deployments"""
+
+import asyncio
+
+import httpx
+import pytest
+from openai import APIConnectionError, RateLimitError
+
+from src.config.settings import settings
+from src.services.llm_client import LLMClient
+
+DEPLOYMENTS = [
+    {"name": "east", "endpoint": "http://east.test", "api_key": "key"},
+    {"name": "west", "endpoint": "http://west.test", "api_key": "key"},
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "AZURE_OPENAI_DEPLOYMENTS", DEPLOYMENTS)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_SECONDS", 0.0)
+    return LLMClient()
+
+
+def rate_limited(retry_after="30"):
+    request = httpx.Request("POST", "http://east.test")
+    response = httpx.Response(429, request=request, headers={"retry-after": retry_after})
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+def connection_error():
+    return APIConnectionError(request=httpx.Request("POST", "http://east.test"))
+
+
+def scripted(outcomes):
+    """create() callback answering per deployment from a list of outcomes"""
+    calls = []
+
+    async def create(deployment, kwargs):
+        calls.append(deployment.name)
+        outcome = outcomes[deployment.name].pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return create, calls
+
+
+def test_rate_limited_deployment_fails_over_and_cools_down(client):
+    create, calls = scripted({"east": [rate_limited()], "west": ["first", "second"]})
+
+    assert asyncio.run(client._call_routed("embeddings", create, {})) == "first"
+    assert asyncio.run(client._call_routed("embeddings", create, {})) == "second"
+
+    assert calls == ["east", "west", "west"]
+    stats = client.get_deployment_stats()
+    assert stats["east"]["embeddings"]["rate_limited"] == 1
+    assert stats["east"]["embeddings"]["cooling_down"]
+
+
+def test_server_failure_fails_over(client):
+    create, calls = scripted({"east": [connection_error()], "west": ["ok"]})
+
+    assert asyncio.run(client._call_routed("embeddings", create, {})) == "ok"
+
+    assert calls == ["east", "west"]
+    assert client.get_deployment_stats()["east"]["embeddings"]["failures"] == 1
+
+
+def test_error_is_raised_when_every_deployment_fails(client):
+    create, calls = scripted({"east": [connection_error()], "west": [connection_error()]})
+
+    with pytest.raises(APIConnectionError):
+        asyncio.run(client._call_routed("embeddings", create, {}))
+    assert calls == ["east", "west"]
+
+
+def test_calls_use_the_deployment_model(client):
+    seen = {}
+
+    async def create(deployment, kwargs):
+        seen[deployment.name] = kwargs["model"]
+        return "ok"
+
+    asyncio.run(client._call_routed("chat", create, {"messages": []}))
+
+    assert seen == {"east": settings.AZURE_OPENAI_DEPLOYMENT}
+
+
+def test_pick_prefers_fast_and_idle_deployments(client):
+    east, west = client.router.deployments
+    east.latency["chat"] = 2.0
+    west.latency["chat"] = 0.5
+    assert client.router.pick("chat") is west
+
+    west.in_flight["chat"] = 10
+    assert client.router.pick("chat") is east
+
+
+def test_unmeasured_deployment_is_scored_with_the_fastest_latency(client):
+    east, west = client.router.deployments
+    east.latency["chat"] = 1.0
+    east.in_flight["chat"] = 1
+
+    assert client.router.pick("chat") is west
+
+
+def test_open_circuit_takes_deployment_out_of_rotation(client):
+    east, west = client.router.deployments
+    east.callers["chat"].breaker.state = "open"
+    east.callers["chat"].breaker._opened_at = float("inf")
+
+    assert client.router.pick("chat") is west
+    assert not client.router.has_untried("chat", {"west"})
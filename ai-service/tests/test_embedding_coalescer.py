@@ -0,0 +1,111 @@
+"""Tests for coalescing concurrent embedding requests"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+from openai import BadRequestError
+
+from src.services.embedding_coalescer import EmbeddingCoalescer
+
+
+def bad_request():
+    response = httpx.Response(400, request=httpx.Request("POST", "http://east.test"))
+    return BadRequestError("invalid input", response=response, body=None)
+
+
+class FakeEmbeddingClient:
+    """Embeds a text as [len(text)]; rejects any call containing a rejected text"""
+
+    def __init__(self, rejected=(), error=None):
+        self.calls = []
+        self.rejected = set(rejected)
+        self.error = error
+
+    async def create_embeddings(self, input):
+        self.calls.append(list(input))
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        if self.rejected & set(input):
+            raise bad_request()
+        return SimpleNamespace(
+            data=[SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in enumerate(input)]
+        )
+
+
+def coalescer(client, max_batch_size=16):
+    return EmbeddingCoalescer(client, window_ms=20, max_batch_size=max_batch_size)
+
+
+def test_concurrent_callers_share_one_batch():
+    client = FakeEmbeddingClient()
+    service = coalescer(client)
+
+    async def callers():
+        return await asyncio.gather(
+            service.embed_many(["a", "bb"]), service.embed_many(["ccc"]), service.embed_many(["a"])
+        )
+
+    assert asyncio.run(callers()) == [[[1.0], [2.0]], [[3.0]], [[1.0]]]
+    assert client.calls == [["a", "bb", "ccc"]]
+    assert service.get_stats()["avg_batch_size"] == 3.0
+
+
+def test_callers_arriving_mid_flight_wait_for_the_window():
+    client = FakeEmbeddingClient()
+    service = coalescer(client)
+
+    async def staggered():
+        first = asyncio.create_task(service.embed_many(["a"]))
+        await asyncio.sleep(0.002)
+        later = await asyncio.gather(service.embed_many(["bb"]), service.embed_many(["ccc"]))
+        return [await first, *later]
+
+    assert asyncio.run(staggered()) == [[[1.0]], [[2.0]], [[3.0]]]
+    assert client.calls == [["a"], ["bb", "ccc"]]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    client = FakeEmbeddingClient()
+    service = coalescer(client, max_batch_size=2)
+
+    vectors = asyncio.run(service.embed_many(["a", "bb", "ccc", "dddd", "eeeee"]))
+
+    assert vectors == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    assert [len(call) for call in client.calls] == [2, 2, 1]
+
+
+def test_a_rejected_text_only_fails_its_own_caller():
+    client = FakeEmbeddingClient(rejected={"bad"})
+    service = coalescer(client)
+
+    async def callers():
+        return await asyncio.gather(
+            service.embed_many(["a"]),
+            service.embed_many(["bad"]),
+            service.embed_many(["bb"]),
+            return_exceptions=True,
+        )
+
+    good, rejected, other = asyncio.run(callers())
+
+    assert good == [[1.0]] and other == [[2.0]]
+    assert isinstance(rejected, BadRequestError)
+    assert client.calls[0] == ["a", "bad", "bb"]
+    assert sorted(client.calls[1:]) == [["a"], ["bad"], ["bb"]]
+    assert service.get_stats()["single_retries"] == 3
+
+
+def test_other_errors_fail_every_caller_in_the_batch():
+    service = coalescer(FakeEmbeddingClient(error=RuntimeError("deployment unavailable")))
+
+    async def callers():
+        return await asyncio.gather(
+            service.embed_many(["a"]), service.embed_many(["bb"]), return_exceptions=True
+        )
+
+    results = asyncio.run(callers())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert service.get_stats()["failed_batches"] == 1
@@ -0,0 +1,106 @@
+"""Tests for the local Azure OpenAI stand-in used by the load test"""
+
+import asyncio
+import json
+
+import httpx
+import numpy as np
+from fastapi.testclient import TestClient
+from openai import AsyncAzureOpenAI
+
+from scripts.fake_llm_server import FakeLLMConfig, create_app
+
+PROMPT = (
+    "Generate a NEW MEDIUM difficulty question on the topic: Kinematics\n"
+    "Example 1 (Year: 2022, Difficulty: MEDIUM):\n"
+    "Question: A ball is thrown vertically upward at 20 m/s. Find the maximum height.\n"
+)
+
+
+def config(**overrides):
+    return FakeLLMConfig(latency_ms=1, latency_sigma=0, embedding_latency_ms=1, **overrides)
+
+
+def azure_client(app):
+    """The real SDK client, talking to the app in-process"""
+    return AsyncAzureOpenAI(
+        api_key="fake",
+        api_version="2024-02-01",
+        azure_endpoint="http://fake.test",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app)),
+        max_retries=0,
+    )
+
+
+def generate(app, prompt=PROMPT, n=1):
+    async def call():
+        async with azure_client(app) as client:
+            return await client.chat.completions.create(
+                model="gpt-4", messages=[{"role": "user", "content": prompt}], n=n
+            )
+
+    response = asyncio.run(call())
+    return response, [json.loads(choice.message.content) for choice in response.choices]
+
+
+def test_sdk_client_gets_parseable_questions_for_the_prompted_topic():
+    response, questions = generate(create_app(config()), n=3)
+
+    assert len(questions) == 3
+    assert len({q["question_text"] for q in questions}) == 3
+    assert all(q["topic"] == "Kinematics" and q["difficulty"] == "MEDIUM" for q in questions)
+    assert all(q["correct_answer"] in {o["key"] for o in q["options"]} for q in questions)
+    assert response.usage.total_tokens > response.usage.prompt_tokens
+
+
+def test_same_seed_gives_the_same_answers():
+    first = generate(create_app(config(near_duplicate_rate=0.5)), n=4)[1]
+    second = generate(create_app(config(near_duplicate_rate=0.5)), n=4)[1]
+
+    assert first == second
+
+
+def test_near_duplicates_copy_examples_not_listed_under_avoid():
+    app = create_app(config(near_duplicate_rate=1.0))
+    example = "A ball is thrown vertically upward at 20 m/s. Find the maximum height."
+
+    assert generate(app)[1][0]["question_text"] == example
+    avoided = generate(app, prompt=PROMPT + "AVOID\nRejected draft 1: " + example)[1][0]
+    assert avoided["question_text"] != example
+
+
+def test_grouped_prompts_get_a_questions_list():
+    questions = generate(create_app(config()), prompt=PROMPT + "Generate 3 DIFFERENT questions")[1]
+
+    assert len(questions[0]["questions"]) == 3
+
+
+def test_embeddings_score_similar_texts_as_similar():
+    async def call():
+        async with azure_client(create_app(config())) as client:
+            return await client.embeddings.create(
+                model="embed",
+                input=[
+                    "A ball is thrown upward at 20 m/s. Find its maximum height.",
+                    "A ball is thrown upward at 20 m/s. Find the maximum height.",
+                    "Calculate the pH of a 0.01 M hydrochloric acid solution.",
+                ],
+            )
+
+    vectors = np.array([item.embedding for item in asyncio.run(call()).data])
+    scores = vectors @ vectors[0]
+
+    assert scores[1] > 0.8 > 0.3 > scores[2]
+
+
+def test_configured_faults_are_returned_and_counted():
+    limited = TestClient(create_app(config(rate_limit_rate=1.0, retry_after_seconds=3)))
+    failing = TestClient(create_app(config(error_rate=1.0)))
+    body = {"messages": [{"role": "user", "content": PROMPT}]}
+
+    response = limited.post("/v1/chat/completions", json=body)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+    assert failing.post("/v1/embeddings", json={"input": ["x"]}).status_code == 500
+    assert limited.get("/stats").json()["rate_limited"] == 1
+    assert failing.get("/stats").json()["errors"] == 1
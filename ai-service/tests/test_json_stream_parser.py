@@ -0,0 +1,77 @@
+"""Tests for the incremental JSON parser used on streamed completions"""
+
+from src.services.json_stream_parser import IncrementalJSONParser
+
+COMPLETION = (
+    '{"question_text": "A block of mass {m} slides \\"down\\" an incline",'
+    ' "options": ["1 m/s", "2 m/s", {"label": "C", "text": "3, 4"}],'
+    ' "marks": 4, "negative": -1.5, "is_numeric": false,'
+    ' "explanation": "Use v = sqrt(2gh)"}'
+)
+
+
+def feed_incrementally(parser, text):
+    """Feed every prefix, recording the text length at which each field appears"""
+    seen = {}
+    for end in range(1, len(text) + 1):
+        for key in parser.feed(text[:end]):
+            seen.setdefault(key, end)
+    return seen
+
+
+def test_fields_match_a_full_parse():
+    parser = IncrementalJSONParser()
+    feed_incrementally(parser, COMPLETION)
+
+    assert parser.complete
+    assert parser.fields == {
+        "question_text": 'A block of mass {m} slides "down" an incline',
+        "options": ["1 m/s", "2 m/s", {"label": "C", "text": "3, 4"}],
+        "marks": 4,
+        "negative": -1.5,
+        "is_numeric": False,
+        "explanation": "Use v = sqrt(2gh)",
+    }
+
+
+def test_question_text_is_reported_before_the_rest_streams():
+    parser = IncrementalJSONParser()
+    seen = feed_incrementally(parser, COMPLETION)
+
+    assert seen["question_text"] == COMPLETION.index('", "options"') + 1
+    assert seen["question_text"] < seen["options"] < seen["explanation"]
+
+
+def test_partial_values_are_not_reported():
+    parser = IncrementalJSONParser()
+
+    fields = parser.feed('{"question_text": "A block of ma')
+
+    assert fields == {}
+    assert not parser.complete
+
+
+def test_numbers_wait_for_their_terminator():
+    parser = IncrementalJSONParser()
+
+    assert parser.feed('{"marks": 4') == {}
+    assert parser.feed('{"marks": 42}') == {"marks": 42}
+
+
+def test_text_that_does_not_extend_restarts_the_scan():
+    parser = IncrementalJSONParser()
+    parser.feed('{"question_text": "first draft", "options": [')
+
+    fields = parser.feed('{"question_text": "second')
+
+    assert fields == {}
+    assert parser.feed('{"question_text": "second draft",') == {"question_text": "second draft"}
+
+
+def test_text_before_the_object_is_ignored():
+    parser = IncrementalJSONParser()
+
+    fields = parser.feed('Here is the question:\n{"question_text": "Q"}')
+
+    assert fields == {"question_text": "Q"}
+    assert parser.complete
@@ -0,0 +1,88 @@
+"""Tests for the shared LLM client"""
+
+import asyncio
+from types import SimpleNamespace
+
+from src.config.settings import settings
+from src.services.llm_client import LLMClient
+
+
+def test_streamed_completions_are_never_hedged(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "AZURE_OPENAI_ENDPOINT", "http://fake.test")
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "key")
+    client = LLMClient()
+    streams = []
+
+    async def create_chat_stream(deployment, kwargs, on_text):
+        streams.append(deployment.name)
+        for text in ('{"question', '{"question_text": "Q"}'):
+            await asyncio.sleep(0.03)
+            on_text(text)
+        return "completion"
+
+    monkeypatch.setattr(client, "_create_chat_stream", create_chat_stream)
+    received = []
+
+    result = asyncio.run(
+        client.chat_completion_stream(received.append, messages=[{"role": "user", "content": "x"}])
+    )
+
+    assert result == "completion"
+    assert len(streams) == 1
+    assert received == ['{"question', '{"question_text": "Q"}']
+    assert client.get_resilience_stats()["default:chat"]["hedges_launched"] == 0
+
+
+def configured_client(monkeypatch, **overrides):
+    monkeypatch.setattr(settings, "AZURE_OPENAI_ENDPOINT", "http://fake.test")
+    monkeypatch.setattr(settings, "AZURE_OPENAI_API_KEY", "key")
+    for name, value in overrides.items():
+        monkeypatch.setattr(settings, name, value)
+    return LLMClient()
+
+
+def test_deployments_share_one_connection_pool(monkeypatch):
+    client = configured_client(monkeypatch)
+
+    async def lifecycle():
+        await client.startup()
+        pool = client._http_client
+        clients = [deployment.client for deployment in client.router.deployments]
+        await client.shutdown()
+        return pool, clients
+
+    pool, clients = asyncio.run(lifecycle())
+
+    assert all(c is not None and c._client is pool for c in clients)
+    assert pool.is_closed
+    assert client._http_client is None
+    assert all(deployment.client is None for deployment in client.router.deployments)
+
+
+def test_concurrent_chat_calls_are_capped(monkeypatch):
+    client = configured_client(
+        monkeypatch,
+        LLM_MAX_CONCURRENT_CHAT=2,
+        LLM_RESERVED_INTERACTIVE_CHAT=0,
+        LLM_HEDGE_DELAY_SECONDS=0.0,
+    )
+    in_flight = []
+    peak = []
+
+    async def create(**kwargs):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.02)
+        in_flight.pop()
+        return "completion"
+
+    raw_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(client, "_get_client", lambda deployment: raw_client)
+    messages = [{"role": "user", "content": "x"}]
+
+    async def burst():
+        return await asyncio.gather(*(client.chat_completion(messages=messages) for _ in range(6)))
+
+    assert asyncio.run(burst()) == ["completion"] * 6
+    assert max(peak) == 2
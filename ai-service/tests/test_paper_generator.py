@@ -0,0 +1,81 @@
+"""Tests for blueprint derivation and apportioning in the paper generator"""
+
+import asyncio
+
+import pytest
+
+from src.services.paper_generator import PaperGeneratorService, _apportion
+
+
+class FakeRetriever:
+    def __init__(self, questions):
+        self.questions = questions
+
+    def get_exam_questions(self, exam_type):
+        return self.questions
+
+
+def make_service(questions):
+    service = PaperGeneratorService(generator=None)
+    service.context_retriever = FakeRetriever(questions)
+    return service
+
+
+def pyq(topic, year, difficulty="MEDIUM"):
+    return {
+        "question_text": f"{topic} {year}",
+        "topic": topic,
+        "year": year,
+        "difficulty": difficulty,
+    }
+
+
+def topics_of(blueprint):
+    return {
+        spec["topic"]: spec["count"]
+        for section in blueprint["sections"]
+        for spec in section["specifications"]
+    }
+
+
+def test_apportion_uses_largest_remainders():
+    assert _apportion({"a": 1, "b": 1, "c": 1}, 4) == {"a": 2, "b": 1, "c": 1}
+    assert _apportion({"a": 3, "b": 1}, 0) == {}
+    assert sum(_apportion({"a": 5, "b": 3, "c": 2}, 7).values()) == 7
+
+
+def test_derived_blueprint_only_counts_the_requested_years():
+    questions = [pyq("Physics - Optics", 2019)] * 8 + [pyq("Chemistry - Bonding", 2023)] * 2
+    service = make_service(questions)
+
+    blueprint = asyncio.run(service.derive_blueprint("JEE_MAIN", 4, years=[2023]))
+
+    assert topics_of(blueprint) == {"Chemistry - Bonding": 4}
+    assert blueprint["derived_from"] == {"years": [2023], "pyq_count": 2}
+
+
+def test_questions_without_topic_or_difficulty_are_handled():
+    questions = [
+        pyq("Physics - Optics", 2023),
+        pyq(None, 2023),
+        pyq("Maths - Calculus", 2023, difficulty=None),
+    ]
+    service = make_service(questions)
+
+    blueprint = asyncio.run(service.derive_blueprint("JEE_MAIN", 2))
+
+    assert topics_of(blueprint) == {"Physics - Optics": 1, "Maths - Calculus": 1}
+    assert {section["name"] for section in blueprint["sections"]} == {"Physics", "Maths"}
+    difficulties = {
+        spec["difficulty"]
+        for section in blueprint["sections"]
+        for spec in section["specifications"]
+    }
+    assert None not in difficulties
+
+
+def test_no_matching_pyqs_is_an_error():
+    service = make_service([pyq("Physics - Optics", 2019)])
+
+    with pytest.raises(ValueError):
+        asyncio.run(service.derive_blueprint("JEE_MAIN", 10, years=[2024]))
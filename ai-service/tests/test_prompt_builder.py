@@ -0,0 +1,82 @@
+"""Tests for prompt templates and memoized prompt sections"""
+
+import asyncio
+
+import pytest
+
+from src.services.prompt_builder import PromptBuilderService
+
+CONTEXT = [
+    {
+        "question_text": "A ball is thrown vertically upward at 20 m/s. Find the maximum height.",
+        "options": [{"key": "A", "text": "20 m"}, {"key": "B", "text": "40 m"}],
+        "correct_answer": "A",
+        "year": 2022,
+        "difficulty": "MEDIUM",
+        "concepts_tested": ["kinematics"],
+    },
+    {
+        "question_text": "A stone is dropped from a 45 m tower. Find the time to reach the ground.",
+        "year": 2021,
+        "difficulty": "EASY",
+        "concepts_tested": ["free fall"],
+    },
+]
+PATTERNS = {
+    "topic_patterns": {"trends": {"Kinematics": "increasing"}},
+    "concept_patterns": {"top_concepts": [["projectile motion", 4], ["free fall", 2]]},
+}
+
+
+@pytest.fixture
+def builder():
+    return PromptBuilderService()
+
+
+def build(builder, exam_type="JEE", context=CONTEXT, patterns=PATTERNS, topic="Kinematics"):
+    return asyncio.run(
+        builder.build_question_generation_prompt(topic, "MEDIUM", exam_type, context, patterns)
+    )
+
+
+def test_prompt_starts_with_the_per_exam_static_prefix(builder):
+    jee = build(builder)
+    other_topic = build(builder, topic="Optics")
+    neet = build(builder, exam_type="NEET")
+
+    prefix = builder.get_static_prefix("JEE")
+    assert jee.startswith(prefix) and other_topic.startswith(prefix)
+    assert not neet.startswith(prefix)
+    assert builder.get_static_prefix("JEE") is prefix
+
+
+def test_repeated_sections_are_served_from_the_cache(builder):
+    first = build(builder)
+    misses = builder._section_cache.misses
+
+    assert build(builder) == first
+    assert builder._section_cache.misses == misses
+    assert builder._section_cache.hits == 2
+    assert len(builder._section_cache) == 2
+
+
+def test_section_keys_follow_content_not_identity(builder):
+    build(builder)
+    reordered = {key: PATTERNS[key] for key in reversed(PATTERNS)}
+    build(builder, context=[dict(q) for q in CONTEXT], patterns=reordered)
+
+    assert len(builder._section_cache) == 2
+
+    edited = [dict(CONTEXT[0], correct_answer="B"), CONTEXT[1]]
+    prompt = build(builder, context=edited)
+
+    assert len(builder._section_cache) == 3
+    assert "Correct Answer: B" in prompt
+
+
+def test_only_the_first_five_context_questions_are_keyed(builder):
+    context = CONTEXT * 3
+    build(builder, context=context)
+    build(builder, context=context[:5] + [dict(CONTEXT[0], year=1999)])
+
+    assert len(builder._section_cache) == 2
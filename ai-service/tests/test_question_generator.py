@@ -0,0 +1,270 @@
+"""Tests for question generation and validation"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.config.settings import settings
+from src.services import question_generator
+from src.services.question_generator import QuestionGeneratorService
+from src.services.telemetry import GenerationTelemetry
+
+
+def completion(*contents):
+    """Chat completion with one choice per content string"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=c)) for c in contents]
+    )
+
+
+@pytest.fixture
+def generator():
+    return QuestionGeneratorService()
+
+
+def test_every_choice_becomes_a_candidate(generator):
+    response = completion(
+        json.dumps({"question_text": "First?"}),
+        json.dumps({"question_text": "Second?", "topic": "Optics"}),
+    )
+
+    candidates = generator._parse_candidates(response, "Mechanics", "EASY")
+
+    assert [c["question_text"] for c in candidates] == ["First?", "Second?"]
+    assert [c["topic"] for c in candidates] == ["Mechanics", "Optics"]
+    assert all(c["difficulty"] == "EASY" for c in candidates)
+
+
+@pytest.mark.parametrize("malformed", ["not json", "[1, 2]", '"text"', "42", "null"])
+def test_malformed_choices_are_skipped(generator, malformed):
+    response = completion(malformed, json.dumps({"question_text": "Valid?"}))
+
+    candidates = generator._parse_candidates(response, "Mechanics", "EASY")
+
+    assert [c["question_text"] for c in candidates] == ["Valid?"]
+
+
+REVIEWED = {
+    "question_text": "What is the SI unit of force?",
+    "options": [{"key": "A", "text": "Newton"}, {"key": "B", "text": "Joule"}],
+    "correct_answer": "A",
+    "explanation": "Force is measured in newtons.",
+    "difficulty": "EASY",
+    "topic": "Mechanics",
+}
+
+
+class FakeReviewer:
+    """Answers validation prompts, one result per reviewed question"""
+
+    is_configured = True
+
+    def __init__(self):
+        self.prompts = []
+
+    async def chat_completion(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        count = prompt.count("QUESTION ")
+        if count:
+            content = {"results": [{"index": i, "is_valid": True} for i in range(1, count + 1)]}
+        else:
+            content = {"is_valid": True}
+        return completion(json.dumps(content))
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("question_text", "What is the SI unit of energy?"),
+        ("options", [{"key": "A", "text": "Newton"}, {"key": "B", "text": "Watt"}]),
+        ("correct_answer", "B"),
+        ("explanation", "A newton is one kilogram metre per second squared."),
+        ("difficulty", "MEDIUM"),
+        ("topic", "Units"),
+    ],
+)
+def test_validation_key_covers_every_reviewed_field(generator, field, value):
+    changed = dict(REVIEWED, **{field: value})
+
+    assert generator._validation_key(changed, "JEE") != generator._validation_key(REVIEWED, "JEE")
+
+
+def test_validation_key_ignores_unreviewed_metadata(generator):
+    annotated = dict(REVIEWED, id="q-1", similarity_score=0.2)
+
+    assert generator._validation_key(annotated, "JEE") == generator._validation_key(REVIEWED, "JEE")
+    assert generator._validation_key(REVIEWED, "NEET") != generator._validation_key(REVIEWED, "JEE")
+
+
+def test_reviewer_is_shown_the_explanation(generator):
+    prompt = asyncio.run(generator.prompt_builder.build_validation_prompt(REVIEWED, "JEE"))
+
+    assert "Explanation: Force is measured in newtons." in prompt
+
+
+def test_cached_validations_are_not_reviewed_again(generator):
+    generator.client = FakeReviewer()
+    questions = [dict(REVIEWED), dict(REVIEWED, correct_answer="B")]
+
+    first = asyncio.run(generator.validate_batch(questions, "JEE", questions_per_prompt=2))
+    second = asyncio.run(generator.validate_batch(questions, "JEE", questions_per_prompt=2))
+    edited = asyncio.run(generator.validate_batch([dict(REVIEWED, explanation="Edited.")], "JEE"))
+
+    assert [v["is_valid"] for v in first + second + edited] == [True] * 5
+    assert len(generator.client.prompts) == 2
+
+
+PYQ = {"question_text": "A ball is thrown vertically upward at 20 m/s. Find the maximum height."}
+
+
+class ScriptedWriter:
+    """Returns the scripted question texts in turn, recording each request"""
+
+    is_configured = True
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.requests = []
+
+    async def chat_completion(self, **request):
+        self.requests.append(request)
+        question = {"question_text": self.texts.pop(0), "options": [], "correct_answer": "A"}
+        return completion(json.dumps(question))
+
+
+async def copies_are_rejected(question, existing_questions, **kwargs):
+    copied = question["question_text"] == PYQ["question_text"]
+    return {
+        "is_original": not copied,
+        "max_similarity": 0.99 if copied else 0.2,
+        "most_similar_question": PYQ if copied else None,
+    }
+
+
+@pytest.fixture
+def writer(generator, monkeypatch):
+    monkeypatch.setattr(question_generator, "generation_telemetry", GenerationTelemetry(10))
+    monkeypatch.setattr(settings, "GENERATION_TEMPERATURE_SCHEDULE", [0.8, 1.0])
+    monkeypatch.setattr(generator.similarity_checker, "check_originality", copies_are_rejected)
+    generator.client = ScriptedWriter([PYQ["question_text"]] * 2 + ["A fresh question?"])
+    return generator
+
+
+def generate_with_retries(generator):
+    return asyncio.run(
+        generator.generate_question(
+            "Kinematics", "MEDIUM", "JEE_MAIN", [PYQ], [PYQ], max_retries=3, validate=False
+        )
+    )
+
+
+def test_retries_see_rejected_drafts_and_run_hotter(writer):
+    question = generate_with_retries(writer)
+
+    prompts = [r["messages"][-1]["content"] for r in writer.client.requests]
+    assert question["generation_attempt"] == 3
+    assert "AVOID" not in prompts[0]
+    assert prompts[1].count("Rejected draft") == 1 and prompts[2].count("Rejected draft") == 2
+    assert "Too close to existing question: A ball is thrown" in prompts[1]
+    assert [r["temperature"] for r in writer.client.requests] == [0.8, 1.0, 1.0]
+    stats = question_generator.generation_telemetry.get_stats()
+    assert (stats["attempts"], stats["accepted"], stats["attempts_per_accepted"]) == (3, 1, 3.0)
+
+
+def test_feedback_can_be_switched_off(writer, monkeypatch):
+    monkeypatch.setattr(settings, "ORIGINALITY_FEEDBACK", False)
+
+    generate_with_retries(writer)
+
+    assert all("AVOID" not in r["messages"][-1]["content"] for r in writer.client.requests)
+
+
+def test_feedback_keeps_the_latest_drafts_within_budget(generator, monkeypatch):
+    monkeypatch.setattr(settings, "ORIGINALITY_FEEDBACK_MAX_EXAMPLES", 2)
+    monkeypatch.setattr(settings, "ORIGINALITY_FEEDBACK_TOKENS_PER_EXAMPLE", 5)
+    rejected = [
+        {"draft": f"Draft {i} " + "word " * 50, "nearest": None, "similarity": 0.9}
+        for i in range(3)
+    ]
+
+    feedback = generator.prompt_builder.build_originality_feedback(rejected)
+
+    assert generator.prompt_builder.build_originality_feedback([]) == ""
+    assert "Draft 0" not in feedback and "Draft 1" in feedback and "Draft 2" in feedback
+    assert "word " * 10 not in feedback
+
+
+@pytest.mark.parametrize(
+    "content, texts",
+    [
+        ({"questions": [{"question_text": "A?"}, {"question_text": "B?"}]}, ["A?", "B?"]),
+        ({"question_text": "Only one?"}, ["Only one?"]),
+        ({"questions": [{"question_text": "A?"}, "B?", {"options": []}, None]}, ["A?"]),
+        ([{"question_text": "Bare list?"}], ["Bare list?"]),
+        ({"questions": "A?"}, []),
+    ],
+)
+def test_group_completion_parsing(generator, content, texts):
+    response = completion(json.dumps(content))
+
+    candidates = generator._parse_group_candidates(response, "Optics", "HARD")
+
+    assert [c["question_text"] for c in candidates] == texts
+    assert all(c["topic"] == "Optics" and c["difficulty"] == "HARD" for c in candidates)
+
+
+def test_malformed_group_completion_yields_nothing(generator):
+    assert generator._parse_group_candidates(completion("{not json"), "Optics", "HARD") == []
+
+
+def test_specs_are_grouped_by_key_to_fill_one_wave(generator, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_GENERATION_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "GROUPED_GENERATION_MAX_QUESTIONS", 3)
+    optics = {"topic": "Optics", "difficulty": "HARD"}
+    specs = [optics, {"topic": "Waves", "difficulty": "EASY"}] + [optics] * 4
+
+    assert generator._group_specifications(specs) == [[0, 2, 3], [4, 5], [1]]
+
+
+class GroupWriter:
+    """Answers grouped prompts with the scripted question lists in turn"""
+
+    is_configured = True
+
+    def __init__(self, groups):
+        self.groups = list(groups)
+        self.prompts = []
+
+    async def chat_completion(self, messages, **kwargs):
+        self.prompts.append(messages[-1]["content"])
+        questions = [{"question_text": text} for text in self.groups.pop(0)]
+        return completion(json.dumps({"questions": questions}))
+
+
+async def batch_copies_are_rejected(questions, existing_questions):
+    return [await copies_are_rejected(q, existing_questions) for q in questions]
+
+
+def test_group_shortfall_is_requested_again(generator, monkeypatch):
+    monkeypatch.setattr(question_generator, "generation_telemetry", GenerationTelemetry(10))
+    monkeypatch.setattr(
+        generator.similarity_checker, "batch_check_originality", batch_copies_are_rejected
+    )
+    generator.client = GroupWriter([["First?", PYQ["question_text"], "Second?"], ["Third?"]])
+
+    questions = asyncio.run(
+        generator.generate_question_group(
+            "Kinematics", "MEDIUM", "JEE_MAIN", 3, [PYQ], [PYQ], max_retries=3, validate=False
+        )
+    )
+
+    assert [q["question_text"] for q in questions] == ["First?", "Second?", "Third?"]
+    assert [q["generation_attempt"] for q in questions] == [1, 1, 2]
+    assert "Generate 3 DIFFERENT" in generator.client.prompts[0]
+    assert "Generate 1 DIFFERENT" in generator.client.prompts[1]
+    assert "Rejected draft 1" in generator.client.prompts[1]
+    stats = question_generator.generation_telemetry.get_stats()
+    assert (stats["attempts"], stats["accepted"]) == (2, 3)
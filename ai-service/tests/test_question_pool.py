@@ -0,0 +1,118 @@
+"""Tests for the warm question pool"""
+
+import asyncio
+
+import pytest
+
+from src.config.settings import settings
+from src.services.question_pool import InMemoryPoolStore, QuestionPoolService
+
+KEY = ("JEE_MAIN", "Mechanics", "MEDIUM")
+
+
+class FakeGenerator:
+    """Generates numbered questions; every third one fails validation"""
+
+    def __init__(self):
+        self.generated = 0
+
+    async def generate_batch(self, specifications, exam_type, **kwargs):
+        questions = []
+        for spec in specifications:
+            self.generated += 1
+            questions.append({"question_text": f"Q{self.generated}", "topic": spec["topic"]})
+        return {"questions": questions}
+
+    async def validate_batch(self, questions, exam_type):
+        return [{"is_valid": int(q["question_text"][1:]) % 3 != 0} for q in questions]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "QUESTION_POOL_VALIDATE", True)
+    monkeypatch.setattr(settings, "QUESTION_POOL_PROMOTE_REQUESTS", 3)
+    monkeypatch.setattr(settings, "QUESTION_POOL_PROMOTE_WINDOW_SECONDS", 60)
+
+    async def no_context(exam_type, topic, difficulty):
+        return [], []
+
+    return QuestionPoolService(
+        FakeGenerator(), store=InMemoryPoolStore(), context_provider=no_context
+    )
+
+
+async def drain_refills(pool):
+    await asyncio.gather(*pool._refill_tasks.values())
+
+
+def test_miss_refills_in_the_background_then_hits(pool):
+    pool.configure_key(*KEY, target=3, low_water=1)
+
+    async def scenario():
+        first = await pool.get_question(*KEY)
+        await drain_refills(pool)
+        second = await pool.get_question(*KEY)
+        return first, second, await pool.get_stats()
+
+    first, second, stats = asyncio.run(scenario())
+
+    assert first is None
+    assert second["question_text"] == "Q1"
+    assert second["validation"] == {"is_valid": True}
+    # Q3 failed validation, so the refill pooled two of its three questions
+    assert stats["questions_generated"] == 2
+    assert (stats["hits"], stats["misses"], stats["refills"]) == (1, 1, 1)
+    assert stats["pool_sizes"] == {"JEE_MAIN:Mechanics:MEDIUM": 1}
+
+
+def test_refill_tops_up_to_the_target_only(pool):
+    pool.configure_key(*KEY, target=4, low_water=2)
+
+    async def scenario():
+        added = [await pool.refill(KEY), await pool.refill(KEY)]
+        return added, await pool.store.size(pool._store_key(KEY))
+
+    added, size = asyncio.run(scenario())
+
+    assert added == [3, 1]
+    assert size == 4
+
+
+def test_one_off_keys_are_not_pooled(pool):
+    async def scenario():
+        for topic in ("Optics", "Waves", "Heat"):
+            await pool.get_question("JEE_MAIN", topic, "EASY")
+        await drain_refills(pool)
+
+    asyncio.run(scenario())
+
+    assert pool.key_configs == {}
+    assert pool.generator.generated == 0
+
+
+def test_key_becomes_hot_after_repeated_demand(pool):
+    async def scenario():
+        promoted = []
+        for _ in range(3):
+            await pool.get_question(*KEY)
+            promoted.append(KEY in pool.key_configs)
+        await drain_refills(pool)
+        return promoted
+
+    assert asyncio.run(scenario()) == [False, False, True]
+    assert pool.generator.generated == settings.QUESTION_POOL_DEFAULT_TARGET
+
+
+def test_expired_refill_lock_is_not_released_by_its_old_owner():
+    async def scenario():
+        store = InMemoryPoolStore()
+        taken = [await store.acquire_refill_lock("key", "slow", ttl_seconds=0)]
+        # The slow refill's lock expired and another worker took it over
+        taken.append(await store.acquire_refill_lock("key", "other", ttl_seconds=60))
+        await store.release_refill_lock("key", "slow")
+        taken.append(await store.acquire_refill_lock("key", "third", ttl_seconds=60))
+        await store.release_refill_lock("key", "other")
+        taken.append(await store.acquire_refill_lock("key", "third", ttl_seconds=60))
+        return taken
+
+    assert asyncio.run(scenario()) == [True, True, False, True]
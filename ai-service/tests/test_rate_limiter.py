@@ -0,0 +1,125 @@
+"""Tests for the token-bucket rate limiter"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services.admission import BATCH, INTERACTIVE, AdmissionScheduler, priority_scope
+from src.services.rate_limiter import LLMRateLimiter, TokenBucket, retry_after_seconds
+from src.services.resilience import DeadlineExceeded
+
+
+def test_bucket_wait_time_tracks_refill_rate():
+    bucket = TokenBucket(per_minute=600)
+    bucket.consume(600)
+
+    assert 0.09 < bucket.wait_time(1) <= 0.1
+    # Requests larger than the bucket only wait for a full bucket
+    assert bucket.wait_time(10_000) <= 60.0
+
+
+def test_acquire_is_immediate_within_quota():
+    limiter = LLMRateLimiter(requests_per_minute=60, tokens_per_minute=10_000)
+
+    asyncio.run(limiter.acquire(500))
+
+    stats = limiter.get_stats()
+    assert stats["acquired"] == 1
+    assert stats["throttled"] == 0
+    assert stats["tokens_available"] <= 9_500
+
+
+def test_acquire_waits_for_the_request_bucket():
+    limiter = LLMRateLimiter(requests_per_minute=600, tokens_per_minute=0)
+    limiter.requests.consume(limiter.requests.tokens)
+
+    started = time.monotonic()
+    asyncio.run(limiter.acquire(0))
+
+    assert time.monotonic() - started >= 0.08
+    assert limiter.get_stats()["throttled"] == 1
+
+
+def test_pause_holds_callers():
+    limiter = LLMRateLimiter(requests_per_minute=0, tokens_per_minute=0)
+    started = time.monotonic()
+    limiter.pause(0.05)
+
+    asyncio.run(limiter.acquire(0))
+
+    # The event loop may wake a timer up to its clock resolution early
+    assert time.monotonic() - started >= 0.04
+    assert limiter.get_stats()["rate_limited"] == 1
+
+
+def test_reconcile_corrects_the_estimate():
+    limiter = LLMRateLimiter(requests_per_minute=0, tokens_per_minute=10_000)
+    asyncio.run(limiter.acquire(1_000))
+
+    limiter.reconcile(1_000, 200)
+
+    assert limiter.get_stats()["tokens_available"] > 9_700
+
+
+def test_throttled_waiters_are_served_by_priority():
+    async def scenario():
+        queue = AdmissionScheduler("quota", capacity=1, weights={INTERACTIVE: 100.0, BATCH: 1.0})
+        limiter = LLMRateLimiter(requests_per_minute=6_000, tokens_per_minute=0, queue=queue)
+        limiter.requests.consume(limiter.requests.tokens)
+        order = []
+
+        async def acquire(priority):
+            with priority_scope(priority):
+                await limiter.acquire(0)
+            order.append(priority)
+
+        tasks = [asyncio.create_task(acquire(p)) for p in [BATCH, BATCH, BATCH, INTERACTIVE]]
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(scenario())
+
+    # The first batch waiter already holds the queue; interactive is next
+    assert order[:2] == [BATCH, INTERACTIVE]
+
+
+def test_retry_after_headers():
+    def error(headers):
+        return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+    assert retry_after_seconds(error({"retry-after-ms": "1500"}), default=9) == 1.5
+    assert retry_after_seconds(error({"retry-after": "4"}), default=9) == 4.0
+    assert retry_after_seconds(error({"retry-after": "soon"}), default=9) == 9
+    assert retry_after_seconds(object(), default=2.0) == 2.0
+
+
+def test_acquire_fails_fast_when_the_quota_frees_up_after_the_deadline():
+    limiter = LLMRateLimiter(requests_per_minute=60, tokens_per_minute=0)
+    limiter.requests.consume(limiter.requests.tokens)
+    available = limiter.requests.tokens
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(limiter.acquire(0, deadline=started + 0.5))
+
+    # The bucket needs about a second: no point sleeping half of it first
+    assert time.monotonic() - started < 0.1
+    assert limiter.requests.tokens >= available
+    assert limiter.get_stats()["deadline_exceeded"] == 1
+
+
+def test_acquire_gives_up_queueing_at_the_deadline():
+    limiter = LLMRateLimiter(requests_per_minute=0, tokens_per_minute=0)
+
+    async def scenario():
+        async with limiter._lock:
+            await limiter.acquire(0, deadline=time.monotonic() + 0.05)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+
+    assert 0.04 <= time.monotonic() - started < 0.5
+    assert limiter.get_stats()["acquired"] == 0
@@ -0,0 +1,161 @@
+"""Tests for the circuit breaker and the resilient call layer"""
+
+import asyncio
+
+import pytest
+
+from src.services.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+
+class Transient(Exception):
+    pass
+
+
+def make_caller(breaker, max_attempts=1, hedge_delay=0.0):
+    return ResilientCaller(
+        name="test",
+        attempt_timeout=1.0,
+        deadline=5.0,
+        max_attempts=max_attempts,
+        base_delay=0.0,
+        max_delay=0.0,
+        breaker=breaker,
+        retry_on=(Transient,),
+        hedge_delay=hedge_delay,
+    )
+
+
+async def fail(error):
+    raise error
+
+
+def open_breaker(caller):
+    for _ in range(caller.breaker.failure_threshold):
+        with pytest.raises(Transient):
+            asyncio.run(caller.call(lambda: fail(Transient())))
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60.0)
+    caller = make_caller(breaker)
+
+    open_breaker(caller)
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(caller.call(lambda: asyncio.sleep(0, "ok")))
+    assert caller.stats["short_circuited"] == 1
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.0)
+    caller = make_caller(breaker)
+    open_breaker(caller)
+
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.release()
+    assert asyncio.run(caller.call(lambda: asyncio.sleep(0, "ok"))) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_probe_is_released():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.0)
+    caller = make_caller(breaker)
+    open_breaker(caller)
+
+    async def cancel_probe():
+        probe = asyncio.create_task(caller.call(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+
+    assert breaker.state == "half_open"
+    assert asyncio.run(caller.call(lambda: asyncio.sleep(0, "ok"))) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_non_transient_error_neither_closes_nor_trips_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.0)
+    caller = make_caller(breaker)
+    open_breaker(caller)
+
+    with pytest.raises(ValueError):
+        asyncio.run(caller.call(lambda: fail(ValueError("bad request"))))
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_non_transient_error_does_not_reset_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60.0)
+    caller = make_caller(breaker)
+
+    with pytest.raises(Transient):
+        asyncio.run(caller.call(lambda: fail(Transient())))
+    with pytest.raises(ValueError):
+        asyncio.run(caller.call(lambda: fail(ValueError("rate limited"))))
+    with pytest.raises(Transient):
+        asyncio.run(caller.call(lambda: fail(Transient())))
+
+    assert breaker.state == "open"
+
+
+def test_transient_errors_are_retried():
+    breaker = CircuitBreaker("test", failure_threshold=5, recovery_timeout=60.0)
+    caller = make_caller(breaker, max_attempts=3)
+    outcomes = [Transient(), Transient(), "ok"]
+
+    async def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(caller.call(flaky)) == "ok"
+    assert caller.stats["retries"] == 2
+    assert breaker.state == "closed"
+
+
+def test_attempt_timeout_counts_as_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60.0)
+    caller = make_caller(breaker)
+    caller.attempt_timeout = 0.01
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(caller.call(lambda: asyncio.sleep(1)))
+
+    assert caller.stats["timeouts"] == 1
+    assert breaker.state == "open"
+
+
+def test_hedge_wins_when_primary_is_slow():
+    breaker = CircuitBreaker("test", failure_threshold=5, recovery_timeout=60.0)
+    caller = make_caller(breaker, hedge_delay=0.01)
+    delays = [1.0, 0.0]
+
+    async def request():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert asyncio.run(caller.call(request)) == 0.0
+    assert caller.stats["hedges_launched"] == 1
+    assert caller.stats["hedges_won"] == 1
+
+
+def test_spent_deadline_does_not_take_the_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.0)
+    caller = make_caller(breaker)
+    open_breaker(caller)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(caller.call(lambda: asyncio.sleep(0, "ok"), deadline=0.0))
+
+    assert asyncio.run(caller.call(lambda: asyncio.sleep(0, "ok"))) == "ok"
+    assert breaker.state == "closed"
@@ -0,0 +1,188 @@
+"""Tests for originality checking"""
+
+import asyncio
+import hashlib
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from src.config.settings import settings
+from src.services.similarity_checker import SimilarityCheckerService
+
+BANK = [
+    {"question_text": "A ball is thrown vertically upward at 20 m/s. Find the maximum height."},
+    {"question_text": "Find the equivalent resistance of three 6 ohm resistors in parallel."},
+    {"question_text": "Calculate the pH of a 0.01 M hydrochloric acid solution."},
+    {"question_text": "Evaluate the integral of x squared from 0 to 3."},
+    {"question_text": "A convex lens of focal length 10 cm forms an image of an object."},
+]
+COPY = {"question_text": "A ball is thrown vertically upward at 20 m/s. Find its maximum height."}
+UNRELATED = {"question_text": "Name the enzyme catalysing glycolysis step one."}
+
+
+def embed(text):
+    """Bag-of-words vector: texts sharing most words are close in cosine"""
+    vector = [0.0] * 64
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeCoalescer:
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+
+    async def embed_many(self, texts):
+        self.calls.append(list(texts))
+        return [None if text in self.failing else embed(text) for text in texts]
+
+
+@pytest.fixture
+def checker():
+    checker = SimilarityCheckerService()
+    checker.client = SimpleNamespace(is_configured=True)
+    checker.coalescer = FakeCoalescer()
+    return checker
+
+
+def check(checker, question, **kwargs):
+    return asyncio.run(checker.check_originality(question, BANK, exam_type="JEE_MAIN", **kwargs))
+
+
+@pytest.mark.parametrize("question", [COPY, UNRELATED, BANK[3]])
+def test_cascade_verdict_matches_the_full_check(checker, question):
+    full = check(checker, question)
+    cascaded = check(checker, question, cascade=True, corpus_version=1)
+
+    assert cascaded["is_original"] == full["is_original"]
+
+
+def test_cascade_finds_the_same_nearest_question(checker):
+    full = check(checker, COPY)
+    cascaded = check(checker, COPY, cascade=True, corpus_version=1)
+
+    assert not cascaded["is_original"]
+    assert cascaded["most_similar_question"] is BANK[0]
+    assert cascaded["max_similarity"] == pytest.approx(full["max_similarity"])
+
+
+def test_cascade_short_circuits_without_an_embedding_call(checker):
+    result = check(checker, UNRELATED, cascade=True, corpus_version=1)
+
+    assert result["is_original"]
+    assert result["cascade"]["shortlisted"] == 0
+    assert checker.coalescer.calls == []
+    stats = checker.get_cascade_stats()
+    assert (stats["checks"], stats["short_circuited"], stats["embedding_checks"]) == (1, 1, 0)
+
+
+def test_cascade_reuses_the_index_until_the_version_changes(checker):
+    first = asyncio.run(checker.get_lexical_index(BANK, "JEE_MAIN", 1))
+    again = asyncio.run(checker.get_lexical_index(BANK, "JEE_MAIN", 1))
+    rebuilt = asyncio.run(checker.get_lexical_index(BANK + [COPY], "JEE_MAIN", 2))
+
+    assert again is first
+    assert rebuilt is not first
+    assert len(rebuilt.documents) == len(BANK) + 1
+
+
+def test_cascade_is_skipped_for_an_unversioned_corpus(checker):
+    result = check(checker, COPY, cascade=True)
+
+    assert not result["is_original"]
+    assert "cascade" not in result
+    assert checker.lexical_indexes == {}
+    assert checker.get_cascade_stats()["skipped_unversioned"] == 1
+
+
+def test_batch_check_matches_single_checks_and_catches_intra_batch_copies(checker):
+    twin = {"question_text": UNRELATED["question_text"] + " Explain."}
+    batch = [COPY, UNRELATED, BANK[3], twin]
+
+    results = asyncio.run(checker.batch_check_originality(batch, BANK))
+    singles = [check(checker, q) for q in batch[:3]]
+
+    assert [r["is_original"] for r in results] == [False, True, False, False]
+    for result, single in zip(results, singles):
+        assert result["is_original"] == single["is_original"]
+        assert result["max_similarity"] == pytest.approx(single["max_similarity"], abs=1e-5)
+    assert results[3]["intra_batch_duplicate_of"] == 1
+    assert [r["question_index"] for r in results] == [0, 1, 2, 3]
+
+
+def test_batch_check_fails_closed_when_an_embedding_is_missing(checker):
+    checker.coalescer = FakeCoalescer(failing={UNRELATED["question_text"]})
+
+    results = asyncio.run(checker.batch_check_originality([UNRELATED, BANK[3]], BANK))
+
+    assert not results[0]["is_original"]
+    assert results[0]["error"] == "Question could not be embedded"
+    assert not results[1]["is_original"]
+    assert "error" not in results[1]
+
+
+def test_batch_check_fails_closed_when_a_pyq_embedding_is_missing(checker):
+    checker.coalescer = FakeCoalescer(failing={BANK[0]["question_text"]})
+
+    results = asyncio.run(checker.batch_check_originality([COPY, UNRELATED], BANK))
+
+    assert [r["is_original"] for r in results] == [False, False]
+    assert all(r["error"] == "1 existing questions could not be embedded" for r in results)
+
+
+TOPICS = ["Kinematics", "Current Electricity", "Ionic Equilibrium", "Integration", "Optics"]
+TOPICAL_BANK = [
+    dict(q, exam_type="JEE_MAIN", topic=topic, difficulty="MEDIUM")
+    for q, topic in zip(BANK, TOPICS)
+] + [
+    {
+        "question_text": "A car accelerates uniformly from rest to 30 m/s in 10 seconds.",
+        "exam_type": "JEE_MAIN",
+        "topic": "Kinematics",
+        "difficulty": "MEDIUM",
+    },
+    dict(BANK[0], exam_type="NEET", topic="Kinematics", difficulty="MEDIUM"),
+]
+
+
+def early_exit(checker, question, monkeypatch, block_size=1):
+    monkeypatch.setattr(settings, "ORIGINALITY_BLOCK_SIZE", block_size)
+    return asyncio.run(
+        checker.check_originality(question, TOPICAL_BANK, early_exit=True, exam_type="JEE_MAIN")
+    )
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        dict(COPY, topic="Kinematics", difficulty="MEDIUM"),
+        dict(UNRELATED, topic="Kinematics", difficulty="EASY"),
+        dict(BANK[3], topic="Integration"),
+    ],
+)
+def test_early_exit_verdict_matches_the_full_check(checker, monkeypatch, question):
+    full = asyncio.run(checker.check_originality(question, TOPICAL_BANK[:-1]))
+
+    assert early_exit(checker, question, monkeypatch)["is_original"] == full["is_original"]
+
+
+def test_early_exit_stops_at_the_first_copy(checker, monkeypatch):
+    question = dict(COPY, topic="Kinematics", difficulty="MEDIUM")
+
+    result = early_exit(checker, question, monkeypatch)
+
+    assert not result["is_original"]
+    assert result["most_similar_question"] is TOPICAL_BANK[0]
+    assert (result["candidates_scanned"], result["candidates_total"]) == (1, 2)
+
+
+def test_early_exit_scans_everything_for_an_unknown_topic(checker, monkeypatch):
+    question = dict(COPY, topic="Rotational Dynamics")
+
+    result = early_exit(checker, question, monkeypatch)
+
+    assert not result["is_original"]
+    assert result["candidates_scanned"] == len(TOPICAL_BANK)
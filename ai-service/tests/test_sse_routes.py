@@ -0,0 +1,81 @@
+"""Tests for the server-sent-event generation routes"""
+
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api import generate
+
+REQUEST = {"topic": "Physics - Kinematics", "difficulty": "MEDIUM", "exam_type": "JEE_MAIN"}
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_context(request):
+        return [], []
+
+    monkeypatch.setattr(generate, "_load_context", no_context)
+    app = FastAPI()
+    app.include_router(generate.router, prefix="/api/generate")
+    return TestClient(app)
+
+
+def test_single_stream_reports_progress_then_the_result(client, monkeypatch):
+    async def generate_question(progress_callback=None, **kwargs):
+        await progress_callback({"event": "attempt", "attempt": 1})
+        await progress_callback({"event": "originality", "attempt": 1, "is_original": True})
+        return {"question_text": "Q", "topic": kwargs["topic"]}
+
+    monkeypatch.setattr(generate.generator, "generate_question", generate_question)
+
+    response = client.post("/api/generate/single/stream", json=REQUEST)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ["attempt", "originality", "result"]
+    assert events[-1][1]["success"]
+    assert events[-1][1]["question"]["topic"] == REQUEST["topic"]
+
+
+def test_single_stream_reports_errors(client, monkeypatch):
+    async def generate_question(**kwargs):
+        raise RuntimeError("deployment unavailable")
+
+    monkeypatch.setattr(generate.generator, "generate_question", generate_question)
+
+    events = parse_events(client.post("/api/generate/single/stream", json=REQUEST).text)
+
+    assert events == [("error", {"message": "deployment unavailable"})]
+
+
+def test_batch_stream_emits_questions_in_completion_order(client, monkeypatch):
+    async def generate_batch_stream(specifications, exam_type, pattern_analysis=None):
+        yield 1, {"question_text": "second spec"}
+        await asyncio.sleep(0)
+        yield 0, None
+
+    monkeypatch.setattr(generate.generator, "generate_batch_stream", generate_batch_stream)
+
+    response = client.post(
+        "/api/generate/batch/stream",
+        json={"exam_type": "JEE_MAIN", "specifications": [REQUEST, REQUEST]},
+    )
+
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ["start", "question", "failed", "complete"]
+    assert events[1][1]["spec_index"] == 1
+    assert events[2][1] == {"spec_index": 0}
+    assert events[-1][1]["successful"] == 1
+    assert events[-1][1]["failed"] == 1
@@ -0,0 +1,89 @@
+"""Tests for per-generation telemetry"""
+
+import pytest
+
+from src.config.settings import settings
+from src.services.telemetry import (
+    GenerationTelemetry,
+    GenerationTrace,
+    Histogram,
+    current_trace,
+    trace_stage,
+)
+
+
+def trace(topic="Kinematics", outcome="success", attempts=1, tokens=(1000, 500), seconds=1.0):
+    t = GenerationTrace("JEE_MAIN", topic, "MEDIUM")
+    t.outcome = outcome
+    t.attempts = attempts
+    t.add_usage(*tokens)
+    t.stages = {"llm": seconds / 2}
+    t.total_seconds = seconds
+    return t
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram([1, 5])
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [("1", 2), ("5", 3), ("+Inf", 4)]
+    assert (histogram.sum, histogram.count) == (14.5, 4)
+
+
+def test_stage_time_is_charged_to_the_current_trace():
+    t = GenerationTrace("JEE_MAIN", "Kinematics", "MEDIUM")
+    with trace_stage("llm"):
+        pass
+    assert t.stages == {}
+
+    token = current_trace.set(t)
+    try:
+        with trace_stage("llm"):
+            pass
+        with trace_stage("llm"):
+            pass
+    finally:
+        current_trace.reset(token)
+
+    assert set(t.stages) == {"llm"} and t.stages["llm"] >= 0
+
+
+def test_cost_follows_the_configured_prices(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_PROMPT_COST_PER_1K", 0.01)
+    monkeypatch.setattr(settings, "LLM_COMPLETION_COST_PER_1K", 0.03)
+
+    assert trace(tokens=(2000, 1000)).cost_usd == pytest.approx(0.05)
+
+
+def test_summary_reports_attempts_and_the_costliest_keys():
+    telemetry = GenerationTelemetry(capacity=3)
+    telemetry.record(trace(topic="Old", attempts=9))
+    telemetry.record(trace(attempts=1))
+    telemetry.record(trace(attempts=3))
+    telemetry.record(trace(topic="Optics", outcome="exhausted", attempts=5))
+
+    summary = telemetry.summary()
+
+    assert summary["generations"] == 3
+    assert summary["outcomes"] == {"success": 2, "exhausted": 1}
+    assert summary["attempts_per_success"] == {1: 1, 3: 1}
+    assert summary["llm_calls_per_success"] == 4.5
+    assert [k["topic"] for k in summary["top_keys_by_attempts"]] == ["Optics", "Kinematics"]
+    assert telemetry.summary(last_n=1)["generations"] == 1
+    # Cumulative metrics keep everything the ring buffer dropped
+    assert telemetry.outcomes == {"success": 3, "exhausted": 1}
+
+
+def test_prometheus_exposition():
+    telemetry = GenerationTelemetry(capacity=10)
+    telemetry.record(trace(attempts=2, tokens=(100, 50), seconds=0.2))
+
+    text = telemetry.prometheus()
+
+    assert 'generation_total{outcome="success"} 1' in text
+    assert 'generation_tokens_total{kind="prompt"} 100' in text
+    assert 'generation_stage_seconds_bucket{stage="total",le="0.25"} 1' in text
+    assert 'generation_stage_seconds_count{stage="llm"} 1' in text
+    assert 'generation_attempts_per_success_bucket{le="2"} 1' in text
+    assert text.endswith("\n")
@@ -0,0 +1,57 @@
+"""Tests for token counting and prompt budgets"""
+
+import pytest
+
+from src.services import token_budgeter
+from src.services.token_budgeter import TokenBudgeter, count_tokens, truncate_to_tokens
+
+
+@pytest.fixture(autouse=True)
+def heuristic_counts(monkeypatch):
+    # Deterministic counts whether or not tiktoken and its data are present
+    monkeypatch.setattr(token_budgeter, "_encoding", None)
+
+
+def test_counts_use_the_characters_per_token_estimate():
+    assert count_tokens("") == 0
+    assert count_tokens("abcd") == 1
+    assert count_tokens("abcde") == 2
+
+
+def test_truncate_marks_the_cut_and_keeps_short_text():
+    assert truncate_to_tokens("short", 10) == "short"
+    assert truncate_to_tokens("x" * 100, 5) == "x" * 20 + "..."
+
+
+def test_max_output_tokens_per_question_type():
+    budgeter = TokenBudgeter(
+        prompt_budget=500, max_tokens_by_type={"MCQ": 400}, default_max_tokens=900
+    )
+
+    assert budgeter.max_output_tokens("mcq") == 400
+    assert budgeter.max_output_tokens("NUMERICAL") == 900
+    assert budgeter.max_output_tokens(None) == 900
+
+
+def test_fit_examples_condenses_then_stops_at_the_budget():
+    budgeter = TokenBudgeter(prompt_budget=500)
+    examples = [{"size": 40}, {"size": 200}, {"size": 40}, {"size": 40}]
+
+    def full(i, example):
+        return f"{i}" + "x" * (example["size"] * 4 - 1)
+
+    def condensed(i, example):
+        return f"{i}" + "y" * 39
+
+    rendered = budgeter.fit_examples(examples, 95, full, condensed)
+
+    # 40 tokens in full, 10 condensed (200 does not fit), 40 in full; the
+    # last example fits neither way in the 5 tokens left
+    assert [text[:2] for text in rendered] == ["1x", "2y", "3x"]
+
+
+def test_load_encoding_falls_back_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(token_budgeter, "tiktoken", None)
+
+    assert token_budgeter.load_encoding() is False
+    assert count_tokens("abcdefgh") == 2